@@ -1,13 +1,61 @@
 #!/usr/bin/env python3
-"""Test WiFi binary protocol: connect to device AP, then LIST_SHOTS and fetch test shot."""
+"""Test WiFi binary protocol: connect to device AP, then LIST_SHOTS and fetch test shot.
+--bench: fetch every listed shot sequentially and with 2..N chunk requests in flight, and compare.
+Usage: python3 test_wifi_fetch.py [--url http://192.168.4.1] [--concurrency 3] [--bench] [--repeat 3]"""
+import argparse
 import sys
+import time
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "msr1_ota" / "web_gui"))
-from wifi_binary_client import DEFAULT_DEVICE_URL, get_shot_list, fetch_shot_chunked_sync
+from wifi_binary_client import (
+    DEFAULT_DEVICE_URL,
+    HTTP_POOL_SIZE,
+    client_stats,
+    fetch_shot_chunked_sync,
+    get_shot_list,
+)
+
+
+def _valid(payload) -> bool:
+    return bool(payload) and len(payload) >= 8 and payload[:8] == b"SVTSHOT3"
+
+
+def bench(url: str, shots: list, max_concurrency: int, repeat: int) -> int:
+    """Time every shot at concurrency 1 (sequential loop) .. max_concurrency; best of repeat runs."""
+    modes = list(range(1, max_concurrency + 1))
+    print(f"{'shot':>12} {'bytes':>7} " + " ".join(f"{f'c={c} ms':>10} {'KiB/s':>7}" for c in modes))
+    rc = 0
+    for shot_id, size in shots:
+        row = []
+        for c in modes:
+            best = None
+            for _ in range(repeat):
+                t0 = time.monotonic()
+                payload, err = fetch_shot_chunked_sync(url, shot_id, size, concurrency=c)
+                sec = time.monotonic() - t0
+                if err or not _valid(payload):
+                    print(f"  0x{shot_id:08X} c={c}: FAIL {err or 'invalid SVTSHOT3'}")
+                    rc = 1
+                    break
+                best = sec if best is None else min(best, sec)
+            row.append(f"{best * 1000:>10.0f} {size / 1024 / best:>7.1f}" if best else f"{'-':>10} {'-':>7}")
+        print(f"  0x{shot_id:08X} {size:>7} " + " ".join(row))
+    for st in client_stats():
+        print(f"HTTP: {st['requests']} requests on {st['connects']} connection(s), mean connect "
+              f"{st['mean_connect_ms']} ms, first byte {st['mean_first_byte_ms']} ms, "
+              f"transfer {st['mean_transfer_ms']} ms")
+    return rc
+
 
 def main():
-    url = DEFAULT_DEVICE_URL
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--url", default=DEFAULT_DEVICE_URL)
+    ap.add_argument("--concurrency", type=int, default=HTTP_POOL_SIZE, help="chunk requests in flight")
+    ap.add_argument("--bench", action="store_true", help="compare sequential and parallel fetch")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per shot and mode in --bench (best is kept)")
+    args = ap.parse_args()
+    url = args.url
     print(f"Device URL: {url}")
     print("Listing shots...")
     shots, err = get_shot_list(url)
@@ -18,14 +66,17 @@ def main():
         print("FAIL: no shots")
         return 1
     print(f"Shots: {shots}")
+    if args.bench:
+        return bench(url, shots, max(1, args.concurrency), max(1, args.repeat))
     shot_id, size = shots[0]
-    print(f"Fetching shot 0x{shot_id:08X} ({size} bytes)...")
-    payload, err = fetch_shot_chunked_sync(url, shot_id, size)
+    print(f"Fetching shot 0x{shot_id:08X} ({size} bytes, {args.concurrency} in flight)...")
+    t0 = time.monotonic()
+    payload, err = fetch_shot_chunked_sync(url, shot_id, size, concurrency=args.concurrency)
     if err:
         print(f"FAIL: {err}")
         return 1
-    ok = payload and len(payload) >= 8 and payload[:8] == b"SVTSHOT3"
-    print(f"PASS: got {len(payload)} bytes, valid={ok}")
+    ok = _valid(payload)
+    print(f"PASS: got {len(payload)} bytes in {time.monotonic() - t0:.2f} s, valid={ok}")
     return 0 if ok else 1
 
 if __name__ == "__main__":
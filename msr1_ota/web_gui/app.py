@@ -2,40 +2,37 @@
 """
 SmartBall OTA Web GUI — Scan, upgrade (Serial/BLE/Debugger), read version, activate
 """
+import contextlib
 import os
 import sys
 import subprocess
 import glob
 import json
+import threading
 import time
-import asyncio
-import fcntl
-from contextlib import contextmanager
-from io import StringIO
+import uuid
+from collections import OrderedDict
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify
-
-BLE_LOCK_FILE = "/var/lock/smartball_ble.lock"
-
-
-@contextmanager
-def _ble_lock():
-    """Acquire BLE exclusivity lock (Phase 1). Use for OTA and FSX. Blocks until acquired."""
-    lock_fd = os.open(BLE_LOCK_FILE, os.O_CREAT | os.O_RDWR, 0o644)
-    try:
-        fcntl.flock(lock_fd, fcntl.LOCK_EX)
-        yield
-    finally:
-        fcntl.flock(lock_fd, fcntl.LOCK_UN)
-        os.close(lock_fd)
+from urllib.parse import quote
+from flask import Flask, Response, render_template, request, jsonify
+
+import async_runner
+import bluez_dbus
+import jobs
+import response_cache
+import status_stream
+import svtshot3
+from device_registry import DeviceRegistry
+from shot_archive import SAVED_SHOTS_DIR, get_archive
 
 app = Flask(__name__)
 TOOLS_DIR = Path(__file__).resolve().parents[2]
 VENV = TOOLS_DIR / ".venv" / "bin"
 SMPMGR = VENV / "smpmgr"
+# Per-step smpclient timeout (connect, each request); run_sync gets the sum so a stuck call cannot hang
+SMP_TIMEOUT = 25.0
 IMAGES_DIR = Path(__file__).resolve().parent.parent / "images"
 WS = TOOLS_DIR / "ncs-workspace"
-SAVED_SHOTS_DIR = Path(__file__).resolve().parent / "saved_shots"
 DBUS = "unix:path=/var/run/dbus/system_bus_socket"
 
 BT_OFF_MSG = (
@@ -44,8 +41,25 @@ BT_OFF_MSG = (
 )
 BT_OFF_HINTS = ("network is down", "no default controller", "org.bluez", "connection refused", "invalid device")
 
-# Server-side BLE connection: after scan+connect, address is stored. Kept until OTA (never user-disconnect).
-_connected_ble_addr = None
+# Server-side BLE devices: each scan+connect registers one (several balls/adapters may be active at once).
+# Requests without an address use the most recently used device. OTA/FSX lock per device and adapter.
+_devices = DeviceRegistry()
+
+# Long operations can run as background jobs (POST /api/jobs) instead of holding the request thread
+_jobs = jobs.JobManager()
+
+# Live STATUS: one poller per device shared by every open tab (GET /api/status/stream). BLE polling pauses
+# while OTA, FSX, a BLE shot fetch or an SMP version call holds the device (_devices.exclusive).
+_status = status_stream.StatusHub(paused=lambda link: link.kind == "ble" and _devices.busy(link.device))
+SSE_KEEPALIVE_SEC = 15.0
+
+# Read-only commands (ID, STATUS, DIAG, GET_CFG, LIST_SHOTS) are cached and deduplicated per device
+_responses = response_cache.get_cache()
+
+# Shots fetched with "format": "binary", kept for GET /api/shot/payload/<token> (oldest dropped first)
+FETCHED_SHOTS_KEPT = 4
+_fetched_shots: OrderedDict = OrderedDict()
+_fetched_lock = threading.Lock()
 
 # WiFi (ESP32-C6): discovered device URL from GET /api/ip scan. Set on startup and in background.
 _wifi_device_url = None
@@ -83,126 +97,51 @@ def _save_wifi_url(url: str) -> None:
         pass
 
 
-def _try_connect_wifi():
-    """Probe for SmartBall ESP32-C6 on local network (GET /api/ip). Sets _wifi_device_url on success."""
+def _try_connect_wifi(full: bool = True):
+    """Probe for SmartBall ESP32-C6 on the local network (GET /api/ip, concurrent; known addresses first).
+    full=False skips the subnet sweep when a known/default address answers. Sets _wifi_device_url on success."""
     global _wifi_device_url
-    try:
-        import requests
-    except ImportError:
+    import wifi_discovery
+    found = wifi_discovery.discover_sync(full)
+    if not found:
         return False
-    # Quick list: common subnets and likely IPs (same network as host, or common defaults)
-    quick_ips = [
-        "192.168.68.89", "192.168.68.2", "192.168.68.100", "192.168.68.254",
-        "192.168.4.1", "192.168.4.2",  # AP mode
-        "192.168.1.254", "192.168.1.100", "192.168.1.2",
-    ]
-    for ip in quick_ips:
-        try:
-            r = requests.get(f"http://{ip}/api/ip", timeout=0.6)
-            if r.status_code == 200 and r.text and r.text.strip():
-                _wifi_device_url = f"http://{ip}"
-                _save_wifi_url(_wifi_device_url)
-                return True
-        except Exception:
-            continue
-    # Optional: scan current subnet (e.g. 192.168.68.2–30) in one pass
-    import socket
-    try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.settimeout(0.5)
-        s.connect(("8.8.8.8", 80))
-        local_ip = s.getsockname()[0]
-        s.close()
-        prefix = ".".join(local_ip.split(".")[:3])
-        for i in (89, 2, 1, 100, 50, 254) + tuple(range(3, 30)):
-            if f"{prefix}.{i}" in quick_ips:
-                continue
-            ip = f"{prefix}.{i}"
-            try:
-                r = requests.get(f"http://{ip}/api/ip", timeout=0.5)
-                if r.status_code == 200 and r.text and r.text.strip():
-                    _wifi_device_url = f"http://{ip}"
-                    _save_wifi_url(_wifi_device_url)
-                    return True
-            except Exception:
-                continue
-    except Exception:
-        pass
-    return False
+    urls = [d.url for d in found]
+    _wifi_device_url = _wifi_device_url if _wifi_device_url in urls else urls[0]
+    _save_wifi_url(_wifi_device_url)
+    return True
 
 
-def _try_connect_wifi_quick(max_ips: int = 6):
-    """Like _try_connect_wifi but only tries first max_ips from quick_ips (fast startup)."""
-    global _wifi_device_url
-    try:
-        import requests
-    except ImportError:
-        return False
-    quick_ips = [
-        "192.168.68.89", "192.168.68.2", "192.168.68.100", "192.168.4.1",
-        "192.168.1.254", "192.168.1.100",
-    ]
-    for ip in quick_ips[:max_ips]:
-        try:
-            r = requests.get(f"http://{ip}/api/ip", timeout=0.5)
-            if r.status_code == 200 and r.text and r.text.strip():
-                _wifi_device_url = f"http://{ip}"
-                _save_wifi_url(_wifi_device_url)
-                return True
-        except Exception:
-            continue
-    return False
+def _try_connect_wifi_quick():
+    """Fast startup: known and default addresses only, subnet sweep only if none answers."""
+    return _try_connect_wifi(full=False)
 
 
 # Background thread: connect to SmartBall at backend start, keep trying until found
 def _try_connect_smartball():
-    """Try to find and connect to SmartBall. Sets _connected_ble_addr on success."""
-    global _connected_ble_addr
-    if _connected_ble_addr:
+    """Try to find and connect to SmartBall. Registers it in _devices on success."""
+    if _devices.default():
         return True
     if not _is_bluetooth_up():
         _ensure_bluetooth_on()
         time.sleep(1)
         if not _is_bluetooth_up():
             return False
-    devices = []
-    try:
-        code2, out2, err2 = _run(["bluetoothctl", "devices"], timeout=3)
-        if err2 and any(h in (err2 or "").lower() for h in ("no default", "org.bluez", "connection refused")):
-            return False
-        for line in (out2 or "").splitlines():
-            parts = line.split(None, 2)
-            if len(parts) >= 2 and parts[0] == "Device":
-                addr, name = parts[1], (parts[2] if len(parts) > 2 else "").strip()
-                if "smartball" in (name or "").lower() or not name:
-                    devices.append({"address": addr, "name": name or "(no name)"})
-    except Exception:
-        pass
+    devices, err = _bt_devices()
+    if err:
+        return False
     # If cache empty, run short BLE scan to discover SmartBall
-    if not devices:
-        try:
-            subprocess.run(["bluetoothctl", "scan", "on"], capture_output=True, timeout=2, env=_env())
-            time.sleep(5)
-            subprocess.run(["bluetoothctl", "scan", "off"], capture_output=True, timeout=2, env=_env())
-            code2, out2, _ = _run(["bluetoothctl", "devices"], timeout=3)
-            for line in (out2 or "").splitlines():
-                parts = line.split(None, 2)
-                if len(parts) >= 2 and parts[0] == "Device":
-                    addr, name = parts[1], (parts[2] if len(parts) > 2 else "").strip()
-                    if "smartball" in (name or "").lower() or not name:
-                        devices.append({"address": addr, "name": name or "(no name)"})
-        except Exception:
-            pass
+    if not devices and _bt_scan() is None:
+        devices, _ = _bt_devices()
     if not devices:
         return False
     addr = devices[0]["address"]
     _stop_ble_scan()
-    subprocess.run(["bluetoothctl", "disconnect", addr], capture_output=True, timeout=5, env=_env())
-    time.sleep(2)
+    _bt_disconnect(addr)
+    bluez_dbus.settle_released_sync(addr, 2)
     code_c, _, _ = _run([str(SMPMGR), "--ble", addr, "--timeout", "12", "image", "state-read"], timeout=18)
     _restart_ble_autoconnect()
     if code_c == 0:
-        _connected_ble_addr = addr
+        _devices.add(addr, devices[0]["name"])
         return True
     return False
 
@@ -212,7 +151,7 @@ def _background_connect_loop():
     global _wifi_device_url
     _try_connect_wifi()  # check once at thread start
     while True:
-        if _connected_ble_addr:
+        if _devices.default():
             time.sleep(10)
             if not _wifi_device_url:
                 saved = _load_saved_wifi_url()
@@ -231,17 +170,41 @@ def _background_connect_loop():
         time.sleep(8)
 
 
+def _release_ble_session(addr=None):
+    """Close the persistent binary-protocol session (one device, or all) so smpmgr/Bleak/bluetoothctl
+    get the device to themselves (releasing all also stops the background scanner). Next binary command reconnects."""
+    try:
+        from ble_binary_client import close_session_sync, close_all_sessions_sync, stop_scanner_sync
+        if addr:
+            close_session_sync(addr)
+        else:
+            close_all_sessions_sync()
+            stop_scanner_sync()
+    except Exception:
+        pass
+
+
+def _release_serial_transport(port: str) -> None:
+    """Close the binary-protocol serial transport on port (if open) so smpmgr can use it."""
+    from transport import close_transport
+    try:
+        async_runner.run_sync(close_transport("serial", port), timeout=5.0)
+    except Exception:
+        pass
+
+
 def _stop_ble_scan():
     """Stop bluetooth-autoconnect and any BLE scan so smpmgr/Bleak can start its own.
     Fixes org.bluez.Error.InProgress (Operation already in progress)."""
     import time
+    _release_ble_session()
     script = Path(__file__).resolve().parent / "stop_ble_for_mcumgr.sh"
     try:
         if script.is_file():
             subprocess.run(["sudo", "-n", str(script)], capture_output=True, timeout=20, env=_env())
         else:
-            subprocess.run(["bluetoothctl", "scan", "off"], capture_output=True, timeout=3, env=_env())
-            time.sleep(2)
+            _bt_stop_discovery()
+            bluez_dbus.settle_adapter_sync(2)
     except Exception:
         pass
 
@@ -249,24 +212,21 @@ def _stop_ble_scan():
 def _prepare_ble_gentle(addr):
     """Release BLE without restarting bluetoothd (avoids 'No Bluetooth adapters found').
     Stop autoconnect, disconnect device, scan off, wait."""
+    _release_ble_session(addr)
     try:
         subprocess.run(["sudo", "-n", "systemctl", "stop", "bluetooth-autoconnect.service"], capture_output=True, timeout=5, env=_env())
     except Exception:
         pass
-    subprocess.run(["bluetoothctl", "scan", "off"], capture_output=True, timeout=3, env=_env())
-    subprocess.run(["bluetoothctl", "disconnect", addr], capture_output=True, timeout=5, env=_env())
-    time.sleep(4)
+    _bt_stop_discovery()
+    _bt_disconnect(addr)
+    bluez_dbus.settle_released_sync(addr, 4)
 
 
 def _prepare_ble_before_smpmgr(addr):
     """After _stop_ble_scan: disconnect device and wait so smpmgr gets a clean connection."""
-    subprocess.run(
-        ["bluetoothctl", "disconnect", addr],
-        capture_output=True,
-        timeout=5,
-        env=_env(),
-    )
-    time.sleep(3)
+    _release_ble_session(addr)
+    _bt_disconnect(addr)
+    bluez_dbus.settle_released_sync(addr, 3)
 
 
 def _restart_ble_autoconnect():
@@ -302,7 +262,10 @@ def index():
 
 
 def _is_bluetooth_up():
-    """Return True if hci0 is UP RUNNING."""
+    """Return True if the adapter is powered (BlueZ D-Bus cache; `hciconfig hci0` if the bus is unreachable)."""
+    state, err = bluez_dbus.adapter_state_sync()
+    if err is None:
+        return state["powered"]
     try:
         r = subprocess.run(
             ["hciconfig", "hci0"],
@@ -315,77 +278,113 @@ def _is_bluetooth_up():
         return False
 
 
+def _bt_devices():
+    """(devices, err): SmartBall candidates BlueZ already knows (name contains SmartBall, or no name), named first.
+    err is BT_OFF_MSG when the adapter is off."""
+    known, err = bluez_dbus.known_devices_sync()
+    if err is None:
+        if not _is_bluetooth_up():
+            return [], BT_OFF_MSG
+        devices = [{"address": d["address"], "name": d["name"] or "(no name)"} for d in known
+                   if "smartball" in (d["name"] or "").lower() or not d["name"]]
+        devices.sort(key=lambda d: d["name"] == "(no name)")
+        return devices, None
+    # No system bus (e.g. dbus-fast missing): parse `bluetoothctl devices`
+    devices = []
+    try:
+        code2, out2, err2 = _run(["bluetoothctl", "devices"], timeout=3)
+    except subprocess.TimeoutExpired:
+        return devices, None
+    except OSError as e:
+        return devices, str(e)
+    if err2 and any(h in (err2 or "").lower() for h in ("no default", "org.bluez", "connection refused")):
+        return devices, BT_OFF_MSG
+    for line in (out2 or "").splitlines():
+        parts = line.split(None, 2)
+        if len(parts) >= 2 and parts[0] == "Device":
+            addr, name = parts[1], (parts[2] if len(parts) > 2 else "").strip()
+            # Include SmartBall by name, or devices with no name (BLE often shows address-only)
+            if "smartball" in (name or "").lower() or not name:
+                devices.append({"address": addr, "name": name or "(no name)"})
+    return devices, None
+
+
+def _bt_scan(seconds=5.0):
+    """Run BLE discovery so nearby devices land in BlueZ's device list: until a SmartBall shows up,
+    at most `seconds`. Returns error or None."""
+    err = bluez_dbus.discover_sync(seconds, lambda d: "smartball" in (d["name"] or "").lower())
+    if err is None:
+        return None
+    if bluez_dbus.get_controller().ready:
+        return err
+    try:
+        r = subprocess.run(["bluetoothctl", "scan", "on"], capture_output=True, text=True, timeout=2, env=_env())
+        if r.returncode != 0 and any(h in (r.stderr or "").lower() for h in ("no default", "org.bluez", "connection refused")):
+            return BT_OFF_MSG
+        time.sleep(seconds)
+        subprocess.run(["bluetoothctl", "scan", "off"], capture_output=True, timeout=2, env=_env())
+    except (subprocess.TimeoutExpired, Exception) as e:
+        return str(e)
+    return None
+
+
+def _bt_stop_discovery():
+    """Stop discovery (scan off only; does NOT power off the adapter)."""
+    if bluez_dbus.stop_discovery_sync() is not None and not bluez_dbus.get_controller().ready:
+        try:
+            subprocess.run(["bluetoothctl", "scan", "off"], capture_output=True, timeout=3, env=_env())
+        except Exception:
+            pass
+
+
+def _bt_disconnect(addr):
+    """Disconnect addr at the BlueZ level so smpmgr/Bleak can make their own connection."""
+    if bluez_dbus.disconnect_sync(addr) is not None and not bluez_dbus.get_controller().ready:
+        try:
+            subprocess.run(["bluetoothctl", "disconnect", addr], capture_output=True, timeout=5, env=_env())
+        except Exception:
+            pass
+
+
 def _ensure_bluetooth_on():
-    """Unblock, start bluetoothd, and bring hci0 up. Skip if already up."""
+    """Power the adapter over D-Bus; if that is not enough, unblock, start bluetoothd and bring hci0 up.
+    Skip if already up."""
     import time
     if _is_bluetooth_up():
         return
+    if bluez_dbus.set_powered_sync(True) is None and _is_bluetooth_up():
+        return
     script = Path(__file__).resolve().parent / "enable_bluetooth.sh"
     try:
         subprocess.run(["rfkill", "unblock", "bluetooth"], capture_output=True, timeout=3)
         if script.is_file():
             subprocess.run(["sudo", "-n", str(script)], capture_output=True, timeout=10)
-        else:
+        elif bluez_dbus.set_powered_sync(True) is not None:
             subprocess.run(["bluetoothctl", "--", "power", "on"], capture_output=True, timeout=5, env=_env())
         time.sleep(0.5)
     except (FileNotFoundError, subprocess.TimeoutExpired, Exception):
         pass
 
 
-@app.route("/api/scan/ble", methods=["POST"])
-def scan_ble():
-    """Scan for SmartBall. Fast path: cached devices; else bluetoothctl scan 5s (BLE) or hcitool 10s."""
+def _scan_ble_impl(data: dict):
+    """BLE scan and connect (POST /api/scan/ble and scan_ble jobs)."""
     import subprocess
     devices = []
     code = 0
     err = None
     try:
         _ensure_bluetooth_on()
-        # 1. Try cached devices first (fast, ~1-2s)
-        try:
-            code2, out2, err2 = _run(["bluetoothctl", "devices"], timeout=3)
-            if err2 and any(h in (err2 or "").lower() for h in ("no default", "org.bluez", "connection refused")):
-                err = BT_OFF_MSG
-                return jsonify({"devices": [], "error": err})
-            for line in (out2 or "").splitlines():
-                parts = line.split(None, 2)
-                if len(parts) >= 2 and parts[0] == "Device":
-                    addr, name = parts[1], (parts[2] if len(parts) > 2 else "").strip()
-                    # Include SmartBall by name, or devices with no name (BLE often shows address-only)
-                    if "smartball" in (name or "").lower() or not name:
-                        devices.append({"address": addr, "name": name or "(no name)"})
-        except subprocess.TimeoutExpired:
-            pass
-        # 2. If not cached, run short scan: bluetoothctl scan 5s (BLE, ~7s total vs hcitool 10s)
+        # 1. Devices BlueZ already knows (in-process D-Bus cache, no scan)
+        devices, err = _bt_devices()
+        if err:
+            return {"devices": [], "error": err}
+        # 2. If not cached, run a short BLE discovery (5s, vs hcitool 10s)
         if not devices:
-            try:
-                r = subprocess.run(
-                    ["bluetoothctl", "scan", "on"],
-                    capture_output=True,
-                    text=True,
-                    timeout=2,
-                    env=_env(),
-                )
-                if r.returncode != 0 and any(h in (r.stderr or "").lower() for h in ("no default", "org.bluez", "connection refused")):
-                    err = BT_OFF_MSG
-                    return jsonify({"devices": [], "error": err})
-                time.sleep(5)
-                # scan off = stop discovery only; does NOT power off the adapter
-                subprocess.run(
-                    ["bluetoothctl", "scan", "off"],
-                    capture_output=True,
-                    timeout=2,
-                    env=_env(),
-                )
-                code2, out2, _ = _run(["bluetoothctl", "devices"], timeout=3)
-                for line in (out2 or "").splitlines():
-                    parts = line.split(None, 2)
-                    if len(parts) >= 2 and parts[0] == "Device":
-                        addr, name = parts[1], (parts[2] if len(parts) > 2 else "").strip()
-                        if "smartball" in (name or "").lower() or not name:
-                            devices.append({"address": addr, "name": name or "(no name)"})
-            except (subprocess.TimeoutExpired, Exception):
-                pass
+            jobs.report(phase="discover")
+            scan_err = _bt_scan()
+            if scan_err and (scan_err == BT_OFF_MSG or any(h in scan_err.lower() for h in BT_OFF_HINTS)):
+                return {"devices": [], "error": BT_OFF_MSG}
+            devices, _ = _bt_devices()
         # 3. Fallback: hcitool scan (classic, ~10s)
         if not devices:
             code, out, err = _run(["hcitool", "-i", "hci0", "scan"], timeout=12)
@@ -407,20 +406,19 @@ def scan_ble():
         err = BT_OFF_MSG
     # If SmartBall found: connect (verify with smpmgr) and store address for subsequent operations
     # Must disconnect first if SmartBall is already connected (bluetooth-autoconnect, etc.) or Bleak gets InProgress.
-    global _connected_ble_addr
     connected = False
     connect_err = None
+    addr = None
     if devices and not err:
-        addr = devices[0]["address"]
+        # Several balls in range: the request may pick one; it is added alongside already-connected ones
+        wanted = (data.get("address") or "").strip().upper()
+        pick = next((d for d in devices if d["address"].upper() == wanted), devices[0])
+        addr = pick["address"]
+        jobs.report(phase="connect", address=addr, found=len(devices))
         _stop_ble_scan()
         # Explicitly disconnect so smpmgr/Bleak can connect (fixes "connect failed" when device visible in BT)
-        subprocess.run(
-            ["bluetoothctl", "disconnect", addr],
-            capture_output=True,
-            timeout=5,
-            env=_env(),
-        )
-        time.sleep(3)  # BlueZ needs time to release; avoids org.bluez.Error.InProgress
+        _bt_disconnect(addr)
+        bluez_dbus.settle_released_sync(addr, 3)  # BlueZ must release first; avoids org.bluez.Error.InProgress
         code_c, out_c, err_c = _run([str(SMPMGR), "--ble", addr, "--timeout", "25", "image", "state-read"])
         if code_c != 0 and "InProgress" in (err_c or "") + (out_c or ""):
             time.sleep(5)
@@ -429,16 +427,22 @@ def scan_ble():
         if code_c != 0:
             connect_err = (err_c or "").strip() or (out_c or "").strip() or "Connection failed"
         if code_c == 0:
-            _connected_ble_addr = addr
+            _devices.add(addr, pick["name"])
             connected = True
-    return jsonify({
+    return {
         "devices": devices,
         "error": err,
         "connected": connected,
-        "address": _connected_ble_addr,
+        "address": addr if connected else _devices.default(),
         "bt_enabled": _is_bluetooth_up(),
         "connect_error": connect_err if devices and not connected else None,
-    })
+    }
+
+
+@app.route("/api/scan/ble", methods=["POST"])
+def scan_ble():
+    """Scan for SmartBall. Fast path: devices BlueZ already knows; else 5s BLE discovery or hcitool 10s."""
+    return _scan_ble_impl(request.get_json(silent=True) or {})
 
 
 def _list_serial_port_candidates():
@@ -500,10 +504,9 @@ def scan_debugger():
 def _open_and_read_device_ids(port: str, timeout: float = 6.0) -> tuple[str | None, str | None]:
     """Open port and read device identity (serial + part). Returns (serial, part) or (None, None)."""
     try:
-        import asyncio
         sys.path.insert(0, str(TOOLS_DIR / "msr1_ota"))
         from device_identity import query_serial
-        ident = asyncio.run(query_serial(port, timeout=timeout))
+        ident = async_runner.run_sync(query_serial(port, timeout=timeout), timeout=timeout + 5.0)
         if ident and ident.get("rc") == 0:
             return (ident.get("serial"), ident.get("part"))
     except Exception:
@@ -616,11 +619,13 @@ def get_connection():
             _wifi_device_url = device_url_param.rstrip("/")
             _save_wifi_url(_wifi_device_url)
     bt_up = _is_bluetooth_up()
-    connected = bt_up and _connected_ble_addr is not None
+    addr = _devices.default()
+    connected = bt_up and addr is not None
     out = {
         "bt_enabled": bt_up,
         "connected": connected,
-        "address": _connected_ble_addr if connected else None,
+        "address": addr if connected else None,
+        "devices": [e.to_dict() for e in _devices.entries()] if bt_up else [],
         "wifi_device_url": _wifi_device_url,
         "wifi_connected": _wifi_device_url is not None,
     }
@@ -631,39 +636,16 @@ def get_connection():
 def check_cached():
     """Check cached BT devices only (no scan). If SmartBall is in cache, try to connect.
     Use on page load so SmartBall is detected when already visible in system BT."""
-    global _connected_ble_addr
     bt_up = _is_bluetooth_up()
-    if _connected_ble_addr and bt_up:
-        return jsonify({"bt_enabled": True, "connected": True, "address": _connected_ble_addr})
-    devices = []
-    try:
-        _ensure_bluetooth_on()
-        code2, out2, err2 = _run(["bluetoothctl", "devices"], timeout=3)
-        if err2 and any(h in (err2 or "").lower() for h in ("no default", "org.bluez", "connection refused")):
-            return jsonify({"bt_enabled": False, "connected": False, "address": None, "found_address": None})
-        for line in (out2 or "").splitlines():
-            parts = line.split(None, 2)
-            if len(parts) >= 2 and parts[0] == "Device":
-                addr, name = parts[1], (parts[2] if len(parts) > 2 else "").strip()
-                if "smartball" in (name or "").lower() or not name:
-                    devices.append({"address": addr, "name": name or "(no name)"})
-    except Exception:
-        pass
+    if _devices.default() and bt_up:
+        return jsonify({"bt_enabled": True, "connected": True, "address": _devices.default()})
+    _ensure_bluetooth_on()
+    devices, err = _bt_devices()
+    if err:
+        return jsonify({"bt_enabled": False, "connected": False, "address": None, "found_address": None})
     # If cache empty, run short BLE scan so SmartBall can be discovered (fixes stuck "Searching for SmartBall…")
-    if not devices:
-        try:
-            subprocess.run(["bluetoothctl", "scan", "on"], capture_output=True, timeout=2, env=_env())
-            time.sleep(5)
-            subprocess.run(["bluetoothctl", "scan", "off"], capture_output=True, timeout=2, env=_env())
-            code2, out2, _ = _run(["bluetoothctl", "devices"], timeout=3)
-            for line in (out2 or "").splitlines():
-                parts = line.split(None, 2)
-                if len(parts) >= 2 and parts[0] == "Device":
-                    addr, name = parts[1], (parts[2] if len(parts) > 2 else "").strip()
-                    if "smartball" in (name or "").lower() or not name:
-                        devices.append({"address": addr, "name": name or "(no name)"})
-        except Exception:
-            pass
+    if not devices and _bt_scan() is None:
+        devices, _ = _bt_devices()
     if not devices:
         return jsonify({"bt_enabled": _is_bluetooth_up(), "connected": False, "address": None, "found_address": None})
     addr = devices[0]["address"]
@@ -675,23 +657,50 @@ def check_cached():
         code_c, out_c, err_c = _run([str(SMPMGR), "--ble", addr, "--timeout", "12", "image", "state-read"], timeout=18)
     _restart_ble_autoconnect()
     if code_c == 0:
-        _connected_ble_addr = addr
+        _devices.add(addr, devices[0]["name"])
+    connected = code_c == 0
     return jsonify({
         "bt_enabled": _is_bluetooth_up(),
-        "connected": _connected_ble_addr is not None,
-        "address": _connected_ble_addr,
-        "found_address": addr if _connected_ble_addr is None else None,
+        "connected": connected,
+        "address": addr if connected else None,
+        "found_address": None if connected else addr,
     })
 
 
 @app.route("/api/disconnect", methods=["POST"])
 def disconnect():
-    """Clear BLE connection. Only used internally before OTA (GUI does not expose)."""
-    global _connected_ble_addr
-    _connected_ble_addr = None
+    """Forget a BLE device (address in body), or all of them. Only used internally before OTA (GUI does not expose)."""
+    addr = ((request.get_json(silent=True) or {}).get("address") or "").strip()
+    if addr:
+        _devices.remove(addr)
+    else:
+        _devices.clear()
     return jsonify({"ok": True})
 
 
+@app.route("/api/devices", methods=["GET"])
+def list_devices():
+    """Registered SmartBalls with their pinned adapter, plus the adapters BlueZ reports."""
+    adapters, _ = bluez_dbus.adapters_sync()
+    return jsonify({
+        "devices": [e.to_dict() for e in _devices.entries()],
+        "default": _devices.default(),
+        "adapters": [{k: a[k] for k in ("name", "address", "powered")} for a in adapters or []],
+    })
+
+
+@app.route("/api/devices", methods=["POST"])
+def add_device():
+    """Register a SmartBall by address (no scan). Optional name and adapter ("hci1"); otherwise the least
+    loaded adapter is assigned. The binary session connects on first command."""
+    data = request.get_json(silent=True) or {}
+    addr = (data.get("address") or "").strip()
+    if not addr:
+        return jsonify({"ok": False, "error": "address required"}), 400
+    entry = _devices.add(addr, data.get("name"), (data.get("adapter") or "").strip() or None)
+    return jsonify({"ok": True, "device": entry.to_dict()})
+
+
 @app.route("/api/images", methods=["GET"])
 def list_images():
     """List v1/v2 images."""
@@ -707,6 +716,14 @@ def list_images():
     return jsonify({"images": imgs})
 
 
+def _run_smp(coro, timeout: float) -> tuple[int, str, str]:
+    """Run an smpclient coroutine on the shared loop with an overall timeout; errors become (1, "", message)."""
+    try:
+        return async_runner.run_sync(coro, timeout=timeout)
+    except Exception as e:
+        return 1, "", str(e) or f"{type(e).__name__} (limit {timeout:.0f} s)"
+
+
 def _activate_slot_via_smp(transport: str, addr: str | None, port: str, slot: str) -> tuple[int, str, str]:
     """Activate slot A (0) or B (1). A=confirm running. B=mark for test + reboot (user must confirm after reconnect)."""
     slot_num = 1 if slot.upper() == "B" else 0
@@ -728,44 +745,38 @@ def _activate_slot_via_smp(transport: str, addr: str | None, port: str, slot: st
         return 1, "", "BLE requires address"
 
     async def run():
-        await client.connect(25.0)
-        if slot_num == 0:
-            r2 = await client.request(ImageStatesWrite(confirm=True), 25.0)
-            await client.disconnect()
+        await client.connect(SMP_TIMEOUT)
+        try:
+            if slot_num == 0:
+                r2 = await client.request(ImageStatesWrite(confirm=True), SMP_TIMEOUT)
+                if smp_error(r2):
+                    return 1, "", str(r2)
+                return 0, "Slot A (running) confirmed.", ""
+            r = await client.request(ImageStatesRead(), SMP_TIMEOUT)
+            if smp_error(r):
+                return 1, "", str(r)
+            if not success(r) or not hasattr(r, "images"):
+                return 1, "", "Invalid state-read response"
+            img = next((x for x in r.images if x.slot == 1), None)
+            if not img:
+                return 1, "", "No image in slot B"
+            hash_bytes = getattr(img, "hash", None)
+            if hash_bytes is None or (isinstance(hash_bytes, bytes) and len(hash_bytes) == 0):
+                return 1, "", "Slot B has no hash"
+            r2 = await client.request(ImageStatesWrite(hash=hash_bytes, confirm=False), SMP_TIMEOUT)
             if smp_error(r2):
                 return 1, "", str(r2)
-            return 0, "Slot A (running) confirmed.", ""
-        r = await client.request(ImageStatesRead(), 25.0)
-        if smp_error(r):
-            return 1, "", str(r)
-        if not success(r) or not hasattr(r, "images"):
-            return 1, "", "Invalid state-read response"
-        img = next((x for x in r.images if x.slot == 1), None)
-        if not img:
-            return 1, "", "No image in slot B"
-        hash_bytes = getattr(img, "hash", None)
-        if hash_bytes is None or (isinstance(hash_bytes, bytes) and len(hash_bytes) == 0):
-            return 1, "", "Slot B has no hash"
-        r2 = await client.request(ImageStatesWrite(hash=hash_bytes, confirm=False), 25.0)
-        if smp_error(r2):
-            return 1, "", str(r2)
-        r3 = await client.request(ResetWrite(), 25.0)
-        await client.disconnect()
-        if smp_error(r3):
-            return 1, "", str(r3)
-        return 0, (
-            "Slot B marked for boot. Device is rebooting.\n"
-            "After it reconnects, select Slot A and click Activate to confirm."
-        ), ""
-
-    old_out, old_err = sys.stdout, sys.stderr
-    try:
-        sys.stdout, sys.stderr = StringIO(), StringIO()
-        return asyncio.run(run())
-    except Exception as e:
-        return 1, "", str(e)
-    finally:
-        sys.stdout, sys.stderr = old_out, old_err
+            r3 = await client.request(ResetWrite(), SMP_TIMEOUT)
+            if smp_error(r3):
+                return 1, "", str(r3)
+            return 0, (
+                "Slot B marked for boot. Device is rebooting.\n"
+                "After it reconnects, select Slot A and click Activate to confirm."
+            ), ""
+        finally:
+            await client.disconnect()
+
+    return _run_smp(run(), SMP_TIMEOUT * 4 + 5.0)
 
 
 def _read_version_via_smp(transport: str, addr: str | None, port: str) -> tuple[int, str, str]:
@@ -787,9 +798,11 @@ def _read_version_via_smp(transport: str, addr: str | None, port: str) -> tuple[
         return 1, "", "BLE requires address"
 
     async def run():
-        await client.connect(25.0)
-        r = await client.request(ImageStatesRead(), 25.0)
-        await client.disconnect()
+        await client.connect(SMP_TIMEOUT)
+        try:
+            r = await client.request(ImageStatesRead(), SMP_TIMEOUT)
+        finally:
+            await client.disconnect()
         if smp_error(r):
             return 1, "", str(r)
         if not success(r) or not hasattr(r, "images"):
@@ -811,14 +824,7 @@ def _read_version_via_smp(transport: str, addr: str | None, port: str) -> tuple[
             lines.append(f"Slot {slot_name} ({img.slot}): v{ver} — {flags_str}")
         return 0, "\n".join(lines), ""
 
-    old_out, old_err = sys.stdout, sys.stderr
-    try:
-        sys.stdout, sys.stderr = StringIO(), StringIO()
-        return asyncio.run(run())
-    except Exception as e:
-        return 1, "", str(e)
-    finally:
-        sys.stdout, sys.stderr = old_out, old_err
+    return _run_smp(run(), SMP_TIMEOUT * 2 + 5.0)
 
 
 def _ble_needs_recovery(err, out):
@@ -843,18 +849,24 @@ def _prepare_ble_for_smpclient(addr: str, use_full_recovery: bool = False) -> No
     If use_full_recovery: restart bluetooth (for InProgress). Else: gentle disconnect only."""
     if use_full_recovery:
         _stop_ble_scan()
-        time.sleep(5)  # Adapter stability after bluetooth restart
+        bluez_dbus.settle_adapter_sync(5)  # adapter back up after bluetooth restart
         _prepare_ble_before_smpmgr(addr)
-        time.sleep(5)  # Device time to advertise after disconnect
+        bluez_dbus.settle_advertising_sync(addr, 5)  # device advertising again after disconnect
     else:
         _prepare_ble_gentle(addr)
 
 
+def _ble_exclusive(transport: str, addr: str):
+    """_devices.exclusive(addr) for BLE work that drops and reconnects the device outside its session
+    (also pauses that device's status poller); no-op context for serial/WiFi."""
+    return _devices.exclusive(addr) if transport == "ble" else contextlib.nullcontext()
+
+
 @app.route("/api/version/read", methods=["POST"])
 def read_version():
     """Read image states via smpclient. Returns formatted slot summary."""
     data = request.get_json() or {}
-    addr = data.get("address") or data.get("addr") or _connected_ble_addr
+    addr = data.get("address") or data.get("addr") or _devices.default()
     transport = data.get("transport", "ble")
     if not addr and transport == "ble":
         return jsonify({"error": "Not connected. Scan for SmartBall first."}), 400
@@ -862,13 +874,16 @@ def read_version():
     # Proactively release BLE before first attempt. Full recovery (bluetooth restart) is
     # required for smpclient/Bleak—gentle prep often leaves "Notify acquired" or device
     # still held by bluetooth-autoconnect.
-    if transport == "ble":
-        _prepare_ble_for_smpclient(addr, use_full_recovery=True)
-    code, out, err = _read_version_via_smp(transport, addr, port)
-    if transport == "ble" and code != 0 and _ble_needs_recovery(err, out):
-        _prepare_ble_for_smpclient(addr, use_full_recovery=True)
+    with _ble_exclusive(transport, addr):
+        if transport == "ble":
+            _prepare_ble_for_smpclient(addr, use_full_recovery=True)
+        elif transport == "serial":
+            _release_serial_transport(port)
         code, out, err = _read_version_via_smp(transport, addr, port)
-        _restart_ble_autoconnect()
+        if transport == "ble" and code != 0 and _ble_needs_recovery(err, out):
+            _prepare_ble_for_smpclient(addr, use_full_recovery=True)
+            code, out, err = _read_version_via_smp(transport, addr, port)
+            _restart_ble_autoconnect()
     return jsonify({"ok": code == 0, "stdout": out, "stderr": err, "error": None if code == 0 else (err or out)})
 
 
@@ -876,37 +891,40 @@ def read_version():
 def activate_version():
     """Activate slot A (0) or B (1). Slot B requires reading hash from device first."""
     data = request.get_json() or {}
-    addr = data.get("address") or data.get("addr") or _connected_ble_addr
+    addr = data.get("address") or data.get("addr") or _devices.default()
     transport = data.get("transport", "ble")
     slot = data.get("slot", "A")  # A=primary/0, B=secondary/1
     if not addr and transport == "ble":
         return jsonify({"error": "Not connected. Scan for SmartBall first."}), 400
     port = data.get("port", "/dev/ttyACM0")
 
-    if transport == "ble":
-        _prepare_ble_for_smpclient(addr, use_full_recovery=False)
-    if slot.upper() == "B":
-        code, out, err = _activate_slot_via_smp(transport, addr, port, slot)
-        if transport == "ble" and code != 0 and _ble_needs_recovery(err, out):
-            _prepare_ble_for_smpclient(addr, use_full_recovery=True)
+    with _ble_exclusive(transport, addr):
+        if transport == "ble":
+            _prepare_ble_for_smpclient(addr, use_full_recovery=False)
+        elif transport == "serial":
+            _release_serial_transport(port)
+        if slot.upper() == "B":
             code, out, err = _activate_slot_via_smp(transport, addr, port, slot)
-            _restart_ble_autoconnect()
-    else:
-        if transport == "serial":
-            cmd = [str(SMPMGR), "--port", port, "--timeout", "20", "image", "state-write", "--confirm"]
+            if transport == "ble" and code != 0 and _ble_needs_recovery(err, out):
+                _prepare_ble_for_smpclient(addr, use_full_recovery=True)
+                code, out, err = _activate_slot_via_smp(transport, addr, port, slot)
+                _restart_ble_autoconnect()
         else:
-            cmd = [str(SMPMGR), "--ble", addr, "--timeout", "25", "image", "state-write", "--confirm"]
-        code, out, err = _run(cmd)
-        if transport == "ble" and code != 0 and _ble_needs_recovery(err, out):
-            _prepare_ble_for_smpclient(addr, use_full_recovery=True)
+            if transport == "serial":
+                cmd = [str(SMPMGR), "--port", port, "--timeout", "20", "image", "state-write", "--confirm"]
+            else:
+                cmd = [str(SMPMGR), "--ble", addr, "--timeout", "25", "image", "state-write", "--confirm"]
             code, out, err = _run(cmd)
-            _restart_ble_autoconnect()
+            if transport == "ble" and code != 0 and _ble_needs_recovery(err, out):
+                _prepare_ble_for_smpclient(addr, use_full_recovery=True)
+                code, out, err = _run(cmd)
+                _restart_ble_autoconnect()
     return jsonify({"ok": code == 0, "stdout": out, "stderr": err, "error": None if code == 0 else (err or out)})
 
 
 # --- BLE / WiFi Binary Protocol API ---
 def _get_binary_addr():
-    return _connected_ble_addr or (request.get_json(silent=True) or {}).get("address") or (request.args.get("address"))
+    return (request.get_json(silent=True) or {}).get("address") or request.args.get("address") or _devices.default()
 
 
 def _is_wifi_request(data=None):
@@ -976,78 +994,204 @@ def wifi_ping():
     return jsonify({"ok": False, "ip": None, "error": result})
 
 
+@app.route("/api/wifi/http-stats", methods=["GET"])
+def wifi_http_stats():
+    """Keep-alive pool counters and mean connect / first-byte / transfer times per WiFi device."""
+    from wifi_binary_client import client_stats
+    return jsonify({"clients": client_stats()})
+
+
+@app.route("/api/wifi/devices", methods=["GET", "POST"])
+def wifi_devices():
+    """WiFi SmartBalls seen so far with last-seen times (GET), or probe now (POST, body {"full": true,
+    "subnets": ["192.168.4.0/24"]}; full=false probes known/default addresses only)."""
+    import wifi_discovery
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        subnets = data.get("subnets")
+        try:
+            found = wifi_discovery.discover_sync(bool(data.get("full", True)), subnets if subnets else None)
+        except ValueError as e:
+            return jsonify({"ok": False, "error": f"subnets: {e}"}), 400
+        return jsonify({"ok": True, "found": [d.to_dict() for d in found],
+                        "known": [d.to_dict() for d in wifi_discovery.get_discovery().known()]})
+    return jsonify({"ok": True, "known": [d.to_dict() for d in wifi_discovery.get_discovery().known()],
+                    "current": _wifi_device_url})
+
+
+def _forget_responses(kind: str, target: str) -> None:
+    """Drop every cached response of a device whose firmware or state changed outside the binary protocol."""
+    from transport import get_transport
+    async_runner.get_loop().call_soon_threadsafe(_responses.invalidate, get_transport(kind, target))
+
+
+def _request_transport(data):
+    """(Transport, None) for the request body, or (None, error). transport: "ble" (address, default the
+    connected device), "wifi" (device_url) or "serial" (port, baud); device_url alone implies WiFi."""
+    from transport import SERIAL_BAUD, get_transport
+    kind = (data.get("transport") or ("wifi" if data.get("device_url") else "ble")).lower()
+    if kind == "wifi":
+        url = _get_device_url(data)
+        if not url:
+            return None, "WiFi: device_url required (e.g. http://192.168.68.89)."
+        return get_transport("wifi", url), None
+    if kind == "serial":
+        port = (data.get("port") or "").strip()
+        if not port:
+            return None, "Serial: port required (e.g. /dev/ttyACM0)."
+        return get_transport("serial", port, baud=int(data.get("baud") or SERIAL_BAUD)), None
+    addr = (data.get("address") or _devices.default() or "").strip()
+    if not addr:
+        return None, "Not connected. Scan for SmartBall first."
+    return get_transport("ble", addr, adapter=_devices.adapter_for(addr)), None
+
+
+def _busy_error(link) -> str | None:
+    """Error for a BLE command while an exclusive operation (OTA, FSX, BLE shot fetch, SMP) holds the device:
+    sending would reconnect the session in the middle of it (the status poller pauses for the same reason)."""
+    if link.kind == "ble" and _devices.busy(link.device):
+        return "Device busy (OTA, FSX or shot fetch in progress). Try again when it has finished."
+    return None
+
+
 @app.route("/api/binary/send", methods=["POST"])
 def binary_send():
-    """Send a binary protocol command. BLE: address from scan. WiFi: device_url (e.g. http://192.168.68.89)."""
+    """Send a binary protocol command. BLE: address from scan. WiFi: device_url (e.g. http://192.168.68.89).
+    Serial: port (e.g. /dev/ttyACM0)."""
     data = request.get_json() or {}
-    transport = (data.get("transport") or ("wifi" if data.get("device_url") else "ble")).lower()
-    device_url = _get_device_url(data)
-    addr = data.get("address") or _connected_ble_addr
-
-    if transport == "wifi":
-        if not device_url:
-            return jsonify({"ok": False, "error": "WiFi: device_url required (e.g. http://192.168.68.89).", "response": None}), 400
-    else:
-        if not addr:
-            return jsonify({"ok": False, "error": "Not connected. Scan for SmartBall first.", "response": None}), 400
+    link, err = _request_transport(data)
+    if err:
+        return jsonify({"ok": False, "error": err, "response": None}), 400
+    err = _busy_error(link)
+    if err:
+        return jsonify({"ok": False, "error": err, "response": None}), 409
 
     cmd_name = (data.get("cmd") or "").upper()
-    payload_hex = data.get("payload", "")
-
-    from ble_binary_client import (
-        make_frame, format_response,
-        CMD_ID, CMD_STATUS, CMD_DIAG, CMD_SELFTEST, CMD_CLEAR_ERRORS,
-        CMD_SET, CMD_GET_CFG, CMD_SAVE_CFG, CMD_LOAD_CFG, CMD_FACTORY_RESET,
-        CMD_START_RECORD, CMD_STOP_RECORD, CMD_LIST_SHOTS, CMD_GET_SHOT, CMD_DEL_SHOT,
-        CMD_FORMAT_STORAGE, CMD_BUS_SCAN,
-    )
-    cmd_map = {
-        "ID": CMD_ID, "STATUS": CMD_STATUS, "DIAG": CMD_DIAG, "SELFTEST": CMD_SELFTEST,
-        "CLEAR_ERRORS": CMD_CLEAR_ERRORS, "SET": CMD_SET, "GET_CFG": CMD_GET_CFG,
-        "SAVE_CFG": CMD_SAVE_CFG, "LOAD_CFG": CMD_LOAD_CFG, "FACTORY_RESET": CMD_FACTORY_RESET,
-        "START_RECORD": CMD_START_RECORD, "STOP_RECORD": CMD_STOP_RECORD,
-        "LIST_SHOTS": CMD_LIST_SHOTS, "GET_SHOT": CMD_GET_SHOT, "DEL_SHOT": CMD_DEL_SHOT,
-        "FORMAT_STORAGE": CMD_FORMAT_STORAGE, "BUS_SCAN": CMD_BUS_SCAN,
-    }
-    cmd_id = cmd_map.get(cmd_name)
-    if cmd_id is None:
-        return jsonify({"ok": False, "error": f"Unknown cmd: {cmd_name}", "response": None}), 400
-    payload = bytes.fromhex(payload_hex.replace(" ", "")) if payload_hex else None
-    if cmd_name == "GET_CFG" and not payload_hex:
-        payload = b"\x00"
-    if payload is not None and len(payload) == 0:
-        payload = b"\x00"
-    frame = make_frame(cmd_id, payload=payload) if payload else make_frame(cmd_id)
-
-    if transport == "wifi":
-        from wifi_binary_client import send_binary_cmd
-        rsp, err = send_binary_cmd(device_url, frame)
-    else:
-        from ble_binary_client import send_binary_cmd_sync
-        rsp, err = send_binary_cmd_sync(addr, frame)
+    from ble_binary_client import build_cmd_frame, format_response
+    frame, err = build_cmd_frame(cmd_name, data.get("payload") or None)
+    if err:
+        return jsonify({"ok": False, "error": err, "response": None}), 400
 
+    max_age = 0.0 if data.get("no_cache") else None
+    rsp, err = async_runner.run_sync(_responses.send(link, frame, max_age=max_age))
     if err:
-        if "No route to host" in err or "Connection refused" in err or "Failed to establish" in err or "113" in err:
-            err = (
-                err + "\n\n"
-                "The machine RUNNING THE BACKEND (the Python server) must be on the same WiFi/LAN as the ESP32. "
-                "Your browser can be on any device; the backend does the HTTP requests to the ESP32.\n"
-                "• Run the backend on a PC/laptop that is connected to the same WiFi as the ESP32 (e.g. SinhaleD).\n"
-                "• Ensure the ESP32 is on and has joined WiFi (serial or router DHCP list for IP).\n"
-                "• If the ESP32 was just reflashed or rebooted, its IP may have changed — use Ping with the new IP or run serial_check_wifi.py to see the current IP.\n"
-                "• Debug with serial: plug ESP32 via USB and run: python3 msr1_esp32c6/scripts/serial_check_wifi.py /dev/ttyACM0 35 — to confirm device IP and WiFi status."
-            )
-        return jsonify({"ok": False, "error": err, "response": None})
+        return jsonify({"ok": False, "error": _binary_error_help(err), "response": None})
     if not rsp:
         return jsonify({"ok": False, "error": "No response from device (timeout or disconnected).", "response": "(no response)"})
-    formatted = format_response(rsp)
+    from response_decoder import decode_json
+    formatted = _binary_response_note(link.kind, cmd_name, rsp) + format_response(rsp)
+    return jsonify({"ok": True, "response": formatted, "decoded": decode_json(rsp), "raw_hex": rsp.hex()})
+
+
+@app.route("/api/status/stream", methods=["GET"])
+def status_stream_sse():
+    """Server-Sent Events: a decoded STATUS snapshot (state, samples, storage, BLE RSSI/MTU/packet counters)
+    every STATUS_POLL_SEC. Query: the /api/binary/send target (transport, address, device_url, port).
+    All viewers of one device share a single poller."""
+    link, err = _request_transport(request.args.to_dict())
+    if err:
+        return jsonify({"ok": False, "error": err}), 400
+    sub = _status.subscribe(link)
+
+    def events():
+        with sub:
+            yield "retry: 3000\n\n"
+            while True:
+                snap = sub.get(SSE_KEEPALIVE_SEC)
+                yield f"event: status\ndata: {json.dumps(snap)}\n\n" if snap else ": keep-alive\n\n"
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/api/status", methods=["GET"])
+def status_latest():
+    """Latest STATUS snapshot of every device being streamed (no radio traffic)."""
+    return jsonify({"devices": _status.snapshots()})
+
+
+@app.route("/api/binary/cache", methods=["GET", "DELETE"])
+def binary_cache():
+    """Response cache counters (GET) or drop all cached responses (DELETE)."""
+    if request.method == "DELETE":
+        async_runner.get_loop().call_soon_threadsafe(_responses.clear)
+    return jsonify({"ok": True, "stats": dict(_responses.stats)})
+
+
+@app.route("/api/binary/decode", methods=["POST"])
+def binary_decode():
+    """Decode a raw response frame (raw_hex) to structured JSON fields (response_decoder)."""
+    data = request.get_json(silent=True) or {}
+    try:
+        rsp = bytes.fromhex((data.get("raw_hex") or "").replace(" ", ""))
+    except ValueError:
+        return jsonify({"ok": False, "error": "raw_hex: invalid hex.", "decoded": None}), 400
+    from response_decoder import decode_json
+    decoded = decode_json(rsp)
+    if decoded is None:
+        return jsonify({"ok": False, "error": "Unknown or truncated response frame.", "decoded": None})
+    return jsonify({"ok": True, "decoded": decoded})
+
+
+def _binary_error_help(err: str) -> str:
+    """Append WiFi/LAN troubleshooting to network errors."""
+    if "No route to host" in err or "Connection refused" in err or "Failed to establish" in err or "113" in err:
+        return (
+            err + "\n\n"
+            "The machine RUNNING THE BACKEND (the Python server) must be on the same WiFi/LAN as the ESP32. "
+            "Your browser can be on any device; the backend does the HTTP requests to the ESP32.\n"
+            "• Run the backend on a PC/laptop that is connected to the same WiFi as the ESP32 (e.g. SinhaleD).\n"
+            "• Ensure the ESP32 is on and has joined WiFi (serial or router DHCP list for IP).\n"
+            "• If the ESP32 was just reflashed or rebooted, its IP may have changed — use Ping with the new IP or run serial_check_wifi.py to see the current IP.\n"
+            "• Debug with serial: plug ESP32 via USB and run: python3 msr1_esp32c6/scripts/serial_check_wifi.py /dev/ttyACM0 35 — to confirm device IP and WiFi status."
+        )
+    return err
+
+
+def _binary_response_note(transport: str, cmd_name: str, rsp: bytes) -> str:
+    """Hint prepended to a formatted response (old ESP32 firmware answers BUS_SCAN with STATUS)."""
     if transport == "wifi" and cmd_name == "BUS_SCAN" and len(rsp) >= 1 and rsp[0] == 0x86:
-        formatted = (
+        return (
             "Device returned STATUS (0x86) instead of BUS_SCAN (0x89). "
             "Reflash ESP32-C6 firmware (idf.py flash) to get BUS_SCAN support.\n\n"
-            + formatted
         )
-    return jsonify({"ok": True, "response": formatted, "raw_hex": rsp.hex()})
+    return ""
+
+
+def _binary_batch_impl(data: dict):
+    """Binary command batch (POST /api/binary/batch and binary_batch jobs)."""
+    cmds = data.get("cmds") or []
+    if not isinstance(cmds, list) or not cmds:
+        return {"ok": False, "error": "cmds: non-empty list of {cmd, payload} required.", "results": []}, 400
+    cmds = [c if isinstance(c, dict) else {"cmd": c} for c in cmds]
+
+    link, err = _request_transport(data)
+    if err:
+        return {"ok": False, "error": err, "results": []}, 400
+    err = _busy_error(link)
+    if err:
+        return {"ok": False, "error": err, "results": []}, 409
+
+    from transport import send_cmds
+    t0 = time.monotonic()
+    results = async_runner.run_sync(send_cmds(link, cmds))
+    for r in results:
+        if r["error"]:
+            r["error"] = _binary_error_help(r["error"])
+        elif r["raw_hex"]:
+            r["response"] = _binary_response_note(link.kind, r["cmd"], bytes.fromhex(r["raw_hex"])) + r["response"]
+    return {
+        "ok": all(r["ok"] for r in results),
+        "results": results,
+        "elapsed_ms": round((time.monotonic() - t0) * 1000, 1),
+    }
+
+
+@app.route("/api/binary/batch", methods=["POST"])
+def binary_batch():
+    """Run several binary commands over one link (BLE session, WiFi keep-alive or serial port).
+    Body: transport/address/device_url/port as /api/binary/send, cmds: [{"cmd": "STATUS", "payload": ""}, ...]."""
+    return _binary_batch_impl(request.get_json() or {})
 
 
 @app.route("/api/chip/read", methods=["POST"])
@@ -1056,7 +1200,7 @@ def chip_read():
     data = request.get_json() or {}
     if _is_wifi_request(data):
         return jsonify({"ok": False, "error": "SPI chip access not supported over WiFi (ESP32-C6 has no SPI sensors).", "data_hex": None}), 400
-    addr = data.get("address") or _connected_ble_addr
+    addr = data.get("address") or _devices.default()
     if not addr:
         return jsonify({"ok": False, "error": "Not connected. Scan for SmartBall first.", "data_hex": None}), 400
     try:
@@ -1082,7 +1226,7 @@ def chip_write():
     data = request.get_json() or {}
     if _is_wifi_request(data):
         return jsonify({"ok": False, "error": "SPI chip access not supported over WiFi (ESP32-C6 has no SPI sensors)."}), 400
-    addr = data.get("address") or _connected_ble_addr
+    addr = data.get("address") or _devices.default()
     if not addr:
         return jsonify({"ok": False, "error": "Not connected. Scan for SmartBall first."}), 400
     try:
@@ -1117,120 +1261,192 @@ def _normalize_shot_id(shot_id):
     return int(s, 10)
 
 
-@app.route("/api/shot/fetch", methods=["POST"])
-def shot_fetch():
-    """Fetch shot data. BLE: chunked. WiFi: use wifi_binary_client.fetch_shot_chunked_sync."""
+def _shot_meta(payload, **meta) -> dict:
+    """meta plus the SVTSHOT3 header fields of payload (sample_rate, count, sample_size) when it has one."""
+    hdr = svtshot3.parse_header(payload) or {}
+    meta.update({k: hdr.get(k, meta.get(k)) for k in ("sample_rate", "count", "sample_size")})
+    return meta
+
+
+def _octet_response(payload, meta: dict) -> Response:
+    """Raw shot bytes as application/octet-stream; each meta item becomes an X-Shot-<Key> header
+    (values percent-encoded, e.g. saved names)."""
+    rsp = Response(bytes(payload), mimetype="application/octet-stream")
+    for key, value in meta.items():
+        if value is not None:
+            rsp.headers["X-Shot-" + key.replace("_", "-").title()] = quote(str(value), safe=" :-_.")
+    return rsp
+
+
+def _stash_fetched(payload, meta: dict) -> str:
+    token = uuid.uuid4().hex[:16]
+    with _fetched_lock:
+        _fetched_shots[token] = (bytes(payload), meta)
+        while len(_fetched_shots) > FETCHED_SHOTS_KEPT:
+            _fetched_shots.popitem(last=False)
+    return token
+
+
+@app.route("/api/shot/payload/<token>", methods=["GET"])
+def shot_payload(token):
+    """Bytes of a shot fetched with "format": "binary" (application/octet-stream, metadata in X-Shot-* headers)."""
+    with _fetched_lock:
+        item = _fetched_shots.get(token)
+    if item is None:
+        return jsonify({"ok": False, "error": "Not found (fetched shots are kept for a short while only)."}), 404
+    return _octet_response(*item)
+
+
+def _shot_fetch_impl(data: dict):
+    """Shot fetch (POST /api/shot/fetch and shot_fetch jobs)."""
     try:
-        data = request.get_json() or {}
-        transport = (data.get("transport") or ("wifi" if data.get("device_url") else "ble")).lower()
-        device_url = _get_device_url(data)
-        addr = (data.get("address") or _connected_ble_addr or "").strip()
+        link, err = _request_transport(data)
+        if err:
+            return {"ok": False, "error": err, "raw_hex": None}, 400
         shot_id = data.get("shot_id")
         size = data.get("size", 0)
 
-        if transport == "wifi":
-            if not device_url:
-                return jsonify({"ok": False, "error": "WiFi: device_url required.", "raw_hex": None}), 400
-        else:
-            if not addr:
-                return jsonify({"ok": False, "error": "Not connected.", "raw_hex": None}), 400
-
         if shot_id is None:
-            return jsonify({"ok": False, "error": "shot_id required.", "raw_hex": None}), 400
+            return {"ok": False, "error": "shot_id required.", "raw_hex": None}, 400
         shot_id = _normalize_shot_id(shot_id)
         size = int(size) if size is not None else 0
         size = max(0, min(size, 1024 * 1024))
-
-        if transport == "wifi":
-            from wifi_binary_client import fetch_shot_chunked_sync
-            payload, err = fetch_shot_chunked_sync(device_url, shot_id, size, chunk_size=495, timeout_per_chunk=10.0)
-        else:
-            try:
-                subprocess.run(["bluetoothctl", "disconnect", addr], capture_output=True, timeout=5, env=_env())
-            except Exception:
-                pass
-            time.sleep(3)
-            _prepare_ble_gentle(addr)
-            from ble_binary_client import (
-                fetch_shot_one_connection_sync,
-                fetch_shot_chunked_sync,
-                _is_disconnect_error,
-            )
-            import struct
-            payload, err = fetch_shot_chunked_sync(
-                addr, shot_id, size,
-                chunk_size=495,
-                timeout_per_chunk=18.0,
-                between_segment_callback=lambda _: (_prepare_ble_gentle(addr), time.sleep(2)),
-            )
-            if err and (_is_disconnect_error(err) or "chunk failed" in (err or "").lower() or "incomplete fetch" in (err or "").lower()):
-                time.sleep(2)
+        # Chunks survive failed attempts and restarts; a retry resumes from the first missing offset
+        from shot_journal import open_journal
+        job = jobs.current_job()
+
+        def open_shot_journal():
+            if size <= 0:
+                return None
+            j = open_journal(link.device, shot_id, size)
+            # As a job: chunk writes (any thread) publish bytes/offset; resumed bytes count from the start
+            if job is not None:
+                job.update(phase="prepare", size=size, bytes=j.received, offset=j.next_missing(), retries=0)
+                j.on_write = lambda off, n: job.update(bytes=j.received, offset=off + n)
+            return j
+
+        def fetch(journal):
+            if link.kind != "ble":
+                from transport import fetch_shot
+                jobs.report(phase="fetch")
+                return async_runner.run_sync(
+                    fetch_shot(link, shot_id, size, timeout_per_chunk=10.0, journal=journal,
+                               progress=job.update if job is not None else None)
+                )
+            # BLE keeps its segmented/one-connection recovery chain (BlueZ needs the disconnect dance)
+            addr = link.device
+            # Exclusive like OTA/FSX: no other job and no status poll may reconnect while BlueZ is reset
+            jobs.report(phase="waiting for device lock")
+            with _devices.exclusive(addr):
+                _bt_disconnect(addr)
+                bluez_dbus.settle_released_sync(addr, 3)
                 _prepare_ble_gentle(addr)
-                payload2, err2 = fetch_shot_one_connection_sync(
+                from ble_binary_client import (
+                    fetch_shot_one_connection_sync,
+                    fetch_shot_chunked_sync,
+                    _is_disconnect_error,
+                )
+                from link_tuning import load_tuner, save_tuner
+                tuner = load_tuner(addr)
+                jobs.report(phase="fetch")
+                payload, err = fetch_shot_chunked_sync(
                     addr, shot_id, size,
                     chunk_size=495,
-                    timeout_per_chunk=20.0,
-                    delay_between_chunks_sec=0.02,
+                    timeout_per_chunk=18.0,
+                    between_segment_callback=lambda _: (_prepare_ble_gentle(addr),
+                                                        bluez_dbus.settle_advertising_sync(addr, 2)),
+                    journal=journal,
+                    tuner=tuner,
                 )
-                if not err2 and payload2:
-                    payload, err = payload2, None
+                if err and (_is_disconnect_error(err) or "chunk failed" in (err or "").lower() or "incomplete fetch" in (err or "").lower()):
+                    jobs.report(phase="fetch (one connection)", retries=1, last_error=err)
+                    _prepare_ble_gentle(addr)
+                    bluez_dbus.settle_advertising_sync(addr, 2)
+                    payload2, err2 = fetch_shot_one_connection_sync(
+                        addr, shot_id, size,
+                        chunk_size=495,
+                        timeout_per_chunk=20.0,
+                        delay_between_chunks_sec=0.02,
+                        journal=journal,
+                        tuner=tuner,
+                    )
+                    if not err2 and payload2:
+                        payload, err = payload2, None
+                save_tuner(addr, tuner)
+            return payload, err
+
+        journal = open_shot_journal()
+        payload, err = fetch(journal)
+        bad = None if err or not payload else svtshot3.verify(payload)
+        if bad and journal is not None:
+            # The journal is keyed on (device, shot_id, size) only: chunks kept from a deleted shot whose id
+            # was reused mix into this one. Drop them and fetch once from scratch.
+            journal.discard()
+            jobs.report(phase="fetch (from scratch)", last_error=f"verify failed: {bad}")
+            journal = open_shot_journal()
+            payload, err = fetch(journal)
 
         if err:
-            return jsonify({"ok": False, "error": err, "raw_hex": None})
+            if journal is not None:
+                journal.close()
+                if journal.received:
+                    err += f" ({journal.received}/{size} bytes kept; fetch again to resume)"
+            return {"ok": False, "error": err, "raw_hex": None}
+        if journal is not None:
+            journal.discard()  # complete, or invalid below: either way do not resume from it
+        jobs.report(phase="validate")
         if not payload or len(payload) < 8:
-            return jsonify({"ok": False, "error": "Incomplete fetch.", "raw_hex": None})
+            return {"ok": False, "error": "Incomplete fetch.", "raw_hex": None}
         if payload[:8] != b"SVTSHOT3":
-            return jsonify({"ok": False, "error": "Shot data invalid (chunks out of order or corrupted).", "raw_hex": None})
-        if len(payload) >= 24:
-            count = struct.unpack_from("<I", payload, 12)[0]
-            imu_mask = payload[17]
-            sample_size = 68 if (imu_mask & 0x06) else 28
-            expected_len = 24 + count * sample_size + 4
+            return {"ok": False, "error": "Shot data invalid (chunks out of order or corrupted).", "raw_hex": None}
+        hdr = svtshot3.parse_header(payload)
+        if hdr is not None:
+            count, expected_len = hdr["count"], hdr["expected_len"]
             if count > 0 and expected_len <= 1024 * 1024 and len(payload) < expected_len:
-                return jsonify({
+                return {
                     "ok": False,
                     "error": f"Shot truncated (expected {expected_len} bytes from header, got {len(payload)}).",
                     "raw_hex": None,
-                })
-        return jsonify({"ok": True, "raw_hex": payload.hex()})
+                }
+        err = svtshot3.verify(payload)
+        if err:
+            return {"ok": False, "error": f"Shot failed verification: {err}.", "raw_hex": None}
+        meta = _shot_meta(payload, id=shot_id, size=len(payload))
+        if data.get("format") == "binary":
+            out = {"ok": True, "payload_url": f"/api/shot/payload/{_stash_fetched(payload, meta)}", **meta}
+        else:
+            out = {"ok": True, "raw_hex": payload.hex()}
+        if link.kind == "wifi":
+            out["http"] = link.client.stats()
+        return out
     except ValueError as e:
-        return jsonify({"ok": False, "error": f"Invalid request: {e}", "raw_hex": None}), 400
+        return {"ok": False, "error": f"Invalid request: {e}", "raw_hex": None}, 400
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return jsonify({"ok": False, "error": str(e), "raw_hex": None}), 500
+        return {"ok": False, "error": str(e), "raw_hex": None}, 500
 
 
-def _ensure_saved_shots_dir():
-    SAVED_SHOTS_DIR.mkdir(parents=True, exist_ok=True)
+@app.route("/api/shot/fetch", methods=["POST"])
+def shot_fetch():
+    """Fetch shot data. BLE: chunked. WiFi: use wifi_binary_client.fetch_shot_chunked_sync.
+    "format": "binary" returns payload_url (GET it as application/octet-stream) instead of raw_hex."""
+    return _shot_fetch_impl(request.get_json() or {})
 
 
-def _list_saved_shots():
-    _ensure_saved_shots_dir()
-    items = []
-    for p in sorted(SAVED_SHOTS_DIR.glob("*.json"), key=lambda x: x.stat().st_mtime, reverse=True):
-        try:
-            with open(p, "r") as f:
-                d = json.load(f)
-            items.append({
-                "id": p.stem,
-                "name": d.get("name", p.stem),
-                "created_at": d.get("created_at", ""),
-                "shot_id": d.get("shot_id"),
-                "sample_rate": d.get("sample_rate"),
-                "count": d.get("count"),
-            })
-        except Exception:
-            pass
-    return items
+def _saved_item(rec: dict) -> dict:
+    return {k: rec[k] for k in ("id", "name", "created_at", "shot_id", "sample_rate", "count", "device", "size")}
 
 
 @app.route("/api/saved-shots", methods=["GET"])
 def saved_shots_list():
-    """List all saved datasets (persists across restarts)."""
+    """List saved datasets, newest first (persists across restarts). Optional filters: device, shot_id,
+    name (substring), limit."""
+    args = request.args
     try:
-        items = _list_saved_shots()
-        return jsonify({"ok": True, "items": items})
+        items = get_archive().query(args.get("device"), args.get("shot_id"), args.get("name"),
+                                    args.get("limit", type=int))
+        return jsonify({"ok": True, "items": [_saved_item(r) for r in items]})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e), "items": []})
 
@@ -1238,65 +1454,76 @@ def saved_shots_list():
 @app.route("/api/saved-shots/<sid>", methods=["GET"])
 def saved_shot_get(sid):
     """Get one saved dataset by id."""
-    path = SAVED_SHOTS_DIR / f"{sid}.json"
-    if not path.is_file():
-        return jsonify({"ok": False, "error": "Not found.", "raw_hex": None}), 404
     try:
-        with open(path, "r") as f:
-            d = json.load(f)
-        raw_hex = d.get("raw_hex")
-        if not raw_hex:
+        rec, payload = get_archive().load(sid)
+        if rec is None:
+            return jsonify({"ok": False, "error": "Not found.", "raw_hex": None}), 404
+        if not payload:
             return jsonify({"ok": False, "error": "No data.", "raw_hex": None}), 400
-        return jsonify({"ok": True, "raw_hex": raw_hex, "name": d.get("name"), "shot_id": d.get("shot_id"), "sample_rate": d.get("sample_rate"), "count": d.get("count")})
+        return jsonify({"ok": True, "raw_hex": payload.hex(), **_saved_item(rec)})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e), "raw_hex": None}), 500
 
 
+@app.route("/api/saved-shots/<sid>/raw", methods=["GET"])
+def saved_shot_raw(sid):
+    """One saved dataset as application/octet-stream, metadata in X-Shot-* headers. ETag is the content hash."""
+    try:
+        rec, payload = get_archive().load(sid)
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+    if rec is None:
+        return jsonify({"ok": False, "error": "Not found."}), 404
+    if not payload:
+        return jsonify({"ok": False, "error": "No data."}), 400
+    meta = _shot_meta(payload, saved_id=sid, id=rec["shot_id"], name=rec["name"], created_at=rec["created_at"],
+                      device=rec["device"], sample_rate=rec["sample_rate"], count=rec["count"])
+    rsp = _octet_response(payload, meta)
+    rsp.set_etag(rec["sha256"])
+    return rsp.make_conditional(request)
+
+
 @app.route("/api/saved-shots", methods=["POST"])
 def saved_shot_save():
-    """Save dataset (name, raw_hex, shot_id, address). Returns id. If address provided, deletes shot from device after save."""
-    data = request.get_json() or {}
+    """Save dataset. Body: raw SVTSHOT3 bytes (Content-Type: application/octet-stream) with name, shot_id and
+    address/device_url in the query string, or JSON with the same fields plus raw_hex, sample_rate and count
+    (compatibility). Returns id. If a device is given, deletes the shot from it after the save."""
+    if request.mimetype == "application/octet-stream":
+        data = request.args.to_dict()
+        payload = request.get_data()
+        sample_rate = count = None  # taken from the SVTSHOT3 header
+        if not payload:
+            return jsonify({"ok": False, "error": "Shot bytes required.", "id": None}), 400
+    else:
+        data = request.get_json() or {}
+        raw_hex = data.get("raw_hex")
+        sample_rate = data.get("sample_rate")
+        count = data.get("count")
+        if not raw_hex:
+            return jsonify({"ok": False, "error": "raw_hex required.", "id": None}), 400
+        try:
+            payload = bytes.fromhex(raw_hex.replace(" ", ""))
+        except (AttributeError, ValueError):
+            return jsonify({"ok": False, "error": "raw_hex: invalid hex.", "id": None}), 400
     name = (data.get("name") or "").strip() or f"Shot {data.get('shot_id', '?')}"
-    raw_hex = data.get("raw_hex")
     shot_id = data.get("shot_id")
-    sample_rate = data.get("sample_rate")
-    count = data.get("count")
-    addr = data.get("address") or _connected_ble_addr
-    if not raw_hex:
-        return jsonify({"ok": False, "error": "raw_hex required.", "id": None}), 400
-    _ensure_saved_shots_dir()
-    import uuid
-    sid = str(uuid.uuid4())[:8]
-    path = SAVED_SHOTS_DIR / f"{sid}.json"
-    rec = {
-        "id": sid,
-        "name": name,
-        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "shot_id": shot_id,
-        "raw_hex": raw_hex,
-        "sample_rate": sample_rate,
-        "count": count,
-    }
     try:
-        with open(path, "w") as f:
-            json.dump(rec, f, indent=2)
-        device_url = _get_device_url(data)
-        if (addr or device_url) and shot_id is not None:
+        link, _ = _request_transport(data)
+        sid = get_archive().save(payload, shot_id, name, link.device if link is not None else None,
+                                 sample_rate, count)["id"]
+        if link is not None and shot_id is not None:
             try:
                 from ble_binary_client import make_frame, CMD_DEL_SHOT
                 import struct
-                frame = make_frame(CMD_DEL_SHOT, payload=struct.pack("<I", int(shot_id)))
-                if device_url:
-                    from wifi_binary_client import send_binary_cmd
-                    _, err = send_binary_cmd(device_url, frame)
-                else:
-                    from ble_binary_client import send_binary_cmd_sync
-                    _, err = send_binary_cmd_sync(addr, frame)
+                frame = make_frame(CMD_DEL_SHOT, payload=struct.pack("<I", _normalize_shot_id(shot_id)))
+                _, err = async_runner.run_sync(_responses.send(link, frame))
                 if err:
                     return jsonify({"ok": True, "id": sid, "name": name, "deleted": False, "delete_error": err})
+                from shot_journal import discard_journals
+                discard_journals(link.device, _normalize_shot_id(shot_id))
             except Exception as e:
                 return jsonify({"ok": True, "id": sid, "name": name, "deleted": False, "delete_error": str(e)})
-        return jsonify({"ok": True, "id": sid, "name": name, "deleted": bool((addr or device_url) and shot_id is not None)})
+        return jsonify({"ok": True, "id": sid, "name": name, "deleted": link is not None and shot_id is not None})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e), "id": None}), 500
 
@@ -1304,11 +1531,9 @@ def saved_shot_save():
 @app.route("/api/saved-shots/<sid>", methods=["DELETE"])
 def saved_shot_delete(sid):
     """Delete saved dataset from PC."""
-    path = SAVED_SHOTS_DIR / f"{sid}.json"
-    if not path.is_file():
-        return jsonify({"ok": False, "error": "Not found"}), 404
     try:
-        path.unlink()
+        if not get_archive().delete(sid):
+            return jsonify({"ok": False, "error": "Not found"}), 404
         return jsonify({"ok": True})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -1318,38 +1543,65 @@ def saved_shot_delete(sid):
 def shot_delete():
     """Delete shot from device (CMD_DEL_SHOT). BLE or WiFi."""
     data = request.get_json() or {}
-    device_url = _get_device_url(data)
-    addr = data.get("address") or _connected_ble_addr
+    link, err = _request_transport(data)
     shot_id = data.get("shot_id")
-    if not addr and not device_url:
-        return jsonify({"ok": False, "error": "Not connected. Scan BLE or set device_url for WiFi."}), 400
+    if err:
+        return jsonify({"ok": False, "error": err}), 400
     if shot_id is None:
         return jsonify({"ok": False, "error": "shot_id required."}), 400
     from ble_binary_client import make_frame, CMD_DEL_SHOT
     import struct
     payload = struct.pack("<I", int(shot_id)) if isinstance(shot_id, (int, float)) else bytes.fromhex(str(shot_id).replace(" ", ""))
     frame = make_frame(CMD_DEL_SHOT, payload=payload)
-    if device_url:
-        from wifi_binary_client import send_binary_cmd
-        rsp, err = send_binary_cmd(device_url, frame)
-    else:
-        from ble_binary_client import send_binary_cmd_sync
-        rsp, err = send_binary_cmd_sync(addr, frame)
+    rsp, err = async_runner.run_sync(_responses.send(link, frame))
     if err:
         return jsonify({"ok": False, "error": err})
+    if len(payload) >= 4:
+        from shot_journal import discard_journals
+        discard_journals(link.device, struct.unpack_from("<I", payload)[0])
     return jsonify({"ok": True})
 
 
-@app.route("/api/binary/tests", methods=["POST"])
-def binary_tests():
-    """Run all 22 BLE unit tests. Returns pass/fail count and log. (WiFi: N/A, use Device tab commands.)"""
-    data = request.get_json(silent=True) or {}
+def _shot_sync_impl(data: dict):
+    """Bulk shot sync (POST /api/shot/sync and shot_sync jobs)."""
+    link, err = _request_transport(data)
+    if err:
+        return {"ok": False, "error": err, "shots": []}, 400
+    from shot_sync import sync_shots
+    job = jobs.current_job()
+    done = []
+
+    def on_shot(entry):
+        done.append(entry)
+        job.update(phase="sync", shots_done=len(done), last=entry)
+
+    try:
+        report = async_runner.run_sync(sync_shots(link, bool(data.get("delete", True)), SAVED_SHOTS_DIR,
+                                                  on_shot if job is not None else None))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {"ok": False, "error": str(e), "shots": []}, 500
+    return report
+
+
+@app.route("/api/shot/sync", methods=["POST"])
+def shot_sync():
+    """Offload every shot in one session: LIST_SHOTS, fetch shots not yet saved, verify SVTSHOT3 length/CRC,
+    save to saved_shots, DEL_SHOT (unless "delete": false). Returns per-shot status and throughput."""
+    return _shot_sync_impl(request.get_json(silent=True) or {})
+
+
+def _binary_tests_impl(data: dict):
+    """BLE unit test run (POST /api/binary/tests and binary_tests jobs)."""
     if _is_wifi_request(data):
-        return jsonify({"ok": True, "passed": 0, "total": 0, "log": "BLE unit tests are for BLE only. For WiFi (ESP32-C6) use Device / Diagnostics tabs (ID, STATUS, DIAG, SELFTEST)."})
-    addr = data.get("address") or _connected_ble_addr
+        return {"ok": True, "passed": 0, "total": 0, "log": "BLE unit tests are for BLE only. For WiFi (ESP32-C6) use Device / Diagnostics tabs (ID, STATUS, DIAG, SELFTEST)."}
+    addr = data.get("address") or _devices.default()
     if not addr:
-        return jsonify({"ok": False, "error": "Not connected. Scan for SmartBall first.", "passed": 0, "total": 0, "log": ""}), 400
+        return {"ok": False, "error": "Not connected. Scan for SmartBall first.", "passed": 0, "total": 0, "log": ""}, 400
     import subprocess
+    _release_ble_session(addr)
+    jobs.report(phase="tests")
     script = TOOLS_DIR / "scripts" / "smartball_ble_tests.py"
     try:
         r = subprocess.run(
@@ -1363,44 +1615,50 @@ def binary_tests():
         log = (r.stdout or "") + (r.stderr or "")
         m = __import__("re").search(r"(\d+)/(\d+) passed", log)
         passed, total = (int(m.group(1)), int(m.group(2))) if m else (0, 22)
-        return jsonify({"ok": r.returncode == 0, "passed": passed, "total": total, "log": log})
+        return {"ok": r.returncode == 0, "passed": passed, "total": total, "log": log}
     except subprocess.TimeoutExpired:
-        return jsonify({"ok": False, "error": "Tests timed out", "passed": 0, "total": 22, "log": "Timeout"})
+        return {"ok": False, "error": "Tests timed out", "passed": 0, "total": 22, "log": "Timeout"}
     except Exception as e:
-        return jsonify({"ok": False, "error": str(e), "passed": 0, "total": 22, "log": str(e)})
+        return {"ok": False, "error": str(e), "passed": 0, "total": 22, "log": str(e)}
+
+
+@app.route("/api/binary/tests", methods=["POST"])
+def binary_tests():
+    """Run all 22 BLE unit tests. Returns pass/fail count and log. (WiFi: N/A, use Device tab commands.)"""
+    return _binary_tests_impl(request.get_json(silent=True) or {})
 
 
 @app.route("/api/upgrade", methods=["POST"])
 def upgrade():
     """OTA upgrade via Serial, BLE, or Debugger."""
     try:
-        return _upgrade_impl()
+        return _upgrade_impl(request.get_json() or {})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e), "stdout": "", "stderr": ""}), 500
 
 
-def _upgrade_impl():
-    """OTA upgrade implementation."""
-    data = request.get_json() or {}
+def _upgrade_impl(data: dict):
+    """OTA upgrade implementation (POST /api/upgrade and upgrade jobs)."""
     image = data.get("image")
     transport = data.get("transport")
     addr = data.get("address") or data.get("addr")
     port = (data.get("port") or "/dev/ttyACM0").strip() or "/dev/ttyACM0"
     if not image:
-        return jsonify({"error": "Valid image file required"}), 400
+        return {"error": "Valid image file required"}, 400
     # Resolve image path: allow absolute or relative to msr1_ota
     image_path = Path(image)
     if not image_path.is_absolute():
         image_path = (TOOLS_DIR / "msr1_ota" / image).resolve()
     if not image_path.is_file():
-        return jsonify({"error": f"Image file not found: {image}"}), 400
+        return {"error": f"Image file not found: {image}"}, 400
     image = str(image_path)
-    addr = addr or _connected_ble_addr
+    addr = addr or _devices.default()
     if transport == "ble":
         if not addr:
-            return jsonify({"error": "Not connected. Scan for SmartBall first."}), 400
+            return {"error": "Not connected. Scan for SmartBall first."}, 400
         base = [str(SMPMGR), "--ble", addr, "--timeout", "90"]
     elif transport == "serial":
+        _release_serial_transport(port)
         base = [str(SMPMGR), "--port", port, "--timeout", "90"]
     else:
         base = None
@@ -1409,27 +1667,34 @@ def _upgrade_impl():
 
         def _run_ota():
             if transport == "ble":
+                jobs.report(phase="prepare")
                 _prepare_ble_gentle(addr)
+            jobs.report(phase="erase")
             _run(base + ["image", "erase", "1"], timeout=120)
             if transport == "ble":
                 time.sleep(5)  # BlueZ needs time between erase and upgrade (avoids rc=9)
+            jobs.report(phase="upload", retries=0)
             c, o, e = _run(cmd)
             if c != 0 and "NO_FREE_SLOT" in (e or o or ""):
+                jobs.report(phase="erase", retries=1)
                 _run(base + ["image", "erase", "1"], timeout=120)
                 if transport == "ble":
                     time.sleep(5)
+                jobs.report(phase="upload")
                 c, o, e = _run(cmd)
             if transport == "ble" and c != 0 and _ble_needs_recovery(e, o):
+                jobs.report(phase="upload (after BLE recovery)", retries=2)
                 _prepare_ble_gentle(addr)
                 c, o, e = _run(cmd)
             if transport == "ble":
                 _restart_ble_autoconnect()
             return c, o, e
 
-        # BLE: acquire exclusivity lock (Phase 1) for entire OTA sequence
-        lock_ctx = _ble_lock() if transport == "ble" else __import__("contextlib").nullcontext()
+        # BLE: hold this device and its adapter for the entire OTA sequence (other balls keep working)
+        lock_ctx = _devices.exclusive(addr) if transport == "ble" else contextlib.nullcontext()
         with lock_ctx:
             code, out, err = _run_ota()
+        _forget_responses(transport, addr if transport == "ble" else port)
     elif transport == "debugger":
         # Build selected version into workspace, then flash
         v = "v1" if "v1" in image else "v2"
@@ -1454,7 +1719,7 @@ west build -b xiao_ble_sense nrf/app --sysbuild --pristine -- \\
             env=_env(),
         )
         if r.returncode != 0:
-            return jsonify({"ok": False, "error": r.stderr or r.stdout})
+            return {"ok": False, "error": r.stderr or r.stdout}
         flash_script = TOOLS_DIR / "scripts" / "flash_xiao.sh"
         r = subprocess.run(
             ["bash", str(flash_script)],
@@ -1464,46 +1729,44 @@ west build -b xiao_ble_sense nrf/app --sysbuild --pristine -- \\
             timeout=60,
             env=_env(),
         )
-        return jsonify({"ok": r.returncode == 0, "stdout": r.stdout, "stderr": r.stderr, "error": None if r.returncode == 0 else (r.stderr or r.stdout)})
+        return {"ok": r.returncode == 0, "stdout": r.stdout, "stderr": r.stderr, "error": None if r.returncode == 0 else (r.stderr or r.stdout)}
     else:
-        return jsonify({"error": "transport must be serial, ble, or debugger"}), 400
+        return {"error": "transport must be serial, ble, or debugger"}, 400
     if base is None:  # debugger path returns earlier
         pass
     err_msg = None if code == 0 else (err or out)
     if code != 0 and "NO_FREE_SLOT" in (err_msg or ""):
         err_msg = (err_msg or "") + "\n\nTo fix: flash firmware once via Debugger. prj.conf has CONFIG_MCUMGR_GRP_IMG_ALLOW_ERASE_PENDING."
-    return jsonify({"ok": code == 0, "stdout": out, "stderr": err, "error": err_msg})
+    return {"ok": code == 0, "stdout": out, "stderr": err, "error": err_msg}
 
 
-@app.route("/api/fsx/push", methods=["POST"])
-def fsx_push_api():
-    """FSX push: transfer file to SmartBall via mcumgr group 66 (FSX).
-    Uses MGMT_OP_WRITE=2, chunk 256 (Phase 5 best). Requires BLE connected."""
-    data = request.get_json() or {}
-    addr = data.get("address") or data.get("addr") or _connected_ble_addr
+def _fsx_push_impl(data: dict):
+    """FSX push (POST /api/fsx/push and fsx_push jobs)."""
+    addr = data.get("address") or data.get("addr") or _devices.default()
     if not addr:
-        return jsonify({"ok": False, "error": "Not connected. Scan for SmartBall first."}), 400
+        return {"ok": False, "error": "Not connected. Scan for SmartBall first."}, 400
     use_test = data.get("test", True)  # default: 15KB test payload
     chunk_len = int(data.get("chunk_len", 256))  # Phase 5 best
     FSX_PUSH = Path(__file__).resolve().parent / "fsx_push.py"
     if not FSX_PUSH.is_file():
-        return jsonify({"ok": False, "error": "fsx_push.py not found"}), 500
+        return {"ok": False, "error": "fsx_push.py not found"}, 500
     test_file = "/tmp/fsx_gui_15k.bin"
     if use_test:
         Path(test_file).write_bytes(bytes(15360))
     file_path = data.get("file") or (test_file if use_test else None)
     if not file_path or not Path(file_path).is_file():
-        return jsonify({"ok": False, "error": "No file. Use test=true or provide valid file path."}), 400
+        return {"ok": False, "error": "No file. Use test=true or provide valid file path."}, 400
     env = _env()
-    env["SMARTBALL_SKIP_LOCK"] = "1"  # web GUI holds _ble_lock
+    env["SMARTBALL_SKIP_LOCK"] = "1"  # web GUI holds the device/adapter lock
     # Disconnect device and wait (like smoke_ble) so FSX gets clean connection
+    # (inside the lock: a fetch or OTA already holding the device keeps its link until it is done)
     try:
-        subprocess.run(["bluetoothctl", "disconnect", addr], capture_output=True, timeout=5, env=_env())
-    except Exception:
-        pass
-    time.sleep(3)
-    try:
-        with _ble_lock():
+        jobs.report(phase="waiting for device lock")
+        with _devices.exclusive(addr):
+            _release_ble_session(addr)
+            _bt_disconnect(addr)
+            bluez_dbus.settle_released_sync(addr, 3)
+            jobs.report(phase="transfer", size=Path(file_path).stat().st_size)
             r = subprocess.run(
                 [sys.executable, str(FSX_PUSH), addr, str(file_path), str(chunk_len)],
                 capture_output=True,
@@ -1513,7 +1776,7 @@ def fsx_push_api():
                 env=env,
             )
     except subprocess.TimeoutExpired:
-        return jsonify({"ok": False, "error": "FSX timed out (180s)", "elapsed_s": 180})
+        return {"ok": False, "error": "FSX timed out (180s)", "elapsed_s": 180}
     out = (r.stdout or "").strip()
     err = (r.stderr or "").strip()
     ok = r.returncode == 0
@@ -1536,7 +1799,7 @@ def fsx_push_api():
                 retries = int(line.split("Retries:")[1].strip().split()[0])
             except (ValueError, IndexError):
                 pass
-    return jsonify({
+    return {
         "ok": ok,
         "stdout": out,
         "stderr": err,
@@ -1544,7 +1807,68 @@ def fsx_push_api():
         "elapsed_s": elapsed,
         "kbps": kbps,
         "retries": retries,
-    })
+    }
+
+
+@app.route("/api/fsx/push", methods=["POST"])
+def fsx_push_api():
+    """FSX push: transfer file to SmartBall via mcumgr group 66 (FSX).
+    Uses MGMT_OP_WRITE=2, chunk 256 (Phase 5 best). Requires BLE connected."""
+    return _fsx_push_impl(request.get_json() or {})
+
+
+# Job kind -> function it runs: the same code and JSON body as the endpoint, without a request context
+JOB_KINDS = {
+    "shot_fetch": _shot_fetch_impl,
+    "shot_sync": _shot_sync_impl,
+    "binary_batch": _binary_batch_impl,
+    "upgrade": _upgrade_impl,
+    "fsx_push": _fsx_push_impl,
+    "binary_tests": _binary_tests_impl,
+    "scan_ble": _scan_ble_impl,
+}
+
+
+def _run_job(fn, body: dict) -> dict:
+    """Call a JOB_KINDS function on the job thread; its (result, status) form becomes ok=False on HTTP errors."""
+    result, status = fn(body), 200
+    if isinstance(result, tuple):
+        result, status = result
+    if status >= 400:
+        result.setdefault("ok", False)
+    return result
+
+
+@app.route("/api/jobs", methods=["POST"])
+def job_submit():
+    """Start a long operation in the background. Body: {"kind": one of JOB_KINDS, ...that endpoint's body}.
+    Returns 202 with the job (poll GET /api/jobs/<id>)."""
+    data = dict(request.get_json(silent=True) or {})
+    kind = data.pop("kind", None)
+    fn = JOB_KINDS.get(kind)
+    if fn is None:
+        return jsonify({"ok": False, "error": f"unknown job kind {kind!r} (one of {', '.join(JOB_KINDS)})"}), 400
+    job = _jobs.submit(kind, lambda: _run_job(fn, data), data)
+    return jsonify({"ok": True, "job": job.to_dict()}), 202
+
+
+@app.route("/api/jobs", methods=["GET"])
+def job_list():
+    """Recent jobs, newest first (without results)."""
+    return jsonify({"jobs": [j.to_dict(with_result=False) for j in _jobs.jobs()]})
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Job status, progress and (when finished) result. Long-poll: ?since=<version>&wait=<sec> returns as soon
+    as the job changes after version (at most wait s, capped at 30)."""
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "unknown job"}), 404
+    since = request.args.get("since", type=int)
+    if since is not None:
+        job.wait_change(since, min(request.args.get("wait", 10.0, type=float), 30.0))
+    return jsonify(job.to_dict())
 
 
 if __name__ == "__main__":
@@ -1574,6 +1898,12 @@ if __name__ == "__main__":
                 print("  WiFi device: not found (set SMARTBALL_WIFI_URL or Ping once from GUI)")
     t = threading.Thread(target=_background_connect_loop, daemon=True)
     t.start()
+    async_runner.get_loop()  # one loop for all BLE/SMP work, for the life of the server
+    try:
+        from ble_binary_client import start_scanner_sync
+        start_scanner_sync()
+    except Exception as e:
+        print("  BLE scanner not started: %s" % e)
     try:
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.settimeout(0.5)
@@ -0,0 +1,66 @@
+"""
+One long-lived asyncio event loop on a background thread, shared by the Flask app and the sync
+wrappers in the BLE clients. Coroutines are submitted with run_coroutine_threadsafe, so Bleak/D-Bus
+state (sessions, scanner, smpclient connections) outlives a single request instead of being torn
+down by asyncio.run() each time.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+
+_loop = None
+_thread = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """The shared loop, started on first use."""
+    global _loop, _thread
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="async-runner", daemon=True)
+            _thread.start()
+    return _loop
+
+
+def is_running() -> bool:
+    return _loop is not None and _loop.is_running()
+
+
+def submit(coro) -> concurrent.futures.Future:
+    """Schedule coro on the shared loop; returns a concurrent Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_sync(coro, timeout: float | None = None):
+    """Run coro on the shared loop and wait for its result. On timeout the coroutine is cancelled."""
+    if _thread is not None and threading.current_thread() is _thread:
+        coro.close()
+        raise RuntimeError("run_sync called from the async-runner thread (would deadlock); await instead")
+    fut = submit(coro)
+    try:
+        return fut.result(timeout)
+    except concurrent.futures.TimeoutError:
+        fut.cancel()
+        raise
+
+
+def shutdown(timeout: float = 5.0) -> None:
+    """Stop the loop (after callers have closed their BLE resources)."""
+    global _loop, _thread
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop = _thread = None
+    if loop is None:
+        return
+    loop.call_soon_threadsafe(loop.stop)
+    if thread is not None:
+        thread.join(timeout)
+    if not loop.is_running():
+        loop.close()
+
+
+# Registered on first import, so it runs after the BLE clients' atexit cleanups (LIFO)
+atexit.register(shutdown)
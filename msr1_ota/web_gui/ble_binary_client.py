@@ -1,27 +1,26 @@
 """
 SmartBall BLE Binary Protocol client — send commands over SVB1 GATT service.
 Used by Web GUI and test runner.
-Speed: shorter notify/poll delays (no connection cache — Flask uses asyncio.run per request).
+Speed: one persistent BleSession per device (connection + TX notify kept open, closed when idle);
+sync wrappers run on the shared async_runner loop so sessions outlive a single Flask request.
 """
 import asyncio
+import atexit
 import struct
 import sys
 import time
+from collections import deque
 from pathlib import Path
 
+import async_runner
+from shot_buffer import ShotBuffer
+
+
 def _debug_log(msg: str) -> None:
     """Log shot fetch failures to stderr for debugging."""
     print(f"[ble_binary_client] {msg}", file=sys.stderr)
 
 
-def _store_first(holder: list, data: bytearray) -> None:
-    if holder[0] is None:
-        holder[0] = bytes(data)
-
-
-def _store_latest(holder: list, data: bytearray) -> None:
-    holder[0] = bytes(data)
-
 # Ensure bleak is available
 _venv = Path(__file__).resolve().parents[2] / ".venv" / "lib" / "python3.11" / "site-packages"
 sys.path.insert(0, str(_venv))
@@ -49,6 +48,7 @@ CMD_NAMES = {
     CMD_SPI_READ: "SPI_READ", CMD_SPI_WRITE: "SPI_WRITE",
     CMD_DEL_SHOT: "DEL_SHOT", CMD_FORMAT_STORAGE: "FORMAT_STORAGE", CMD_BUS_SCAN: "BUS_SCAN",
 }
+CMD_BY_NAME = {name: cmd for cmd, name in CMD_NAMES.items()}
 
 
 def make_frame(cmd: int, plen: int = 1, payload: bytes | None = None) -> bytes:
@@ -58,107 +58,435 @@ def make_frame(cmd: int, plen: int = 1, payload: bytes | None = None) -> bytes:
     return struct.pack("<BH", cmd, plen) + pad[:plen]
 
 
+def build_cmd_frame(cmd, payload=None) -> tuple[bytes | None, str | None]:
+    """Frame for cmd (name like "STATUS" or id) and payload (hex string or bytes); returns (frame, error).
+    No/empty payload sends the single zero byte the firmware expects."""
+    cmd_id = CMD_BY_NAME.get(cmd.strip().upper()) if isinstance(cmd, str) else cmd
+    if cmd_id not in CMD_NAMES:
+        return (None, f"Unknown cmd: {cmd}")
+    if isinstance(payload, str):
+        try:
+            payload = bytes.fromhex(payload.replace(" ", ""))
+        except ValueError:
+            return (None, f"Bad payload hex for {CMD_NAMES[cmd_id]}")
+    return (make_frame(cmd_id, payload=payload) if payload else make_frame(cmd_id), None)
+
+
+def cmd_result(cmd, rsp: bytes | None, err: str | None, elapsed_sec: float) -> dict:
+    """One entry of a batch reply: raw, formatted and decoded (response_decoder JSON) response and round-trip time."""
+    from response_decoder import decode_json
+    name = CMD_NAMES.get(cmd, str(cmd)) if isinstance(cmd, int) else str(cmd).upper()
+    if not err and not rsp:
+        err = "No response from device (timeout or disconnected)."
+    return {
+        "cmd": name,
+        "ok": not err,
+        "error": err,
+        "response": format_response(rsp) if rsp else None,
+        "decoded": decode_json(rsp) if rsp else None,
+        "raw_hex": rsp.hex() if rsp else None,
+        "elapsed_ms": round(elapsed_sec * 1000, 1),
+    }
+
+
 # Notify settle: allow CCC write to complete before first command (host/dongle may need >50ms)
 _NOTIFY_SETTLE_SEC = 0.2
-_POLL_INTERVAL_SEC = 0.025
+# Firmware sends short RSP_SHOT "ping" frames (plen < this) that are not chunk data
+_PING_MAX_PLEN = 10
+
+# Response type each command is answered with. Commands not listed here are acked with RSP_STATUS.
+CMD_RESPONSE = {
+    CMD_ID: RSP_ID, CMD_STATUS: RSP_STATUS, CMD_DIAG: RSP_DIAG, CMD_SELFTEST: RSP_SELFTEST,
+    CMD_GET_CFG: RSP_CFG, CMD_LIST_SHOTS: RSP_SHOT_LIST, CMD_GET_SHOT: RSP_SHOT,
+    CMD_GET_SHOT_CHUNK: RSP_SHOT, CMD_BUS_SCAN: RSP_BUS_SCAN, CMD_SPI_READ: RSP_SPI_DATA,
+}
 
 
-async def _send_cmd(client, frame: bytes, timeout_sec: float = 3.0) -> bytes | None:
-    rsp = [None]
-    def notif(_, data: bytearray):
-        rsp[0] = bytes(data)
-    await client.start_notify(SB_TX_CHAR, notif)
-    await asyncio.sleep(_NOTIFY_SETTLE_SEC)
-    await client.write_gatt_char(SB_RX_CHAR, frame, response=False)
-    polls = int(timeout_sec / _POLL_INTERVAL_SEC)
-    try:
-        for _ in range(max(1, polls)):
-            await asyncio.sleep(_POLL_INTERVAL_SEC)
-            if rsp[0] is not None:
-                return rsp[0]
-        return None
-    finally:
+def _is_ping(data) -> bool:
+    return len(data) >= 3 and data[0] == RSP_SHOT and struct.unpack_from("<H", data, 1)[0] < _PING_MAX_PLEN
+
+
+class _NotifyDispatcher:
+    """Routes TX notifications to waiting requests. Each expect(rtype) returns a Future resolved by the
+    next frame of that response type (FIFO among waiters of the same type). RSP_STATUS is the firmware's
+    generic reply (ack, unknown command, bad offset), so an unclaimed STATUS resolves the oldest waiter.
+    Firmware ping frames are dropped here; other unclaimed frames are logged and dropped."""
+
+    def __init__(self):
+        self._waiters: deque = deque()
+
+    def expect(self, rtype: int | None = None) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append((rtype, fut))
+        return fut
+
+    def discard(self, fut: asyncio.Future) -> None:
+        for entry in self._waiters:
+            if entry[1] is fut:
+                self._waiters.remove(entry)
+                break
+        if not fut.done():
+            fut.cancel()
+
+    def reset(self) -> None:
+        while self._waiters:
+            _, fut = self._waiters.popleft()
+            if not fut.done():
+                fut.cancel()
+
+    def fail(self, exc: Exception) -> None:
+        """Fail every pending waiter with exc (link lost: no reply is coming)."""
+        while self._waiters:
+            _, fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_exception(exc)
+
+    def on_notify(self, _, data: bytearray) -> None:
+        if len(data) < 1 or _is_ping(data):
+            return
+        rtype = data[0]
+        match = next((e for e in self._waiters if e[0] is None or e[0] == rtype), None)
+        if match is None and rtype == RSP_STATUS and self._waiters:
+            match = self._waiters[0]
+        if match is None:
+            _debug_log(f"unsolicited notify 0x{rtype:02x} len={len(data)} dropped")
+            return
+        self._waiters.remove(match)
+        if not match[1].done():
+            match[1].set_result(bytes(data))
+
+    async def request(self, client, frame: bytes, timeout_sec: float, rtype: int | None = -1) -> bytes | None:
+        """Write frame and wait for its response (None on timeout). rtype -1: derive from command."""
+        if rtype == -1:
+            rtype = CMD_RESPONSE.get(frame[0], RSP_STATUS)
+        fut = self.expect(rtype)
         try:
-            await client.stop_notify(SB_TX_CHAR)
-        except Exception:
-            pass
+            await client.write_gatt_char(SB_RX_CHAR, frame, response=False)
+            return await asyncio.wait_for(fut, timeout_sec)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.discard(fut)
+
+    async def request_many(self, client, frames: list, timeout_sec: float) -> list:
+        """Write frames back-to-back, then wait for all responses (None where none arrived in time).
+        Responses of one type are matched to requests in send order; every waiter is registered before
+        the first write so early replies cannot be missed."""
+        futs = [self.expect(CMD_RESPONSE.get(f[0], RSP_STATUS)) for f in frames]
+        try:
+            for frame in frames:
+                await client.write_gatt_char(SB_RX_CHAR, frame, response=False)
+            await asyncio.wait(futs, timeout=timeout_sec)
+            errs = [f.exception() for f in futs if f.done() and not f.cancelled()]
+            err = next((e for e in errs if e is not None), None)
+            if err is not None:
+                raise err
+            return [f.result() if f.done() and not f.cancelled() else None for f in futs]
+        finally:
+            for fut in futs:
+                self.discard(fut)
 
 
-async def _request_chunk_with_notify(client, rsp_holder: list, frame: bytes, timeout_sec: float) -> bytes | None:
-    """Send one GET_SHOT_CHUNK while notify is already active. Ignore firmware ping (plen<10)."""
-    rsp_holder[0] = None
-    await client.write_gatt_char(SB_RX_CHAR, frame, response=False)
-    polls = int(timeout_sec / _POLL_INTERVAL_SEC)
-    for _ in range(max(1, polls)):
-        await asyncio.sleep(_POLL_INTERVAL_SEC)
-        rsp = rsp_holder[0]
-        if rsp is not None:
-            if len(rsp) >= 4 and rsp[0] == RSP_SHOT:
-                plen = struct.unpack_from("<H", rsp, 1)[0]
-                if plen < 10:
-                    rsp_holder[0] = None
-                    continue
-            return rsp
-    return None
+async def _request_chunk_with_notify(client, dispatcher: _NotifyDispatcher, frame: bytes, timeout_sec: float) -> bytes | None:
+    """Send one GET_SHOT_CHUNK while notify is already active; await its RSP_SHOT (pings filtered centrally)."""
+    return await dispatcher.request(client, frame, timeout_sec, RSP_SHOT)
 
 
 # Delay after connect to allow MTU exchange and link ready (BT 4.2+ host)
 _POST_CONNECT_MTU_DELAY_SEC = 1.0
 
-def _is_smartball_name(name) -> bool:
-    n = (name or "").strip()
-    return "SmartBall" in n or "XIAO" in n
+# In-process stand-in for bleak (e.g. smartball_emulator.EmulatedBle): its client_class replaces
+# BleakClient and its find_device() the scanner. None: real adapters through bleak/BlueZ.
+_ble_backend = None
 
 
-def _looks_like_mac(s: str) -> bool:
-    return bool(s) and ":" in s and len(s) >= 17
+def set_ble_backend(backend) -> None:
+    """Route BLE connections through backend instead of bleak (None restores bleak). Open sessions
+    keep their current link until they reconnect."""
+    global _ble_backend
+    _ble_backend = backend
 
 
-async def _resolve_device(addr: str, timeout_sec: float = 12.0):
-    """Scan for BLE devices; return BLEDevice by address, or by name (SmartBall/XIAO) if address not in scan or addr is a name."""
-    from bleak import BleakScanner
-    devs = await BleakScanner.discover(timeout=timeout_sec)
-    if addr and _looks_like_mac(addr):
-        by_addr = next((d for d in devs if d.address.upper() == addr.upper()), None)
-        if by_addr:
-            return by_addr
-    return next((d for d in devs if _is_smartball_name(getattr(d, "name", None))), None)
+def _client_class():
+    if _ble_backend is not None:
+        return _ble_backend.client_class
+    from bleak import BleakClient
+    return BleakClient
 
 
-async def send_binary_cmd(addr: str, frame: bytes, timeout_sec: float = 3.0, device=None) -> tuple[bytes | None, str | None]:
-    """Connect, send frame, return (response_bytes, error_message). device: optional BLEDevice from scan."""
-    from bleak import BleakClient
-    from bleak.exc import BleakDeviceNotFoundError
-    target = device if device is not None else addr
-    try:
-        async with BleakClient(target) as client:
+async def _resolve_device(addr: str, timeout_sec: float = 12.0):
+    """BLEDevice by address, or by name (SmartBall/XIAO) if address not seen or addr is a name.
+    Answered from the shared scanner's cache; otherwise returns as soon as the device advertises."""
+    if _ble_backend is not None:
+        return await _ble_backend.find_device(addr, timeout_sec)
+    from ble_scanner import find_device
+    return await find_device(addr, timeout_sec)
+
+
+# Persistent session: close connection after this long without a command
+SESSION_IDLE_TIMEOUT_SEC = 30.0
+
+
+class BleSession:
+    """Long-lived connection to one SmartBall. Keeps TX notify subscribed between commands,
+    reconnects when the link drops, and disconnects after idle_timeout_sec without traffic.
+    adapter: BlueZ adapter to connect through (e.g. "hci1"); None uses the system default."""
+
+    def __init__(self, addr: str, idle_timeout_sec: float = SESSION_IDLE_TIMEOUT_SEC, adapter: str | None = None):
+        self.addr = addr
+        self.idle_timeout_sec = idle_timeout_sec
+        self.adapter = adapter
+        self.device = None
+        self._client = None
+        self._loop = None
+        self._lock = None
+        self._idle_handle = None
+        self._dispatcher = _NotifyDispatcher()
+
+    @property
+    def is_connected(self) -> bool:
+        return self._client is not None and self._client.is_connected
+
+    def _on_disconnect(self, client) -> None:
+        # Runs on the loop (bleak callback). Waiters fail now so _transact retries without sitting out
+        # the reply timeout.
+        if client is self._client:
+            self._client = None
+            self._dispatcher.fail(ConnectionError(f"{self.addr} disconnected"))
+
+    def _bind_loop(self) -> None:
+        """Sessions are tied to one event loop; a caller on a new loop (e.g. asyncio.run) starts fresh."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._client = None
+            self._idle_handle = None
+            self._dispatcher = _NotifyDispatcher()
+
+    async def _connect(self) -> str | None:
+        """Connect and subscribe to TX notify. Returns error message or None."""
+        from bleak.exc import BleakDeviceNotFoundError
+        BleakClient = _client_class()
+        if self.device is None and _ble_backend is None:
+            from ble_scanner import get_scanner
+            entry = get_scanner().lookup(self.addr)
+            self.device = entry.device if entry is not None and self._on_adapter(entry.device) else None
+        target = self.device if self.device is not None else self.addr
+        bluez = {"adapter": self.adapter} if self.adapter else {}
+        try:
+            client = BleakClient(target, disconnected_callback=self._on_disconnect, bluez=bluez)
+            await client.connect()
+        except BleakDeviceNotFoundError:
+            if self.adapter:
+                return f"device not found on {self.adapter} (power/range?)."
+            self.device = await _resolve_device(self.addr)
+            if not self.device:
+                return "device not found (not in BLE scan—power/range?)."
+            client = BleakClient(self.device, disconnected_callback=self._on_disconnect)
+            await client.connect()
+        self._client = client
+        try:
             await asyncio.sleep(_POST_CONNECT_MTU_DELAY_SEC)
-            rsp = await _send_cmd(client, frame, timeout_sec)
-            return (rsp, None)
-    except BleakDeviceNotFoundError:
-        device = await _resolve_device(addr)
-        if not device:
-            return (None, "device not found (not in BLE scan—power/range?).")
+            await client.start_notify(SB_TX_CHAR, self._dispatcher.on_notify)
+            await asyncio.sleep(_NOTIFY_SETTLE_SEC)
+        except Exception:
+            await self._drop()
+            raise
+        return None
+
+    def _on_adapter(self, device) -> bool:
+        """The shared scanner sees devices through the default adapter; its BLEDevice pins that adapter."""
+        if not self.adapter:
+            return True
+        details = getattr(device, "details", None)
+        path = details.get("path", "") if isinstance(details, dict) else ""
+        return path.startswith(f"/org/bluez/{self.adapter}/")
+
+    async def _drop(self) -> None:
+        self._dispatcher.reset()
+        client, self._client = self._client, None
+        if client is None:
+            return
         try:
-            async with BleakClient(device) as client:
-                await asyncio.sleep(_POST_CONNECT_MTU_DELAY_SEC)
-                rsp = await _send_cmd(client, frame, timeout_sec)
-                return (rsp, None)
-        except Exception as e:
-            return (None, str(e))
-    except Exception as e:
-        return (None, str(e))
+            await client.disconnect()
+        except Exception:
+            pass
+
+    async def _request(self, frame: bytes, timeout_sec: float) -> bytes | None:
+        return await self._dispatcher.request(self._client, frame, timeout_sec)
+
+    async def _request_many(self, frames: list, timeout_sec: float) -> list:
+        return await self._dispatcher.request_many(self._client, frames, timeout_sec)
+
+    def _cancel_idle(self) -> None:
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+
+    def _arm_idle(self) -> None:
+        self._cancel_idle()
+        if self.idle_timeout_sec and self.idle_timeout_sec > 0:
+            self._idle_handle = self._loop.call_later(
+                self.idle_timeout_sec, lambda: asyncio.ensure_future(self.close())
+            )
+
+    async def send(self, frame: bytes, timeout_sec: float = 3.0) -> tuple[bytes | None, str | None]:
+        """Send frame on the open link (connecting if needed); return (response_bytes, error_message).
+        A write failure on a stale link drops it and retries once on a fresh connection."""
+        return await self._transact(self._request, frame, timeout_sec)
+
+    async def send_many(self, frames: list, timeout_sec: float = 3.0) -> tuple[list | None, str | None]:
+        """Pipeline frames on the open link; return (responses, error_message). responses[i] is None
+        when frames[i] got no reply within timeout_sec."""
+        return await self._transact(self._request_many, frames, timeout_sec)
+
+    async def _transact(self, request, arg, timeout_sec: float):
+        self._bind_loop()
+        async with self._lock:
+            self._cancel_idle()
+            try:
+                for attempt in range(2):
+                    try:
+                        if not self.is_connected:
+                            err = await self._connect()
+                            if err:
+                                return (None, err)
+                        rsp = await request(arg, timeout_sec)
+                        return (rsp, None)
+                    except Exception as e:
+                        await self._drop()
+                        if attempt:
+                            return (None, str(e))
+                        _debug_log(f"session {self.addr}: {e}; reconnecting")
+                return (None, "send failed")
+            finally:
+                if self._client is not None:
+                    self._arm_idle()
+
+    async def reset_link(self) -> None:
+        """Drop the connection without waiting for idle (next send reconnects)."""
+        self._bind_loop()
+        async with self._lock:
+            await self._drop()
+
+    async def close(self) -> None:
+        """Disconnect now. The session stays usable; next send reconnects."""
+        self._cancel_idle()
+        if self._lock is None or self._loop is not asyncio.get_running_loop():
+            self._client = None
+            return
+        async with self._lock:
+            if self._client is not None:
+                try:
+                    await self._client.stop_notify(SB_TX_CHAR)
+                except Exception:
+                    pass
+            await self._drop()
+
+
+_sessions: dict[str, BleSession] = {}
+
+
+def _session_key(addr: str) -> str:
+    return (addr or "").strip().upper()
+
+
+def get_session(addr: str, adapter: str | None = None) -> BleSession:
+    """Return the shared BleSession for addr (created on first use). A new adapter applies from the
+    next connection."""
+    key = _session_key(addr)
+    session = _sessions.get(key)
+    if session is None:
+        session = _sessions[key] = BleSession(addr, adapter=adapter)
+    elif adapter and adapter != session.adapter:
+        session.adapter = adapter
+        session.device = None
+    return session
+
+
+async def close_session(addr: str) -> None:
+    """Disconnect addr's session (e.g. before a fetch/smpmgr needs the device to itself)."""
+    session = _sessions.get(_session_key(addr))
+    if session is not None:
+        await session.close()
+
+
+async def close_all_sessions() -> None:
+    for session in list(_sessions.values()):
+        await session.close()
+
+
+# Sync callers (Flask, scripts) run on the shared async_runner loop: sessions must outlive one call
+def _run_sync(coro, timeout: float | None = None):
+    """Run coroutine on the background loop and wait for its result."""
+    return async_runner.run_sync(coro, timeout)
+
+
+def close_session_sync(addr: str) -> None:
+    if _session_key(addr) in _sessions:
+        _run_sync(close_session(addr), timeout=10.0)
+
+
+def close_all_sessions_sync() -> None:
+    if _sessions and async_runner.is_running():
+        try:
+            _run_sync(close_all_sessions(), timeout=10.0)
+        except Exception:
+            pass
+
+
+def start_scanner_sync() -> None:
+    """Start the shared background scanner on the session loop (keeps device lookups warm)."""
+    from ble_scanner import get_scanner
+    _run_sync(get_scanner().start(), timeout=10.0)
+
+
+def stop_scanner_sync() -> None:
+    """Stop the shared scanner (before smpmgr/bluetoothctl need the adapter). Next lookup restarts it."""
+    from ble_scanner import get_scanner
+    if get_scanner().running and async_runner.is_running():
+        try:
+            _run_sync(get_scanner().stop(), timeout=10.0)
+        except Exception:
+            pass
+
+
+atexit.register(close_all_sessions_sync)
+atexit.register(stop_scanner_sync)
+
+
+async def send_binary_cmd(addr: str, frame: bytes, timeout_sec: float = 3.0, device=None) -> tuple[bytes | None, str | None]:
+    """Send frame over addr's persistent session, return (response_bytes, error_message).
+    device: optional BLEDevice from scan."""
+    session = get_session(addr)
+    if device is not None:
+        session.device = device
+    return await session.send(frame, timeout_sec)
 
 
 def send_binary_cmd_sync(addr: str, frame: bytes, timeout_sec: float = 3.0) -> tuple[bytes | None, str | None]:
-    """Synchronous wrapper for Flask."""
-    return asyncio.run(send_binary_cmd(addr, frame, timeout_sec))
+    """Synchronous wrapper for Flask/scripts. Reuses the device's open connection."""
+    return _run_sync(send_binary_cmd(addr, frame, timeout_sec))
+
+
+async def send_binary_cmds(addr: str, cmds: list, timeout_sec: float = 3.0, device=None) -> list[dict]:
+    """Run cmds ([{"cmd": name|id, "payload": hex|bytes}, ...]) in order over addr's persistent session,
+    so a batch costs one connect (transport.send_cmds). Returns one cmd_result dict per entry."""
+    from transport import BleTransport, send_cmds
+    return await send_cmds(BleTransport(addr, device), cmds, timeout_sec)
+
+
+def send_binary_cmds_sync(addr: str, cmds: list, timeout_sec: float = 3.0) -> list[dict]:
+    """Synchronous wrapper of send_binary_cmds for Flask/scripts."""
+    return _run_sync(send_binary_cmds(addr, cmds, timeout_sec))
 
 
 # Chunk size: firmware caps at 20 for default ATT MTU; up to 495 if MTU negotiated
 FETCH_SHOT_CHUNK_SIZE = 495
 # One chunk per connection (legacy stable path)
 CHUNKS_PER_CONNECTION = 1
+# Ceiling between connections; bluez_dbus.settle_released returns as soon as BlueZ reports the link down
 _BETWEEN_CONNECTION_SEC = 1.5
 # Max bytes per BLE connection before voluntary reconnect (avoids long-connection timeouts)
 FETCH_SHOT_SEGMENT_MAX_BYTES = 5120
@@ -172,7 +500,7 @@ def _is_disconnect_error(err: str) -> bool:
     return "disconnect" in s or "failed to discover" in s or "not found" in s or "in progress" in s
 
 
-def _payload_complete_from_header(payload: bytes) -> bool:
+def _payload_complete_from_header(payload) -> bool:
     """True if payload has SVTSHOT3 header and we have at least expected_len bytes."""
     if len(payload) < 24 or payload[:8] != b"SVTSHOT3":
         return False
@@ -191,11 +519,19 @@ async def fetch_shot_one_connection_async(
     timeout_per_chunk: float = 5.0,
     delay_between_chunks_sec: float = 0.04,
     device=None,
-) -> tuple[bytes | None, str | None]:
-    """Fetch full shot; reconnects every SEGMENT_MAX_BYTES to avoid long-connection timeouts."""
-    from bleak import BleakClient
+    journal=None,
+    tuner=None,
+) -> tuple[memoryview | None, str | None]:
+    """Fetch full shot; reconnects every SEGMENT_MAX_BYTES to avoid long-connection timeouts.
+    Returns a read-only view of the reassembled shot. journal: optional ShotJournal (used as the buffer);
+    chunks already in it are skipped and new ones are recorded.
+    tuner: optional link_tuning.LinkTuner; overrides delay and segment length and is fed each outcome."""
+    BleakClient = _client_class()
     if size <= 0:
         return (None, "invalid size")
+    buf = journal if journal is not None else ShotBuffer(size)
+    if buf.complete:
+        return (buf.view(), None)
     device = device or await _resolve_device(addr)
     if not device:
         return (None, "device not found (not in BLE scan—power/range?). Try scanning again.")
@@ -207,25 +543,24 @@ async def fetch_shot_one_connection_async(
         if not rsp or len(rsp) < 4 or rsp[0] != RSP_SHOT:
             return (None, "no response or not RSP_SHOT")
         plen = struct.unpack_from("<H", rsp, 1)[0]
-        return (rsp[3:3 + plen], None)
+        return (memoryview(rsp)[3:3 + plen], None)
+    await close_session(addr)  # this path manages its own connections
     _CHUNK_RETRIES = 3
     _CHUNK_RETRIES_LAST = 5  # more retries for final chunk
     last_chunk_timeout_mult = 3.0
-    payload = b""
-    offset = 0
+    offset = buf.next_missing()
     reconnect_retry_count = 0
     try:
         while offset < size:
             segment_start = offset
+            segment_max = tuner.segment_bytes if tuner is not None else FETCH_SHOT_SEGMENT_MAX_BYTES
             async with BleakClient(device) as client:
                 await asyncio.sleep(_POST_CONNECT_MTU_DELAY_SEC)
-                rsp_holder = [None]
-                def on_notify(_, data: bytearray):
-                    rsp_holder[0] = bytes(data)
-                await client.start_notify(SB_TX_CHAR, on_notify)
+                dispatcher = _NotifyDispatcher()
+                await client.start_notify(SB_TX_CHAR, dispatcher.on_notify)
                 await asyncio.sleep(_NOTIFY_SETTLE_SEC)
                 try:
-                    while offset < size and (offset - segment_start) < FETCH_SHOT_SEGMENT_MAX_BYTES:
+                    while offset < size and (offset - segment_start) < segment_max:
                         frame = make_frame(CMD_GET_SHOT_CHUNK, payload=struct.pack("<IH", shot_id, offset))
                         is_final_chunk = (offset + chunk_size >= size)
                         chunk_timeout = timeout_per_chunk * (last_chunk_timeout_mult if is_final_chunk else 1.0)
@@ -234,13 +569,17 @@ async def fetch_shot_one_connection_async(
                             await asyncio.sleep(0.2)  # give device time to prepare last chunk
                         rsp = None
                         for attempt in range(retries):
-                            rsp = await _request_chunk_with_notify(client, rsp_holder, frame, chunk_timeout)
+                            rsp = await _request_chunk_with_notify(client, dispatcher, frame, chunk_timeout)
                             if rsp is not None and len(rsp) >= 4 and rsp[0] == RSP_SHOT:
+                                if tuner is not None:
+                                    tuner.on_ok()
                                 break
-                            if rsp is not None and _payload_complete_from_header(payload):
+                            if tuner is not None:
+                                tuner.on_loss()
+                            if rsp is not None and _payload_complete_from_header(buf.prefix()):
                                 _debug_log(f"GET_SHOT_CHUNK offset={offset}: non-SHOT but payload complete, accepting")
                                 break
-                            if rsp is not None and is_final_chunk and rsp[0] != RSP_SHOT and _payload_complete_from_header(payload):
+                            if rsp is not None and is_final_chunk and rsp[0] != RSP_SHOT and _payload_complete_from_header(buf.prefix()):
                                 break  # e.g. STATUS at end, we already have full shot
                             if rsp is None:
                                 _debug_log(f"GET_SHOT_CHUNK offset={offset} attempt={attempt + 1}: no notify within timeout")
@@ -249,18 +588,19 @@ async def fetch_shot_one_connection_async(
                             if attempt < retries - 1:
                                 await asyncio.sleep(0.4)
                         if not rsp or len(rsp) < 4 or rsp[0] != RSP_SHOT:
-                            if _payload_complete_from_header(payload):
+                            if _payload_complete_from_header(buf.prefix()):
                                 _debug_log("chunk failed or timeout but payload complete from header, accepting")
-                                return (payload, None)
+                                return (buf.prefix(), None)
                             _debug_log(f"chunk offset={offset} failed, will retry with fresh connection ({reconnect_retry_count + 1}/{FETCH_SHOT_RECONNECT_RETRIES + 1})")
                             break
                         plen = struct.unpack_from("<H", rsp, 1)[0]
-                        payload += rsp[3:3 + plen]
-                        offset += plen
+                        buf.write(offset, memoryview(rsp)[3:3 + plen])
+                        offset = buf.next_missing(offset + plen)
                         if plen == 0 or offset >= size:
                             break
-                        if delay_between_chunks_sec > 0:
-                            await asyncio.sleep(delay_between_chunks_sec)
+                        delay = tuner.delay_sec if tuner is not None else delay_between_chunks_sec
+                        if delay > 0:
+                            await asyncio.sleep(delay)
                 finally:
                     try:
                         await client.stop_notify(SB_TX_CHAR)
@@ -274,14 +614,14 @@ async def fetch_shot_one_connection_async(
                     _debug_log(f"chunk failed, retrying same offset with fresh connection (attempt {reconnect_retry_count + 1})")
                     await asyncio.sleep(FETCH_SHOT_SEGMENT_PAUSE_SEC)
                     continue
-                return (None, f"chunk failed or timeout at offset {offset} (got {len(payload)}/{size} bytes)")
+                return (None, f"chunk failed or timeout at offset {offset} (got {buf.received}/{size} bytes)")
             reconnect_retry_count = 0
             await asyncio.sleep(FETCH_SHOT_SEGMENT_PAUSE_SEC)
-        if len(payload) < size:
-            if _payload_complete_from_header(payload):
-                return (payload, None)
-            return (None, f"incomplete fetch: got {len(payload)}/{size} bytes")
-        return (payload, None)
+        if not buf.complete:
+            if _payload_complete_from_header(buf.prefix()):
+                return (buf.prefix(), None)
+            return (None, f"incomplete fetch: got {buf.received}/{size} bytes")
+        return (buf.view(), None)
     except Exception as e:
         return (None, str(e))
 
@@ -293,10 +633,13 @@ def fetch_shot_one_connection_sync(
     chunk_size: int = FETCH_SHOT_CHUNK_SIZE,
     timeout_per_chunk: float = 5.0,
     delay_between_chunks_sec: float = 0.04,
+    journal=None,
+    tuner=None,
 ) -> tuple[bytes | None, str | None]:
-    return asyncio.run(
+    return _run_sync(
         fetch_shot_one_connection_async(
-            addr, shot_id, size, chunk_size, timeout_per_chunk, delay_between_chunks_sec
+            addr, shot_id, size, chunk_size, timeout_per_chunk, delay_between_chunks_sec,
+            journal=journal, tuner=tuner,
         )
     )
 
@@ -309,11 +652,20 @@ async def fetch_shot_chunked_async(
     timeout_per_chunk: float = 5.0,
     between_segment_callback=None,
     device=None,
-) -> tuple[bytes | None, str | None]:
-    """Fetch full shot by GET_SHOT_CHUNK. One chunk per connection; optional callback between segments (e.g. force disconnect + wait)."""
-    from bleak import BleakClient
+    journal=None,
+    tuner=None,
+) -> tuple[memoryview | None, str | None]:
+    """Fetch full shot by GET_SHOT_CHUNK. One chunk per connection; optional callback between segments (e.g. force disconnect + wait).
+    Returns a read-only view of the reassembled shot. journal: optional ShotJournal (used as the buffer);
+    chunks already in it are skipped and new ones are recorded.
+    tuner: optional link_tuning.LinkTuner; fed each chunk outcome (pacing only)."""
+    BleakClient = _client_class()
+    from bluez_dbus import settle_released
     if size <= 0:
         return (None, "invalid size")
+    buf = journal if journal is not None else ShotBuffer(size)
+    if buf.complete:
+        return (buf.view(), None)
     device = device or await _resolve_device(addr)
     if not device:
         return (None, "device not found (not in BLE scan—power/range?).")
@@ -325,51 +677,51 @@ async def fetch_shot_chunked_async(
         if not rsp or len(rsp) < 4 or rsp[0] != RSP_SHOT:
             return (None, "no response or not RSP_SHOT")
         plen = struct.unpack_from("<H", rsp, 1)[0]
-        return (rsp[3:3 + plen], None)
-    total_payload = b""
-    offset = 0
+        return (memoryview(rsp)[3:3 + plen], None)
+    await close_session(addr)  # this path manages its own connections
+    offset = buf.next_missing()
     max_retries = 5
     loop = asyncio.get_event_loop()
+    first_segment = True
     while offset < size:
-        if offset > 0:
+        if not first_segment:
             if between_segment_callback is not None:
                 await loop.run_in_executor(None, lambda o=offset: between_segment_callback(o))
             else:
-                await asyncio.sleep(_BETWEEN_CONNECTION_SEC)
+                await settle_released(getattr(device, "address", addr), _BETWEEN_CONNECTION_SEC)
+        first_segment = False
         chunk_count_this_conn = 0
         attempt = 0
         while attempt < max_retries:
             try:
                 async with BleakClient(device) as client:
                     await asyncio.sleep(_POST_CONNECT_MTU_DELAY_SEC)
-                    rsp_holder = [None]
+                    dispatcher = _NotifyDispatcher()
                     try:
-                        await client.start_notify(SB_TX_CHAR, lambda _, data: _store_latest(rsp_holder, data))
+                        await client.start_notify(SB_TX_CHAR, dispatcher.on_notify)
                         await asyncio.sleep(_NOTIFY_SETTLE_SEC)
                         # Workaround: STATUS as 1st notify so GET_SHOT_CHUNK is 2nd (host/dongle may drop 3rd).
-                        await client.write_gatt_char(SB_RX_CHAR, make_frame(CMD_STATUS, payload=b"\x00"), response=False)
-                        for _ in range(int(2.0 / _POLL_INTERVAL_SEC)):
-                            await asyncio.sleep(_POLL_INTERVAL_SEC)
-                            if rsp_holder[0] is not None:
-                                break
-                        rsp_holder[0] = None
+                        await dispatcher.request(client, make_frame(CMD_STATUS, payload=b"\x00"), 2.0)
                         while offset < size and chunk_count_this_conn < CHUNKS_PER_CONNECTION:
                             frame = make_frame(CMD_GET_SHOT_CHUNK, payload=struct.pack("<IH", shot_id, offset))
-                            rsp = await _request_chunk_with_notify(client, rsp_holder, frame, timeout_per_chunk)
+                            rsp = await _request_chunk_with_notify(client, dispatcher, frame, timeout_per_chunk)
+                            if tuner is not None:
+                                if rsp and len(rsp) >= 4 and rsp[0] == RSP_SHOT:
+                                    tuner.on_ok()
+                                else:
+                                    tuner.on_loss()
                             if not rsp or len(rsp) < 4 or rsp[0] != RSP_SHOT:
                                 if rsp is None:
                                     _debug_log(f"GET_SHOT_CHUNK offset={offset}: no notify within timeout")
                                 else:
                                     _debug_log(f"GET_SHOT_CHUNK offset={offset}: rsp[0]=0x{rsp[0]:02x} (expected 0x8a RSP_SHOT), len={len(rsp)}, hex={rsp[:min(20,len(rsp))].hex()}")
-                                return (None, f"chunk failed or timeout at offset {offset} (got {len(total_payload)}/{size} bytes)")
+                                return (None, f"chunk failed or timeout at offset {offset} (got {buf.received}/{size} bytes)")
                             plen = struct.unpack_from("<H", rsp, 1)[0]
-                            total_payload += rsp[3:3 + plen]
-                            offset += plen
+                            buf.write(offset, memoryview(rsp)[3:3 + plen])
+                            offset = buf.next_missing(offset + plen)
                             chunk_count_this_conn += 1
                             if plen < chunk_size:
                                 break
-                        if offset >= size or len(total_payload) >= size:
-                            break
                         break
                     finally:
                         try:
@@ -383,11 +735,11 @@ async def fetch_shot_chunked_async(
                 attempt += 1
                 if attempt >= max_retries:
                     return (None, err_msg + " (retries exhausted)")
-                await asyncio.sleep(_BETWEEN_CONNECTION_SEC)
+                await settle_released(getattr(device, "address", addr), _BETWEEN_CONNECTION_SEC)
                 continue
-    if len(total_payload) < size:
-        return (None, f"incomplete fetch: got {len(total_payload)}/{size} bytes")
-    return (total_payload, None)
+    if not buf.complete:
+        return (None, f"incomplete fetch: got {buf.received}/{size} bytes")
+    return (buf.view(), None)
 
 
 def fetch_shot_chunked_sync(
@@ -397,13 +749,65 @@ def fetch_shot_chunked_sync(
     chunk_size: int = FETCH_SHOT_CHUNK_SIZE,
     timeout_per_chunk: float = 5.0,
     between_segment_callback=None,
+    journal=None,
+    tuner=None,
 ) -> tuple[bytes | None, str | None]:
     """Synchronous wrapper for Flask."""
-    return asyncio.run(
-        fetch_shot_chunked_async(addr, shot_id, size, chunk_size, timeout_per_chunk, between_segment_callback)
+    return _run_sync(
+        fetch_shot_chunked_async(
+            addr, shot_id, size, chunk_size, timeout_per_chunk, between_segment_callback,
+            journal=journal, tuner=tuner,
+        )
     )
 
 
+# Pipelined fetch: chunk requests kept in flight per burst
+FETCH_SHOT_WINDOW = 4
+
+
+async def fetch_shot_pipelined_async(
+    addr: str,
+    shot_id: int,
+    size: int,
+    window: int = FETCH_SHOT_WINDOW,
+    timeout_per_chunk: float = 5.0,
+    device=None,
+    journal=None,
+    tuner=None,
+) -> tuple[memoryview | None, str | None]:
+    """Fetch full shot over addr's session with up to window GET_SHOT_CHUNK requests in flight
+    (transport.fetch_shot on a BleTransport: a burst missing any reply is discarded and re-requested).
+    journal: optional ShotJournal (resume); tuner: optional link_tuning.LinkTuner (window/MTU)."""
+    from transport import BleTransport, fetch_shot
+    return await fetch_shot(BleTransport(addr, device), shot_id, size, window, timeout_per_chunk,
+                            journal=journal, tuner=tuner)
+
+
+def fetch_shot_pipelined_sync(
+    addr: str,
+    shot_id: int,
+    size: int,
+    window: int = FETCH_SHOT_WINDOW,
+    timeout_per_chunk: float = 5.0,
+    journal=None,
+    tuner=None,
+) -> tuple[bytes | None, str | None]:
+    """Synchronous wrapper for Flask/scripts."""
+    return _run_sync(
+        fetch_shot_pipelined_async(addr, shot_id, size, window, timeout_per_chunk, journal=journal, tuner=tuner)
+    )
+
+
+def parse_shot_list(rsp: bytes | None) -> tuple[list[tuple[int, int]] | None, str | None]:
+    """RSP_SHOT_LIST frame -> ([(shot_id, size), ...], None) or (None, error)."""
+    import response_decoder as rd
+    if not rsp or len(rsp) < 4:
+        return (None, "no response")
+    if rsp[0] != RSP_SHOT_LIST:
+        return (None, f"unexpected type 0x{rsp[0]:02x}")
+    return ([(s.shot_id, s.size) for s in rd.decode(rsp).shots], None)
+
+
 def spi_read_sync(addr: str, cs: int, reg: int, length: int, timeout_sec: float = 5.0) -> tuple[bytes | None, str | None]:
     """Read from chip register over BLE. cs: 0=LSM6, 1=ADXL. Returns (data_bytes, error)."""
     if cs > 1 or length <= 0 or length > 240:
@@ -439,172 +843,84 @@ def spi_write_sync(addr: str, cs: int, reg: int, data: bytes, timeout_sec: float
 
 
 def format_response(rsp: bytes | None) -> str:
-    """Format binary response for display."""
+    """Format binary response for display (fields from response_decoder)."""
+    import response_decoder as rd
     if rsp is None or len(rsp) < 3:
         return "(no response)"
     rtype = rsp[0]
     plen = struct.unpack_from("<H", rsp, 1)[0]
-    payload = rsp[3:3 + plen] if len(rsp) >= 3 + plen else rsp[3:]
+    d = rd.decode(rsp)
     lines = []
-    if rtype == RSP_ID and len(rsp) >= 16:
-        fw = struct.unpack_from("<H", rsp, 3)[0]
-        proto, hw = rsp[5], rsp[6]
-        uid = rsp[9:17].hex()
+    if isinstance(d, rd.DeviceId):
         lines.append("--- Device ID ---")
-        lines.append(f"  FW version: {fw >> 8}.{fw & 0xFF}")
-        lines.append(f"  Protocol: {proto}  HW rev: {hw}")
-        lines.append(f"  UID: {uid}")
-    elif rtype == RSP_STATUS and len(rsp) >= 38:
-        uptime = struct.unpack_from("<I", rsp, 3)[0]
-        last_err = struct.unpack_from("<I", rsp, 7)[0]
-        err_flags = struct.unpack_from("<I", rsp, 11)[0]
-        dev_state = rsp[15]
-        samples = struct.unpack_from("<I", rsp, 16)[0]
-        sat_int, sat_lsm = rsp[20], rsp[21]
-        stor_used = struct.unpack_from("<I", rsp, 22)[0]
-        stor_free = struct.unpack_from("<I", rsp, 26)[0]
-        temp_s8 = struct.unpack_from("<b", rsp, 32)[0]
-        reset_reason = rsp[33]
-        build_id = struct.unpack_from("<I", rsp, 34)[0]
-        state_name = "recording" if dev_state == 2 else "idle"
-        reset_names = {0: "?", 1: "POR", 2: "pin", 3: "soft", 4: "lockup", 5: "watchdog", 6: "other"}
+        lines.append(f"  FW version: {d.fw_version}")
+        lines.append(f"  Protocol: {d.protocol}  HW rev: {d.hw_rev}")
+        lines.append(f"  UID: {d.uid.hex()}")
+    elif isinstance(d, rd.Status):
         lines.append("--- Status ---")
-        lines.append(f"  State: {state_name}  Uptime: {uptime // 1000}s")
-        lines.append(f"  Samples: {samples}  Saturation: internal={sat_int} lsm={sat_lsm}")
-        lines.append(f"  Storage: used={stor_used} B  free={stor_free} B")
-        lines.append(f"  Temp: {temp_s8 * 0.1:.1f}°C  Reset: {reset_names.get(reset_reason, reset_reason)}")
-        if last_err or err_flags:
-            lines.append(f"  Last error: {last_err}  Flags: 0x{err_flags:08X}")
-        if len(rsp) >= 68:
-            ble_conn = rsp[38]
-            rssi = struct.unpack_from("<b", rsp, 39)[0]
-            rssi_avg = struct.unpack_from("<b", rsp, 40)[0]
-            conn_int = struct.unpack_from("<H", rsp, 41)[0]
-            mtu = struct.unpack_from("<H", rsp, 43)[0]
-            pkt_tx = struct.unpack_from("<I", rsp, 46)[0]
-            pkt_rx = struct.unpack_from("<I", rsp, 50)[0]
+        lines.append(f"  State: {d.state_name}  Uptime: {d.uptime_ms // 1000}s")
+        lines.append(f"  Samples: {d.samples}  Saturation: internal={d.saturation_internal} lsm={d.saturation_lsm}")
+        lines.append(f"  Storage: used={d.storage_used} B  free={d.storage_free} B")
+        lines.append(f"  Temp: {d.temp_c:.1f}°C  Reset: {d.reset_name}")
+        if d.last_error or d.error_flags:
+            lines.append(f"  Last error: {d.last_error}  Flags: 0x{d.error_flags:08X}")
+        if d.ble is not None:
             lines.append("--- BLE ---")
-            lines.append(f"  Connected: {bool(ble_conn)}  RSSI: {rssi} dBm  MTU: {mtu}")
-            lines.append(f"  Packets TX/RX: {pkt_tx}/{pkt_rx}  Interval: {conn_int} ms")
-    elif rtype == RSP_DIAG and len(rsp) >= 10:
-        imu_ready = rsp[3]
-        whoami = rsp[4]
-        voltage_mv = struct.unpack_from("<H", rsp, 7)[0]
-        temp_s8 = struct.unpack_from("<b", rsp, 9)[0]
+            lines.append(f"  Connected: {d.ble.connected}  RSSI: {d.ble.rssi} dBm  MTU: {d.ble.mtu}")
+            lines.append(f"  Packets TX/RX: {d.ble.packets_tx}/{d.ble.packets_rx}  Interval: {d.ble.conn_interval_ms} ms")
+    elif isinstance(d, rd.Diag):
         lines.append("--- Diagnostics ---")
-        lines.append(f"  Internal IMU: {'ready' if imu_ready else 'not ready'}")
-        chip_hint = " (LSM6DS3TR-C)" if whoami == 0x6A else (" (ESP32-C6)" if whoami == 0xC6 else "")
-        lines.append(f"  WHO_AM_I: 0x{whoami:02X}" + chip_hint)
-        lines.append(f"  Voltage: {voltage_mv} mV" + (f" ({voltage_mv/1000:.2f} V)" if voltage_mv > 0 else " (n/a)"))
-        lines.append(f"  Temp: {temp_s8 * 0.1:.1f}°C")
-        if len(rsp) >= 16 and whoami != 0xC6:
-            lsm6_ok = rsp[10]
-            fa = struct.unpack_from("<H", rsp, 11)[0]
-            fg = struct.unpack_from("<H", rsp, 13)[0]
+        lines.append(f"  Internal IMU: {'ready' if d.imu_ready else 'not ready'}")
+        lines.append(f"  WHO_AM_I: 0x{d.whoami:02X}" + (f" ({d.chip})" if d.chip else ""))
+        lines.append(f"  Voltage: {d.voltage_mv} mV" + (f" ({d.voltage_mv/1000:.2f} V)" if d.voltage_mv > 0 else " (n/a)"))
+        lines.append(f"  Temp: {d.temp_c:.1f}°C")
+        if d.lsm6 is not None:
             lines.append("--- LSM6DSOX (SPI) debug ---")
-            lines.append(f"  Last read OK: {'yes' if lsm6_ok else 'no'}")
-            lines.append(f"  Fail accel: {fa}  Fail gyro: {fg}")
-        if whoami == 0xC6 and len(rsp) >= 24:
-            rssi = struct.unpack_from("<b", rsp, 15)[0]
-            free_heap = struct.unpack_from("<I", rsp, 16)[0]
-            reset_reason = rsp[20]
-            cores = rsp[21]
-            rev = rsp[22]
+            lines.append(f"  Last read OK: {'yes' if d.lsm6.last_read_ok else 'no'}")
+            lines.append(f"  Fail accel: {d.lsm6.fail_accel}  Fail gyro: {d.lsm6.fail_gyro}")
+        if d.esp32 is not None:
             lines.append("--- ESP32-C6 ---")
-            if rssi > -128:
-                lines.append(f"  WiFi RSSI: {rssi} dBm")
-            lines.append(f"  Free heap: {free_heap} B")
-            rr_names = {0: "?", 1: "POR", 2: "pin", 3: "soft", 4: "panic", 5: "int_wdt", 6: "task_wdt", 7: "deep_sleep", 8: "brownout"}
-            lines.append(f"  Reset: {rr_names.get(reset_reason, reset_reason)}  Cores: {cores}  Rev: {rev}")
-    elif rtype == RSP_SELFTEST and len(rsp) >= 4:
-        result = rsp[3]
+            if d.esp32.wifi_rssi is not None:
+                lines.append(f"  WiFi RSSI: {d.esp32.wifi_rssi} dBm")
+            lines.append(f"  Free heap: {d.esp32.free_heap} B")
+            lines.append(f"  Reset: {d.esp32.reset_name}  Cores: {d.esp32.cores}  Rev: {d.esp32.rev}")
+    elif isinstance(d, rd.SelfTest):
         lines.append("--- Self-test ---")
-        lines.append(f"  Result: {'PASS' if result == 0 else 'FAIL'}")
-    elif rtype == RSP_CFG and len(rsp) > 4:
-        n = rsp[3]
+        lines.append(f"  Result: {'PASS' if d.passed else 'FAIL'}")
+    elif isinstance(d, rd.Config):
         lines.append("--- Config ---")
-        off = 4
-        for i in range(min(n, 16)):
-            if off + 2 > len(rsp):
-                break
-            klen, vlen = rsp[off], rsp[off + 1]
-            off += 2
-            if klen + vlen == 0 or off + klen + vlen > len(rsp):
-                break
-            key = bytes(rsp[off:off + klen - 1]).decode("utf-8", errors="replace") if klen > 1 else "(empty)"
-            off += klen
-            val_bytes = rsp[off:off + vlen]
-            val_hex = val_bytes.hex()
-            off += vlen
-            # Decode known keys for human-readable display
-            decoded = ""
-            if key in ("sample_rate", "rate_int", "rate_lsm") and vlen == 2:
-                hz = struct.unpack_from("<H", val_bytes, 0)[0]
-                decoded = f" ({hz} Hz)"
-            elif key in ("gyro_fs_int", "gyro_fs_lsm") and vlen == 2:
-                dps = struct.unpack_from("<H", val_bytes, 0)[0]
-                decoded = f" ({dps} dps)"
-            elif key in ("accel_fs_int", "accel_fs_lsm") and vlen == 1:
-                decoded = f" (±{val_bytes[0]}g)"
-            elif key == "event_mode" and vlen == 1:
-                mode = "event" if val_bytes[0] else "normal"
-                decoded = f" ({mode})"
-            elif key == "trigger_g" and vlen == 1:
-                decoded = f" ({val_bytes[0]})"
-            lines.append(f"  {key}: {val_hex}{decoded}")
-    elif rtype == RSP_SHOT_LIST and len(rsp) > 4:
-        n = rsp[3]
+        for e in d.entries:
+            lines.append(f"  {e.key}: {e.value.hex()}" + (f" ({e.display})" if e.display else ""))
+    elif isinstance(d, rd.ShotList) and len(rsp) > 4:
         lines.append("--- Shot list ---")
-        lines.append(f"  Count: {n}")
-        for i in range(min(n, 16)):
-            off = 4 + i * 8
-            if off + 8 <= len(rsp):
-                sid = struct.unpack_from("<I", rsp, off)[0]
-                sz = struct.unpack_from("<I", rsp, off + 4)[0]
-                lines.append(f"  [{i}] id={sid}  size={sz} B")
-    elif rtype == RSP_BUS_SCAN and len(rsp) >= 5:
-        plen = struct.unpack_from("<H", rsp, 1)[0]
-        spi_n = rsp[3]
-        off = 4
-        spi_type_names = {1: "LSM6DSOX", 2: "ADXL375", 3: "W25Q64"}
+        lines.append(f"  Count: {d.count}")
+        for i, s in enumerate(d.shots[:16]):
+            lines.append(f"  [{i}] id={s.shot_id}  size={s.size} B")
+    elif isinstance(d, rd.BusScan):
         lines.append("--- SPI bus ---")
-        for i in range(spi_n):
-            if off + 6 > len(rsp):
-                break
-            stype, cs, id0, id1, id2, flags = rsp[off], rsp[off + 1], rsp[off + 2], rsp[off + 3], rsp[off + 4], rsp[off + 5]
-            off += 6
-            name = spi_type_names.get(stype, f"Type-{stype}")
-            present = "✓" if (flags & 0x01) else "✗"
-            if stype == 1:
-                lines.append(f"  [{cs}] {name}  WHO_AM_I=0x{id0:02X}  {present}")
-            elif stype == 2:
-                lines.append(f"  [{cs}] {name}  DEVID=0x{id0:02X}  {present}")
-            elif stype == 3:
-                lines.append(f"  [{cs}] {name}  JEDEC={id0:02X}{id1:02X}{id2:02X}  {present}")
+        for dev in d.spi:
+            present = "✓" if dev.present else "✗"
+            ident = dev.ident
+            if dev.type == 1:
+                lines.append(f"  [{dev.cs}] {dev.name}  WHO_AM_I=0x{ident[0]:02X}  {present}")
+            elif dev.type == 2:
+                lines.append(f"  [{dev.cs}] {dev.name}  DEVID=0x{ident[0]:02X}  {present}")
+            elif dev.type == 3:
+                lines.append(f"  [{dev.cs}] {dev.name}  JEDEC={ident.hex().upper()}  {present}")
             else:
-                lines.append(f"  [{cs}] {name}  id={id0:02X}{id1:02X}{id2:02X}  {present}")
-        i2c_n = rsp[off] if off < len(rsp) else 0
-        off += 1
-        if spi_n == 0 and i2c_n == 0:
+                lines.append(f"  [{dev.cs}] {dev.name}  id={ident.hex().upper()}  {present}")
+        if not d.spi and not d.i2c:
             lines.append("  (none — ESP32-C6 has no on-board SPI/I2C sensors)")
         lines.append("--- I2C bus ---")
-        for i in range(i2c_n):
-            if off + 2 > len(rsp):
-                break
-            addr, flags = rsp[off], rsp[off + 1]
-            off += 2
-            present = "✓" if (flags & 0x01) else "✗"
-            dev_name = "LSM6DS3TR-C" if addr == 0x6A else f"0x{addr:02X}"
-            lines.append(f"  0x{addr:02X} ({dev_name})  {present}")
-        if i2c_n == 0 and spi_n == 0:
+        for dev in d.i2c:
+            lines.append(f"  0x{dev.addr:02X} ({dev.name})  {'✓' if dev.present else '✗'}")
+        if not d.spi and not d.i2c:
             lines.append("  (none)")
-    elif rtype == RSP_SPI_DATA and len(rsp) >= 3:
-        data_len = struct.unpack_from("<H", rsp, 1)[0]
-        data = rsp[3:3 + data_len] if len(rsp) >= 3 + data_len else rsp[3:]
+    elif isinstance(d, rd.SpiData):
         lines.append("--- SPI read ---")
-        lines.append(f"  {data_len} byte(s): {data.hex()}")
-        if data_len <= 16:
-            lines.append("  " + " ".join(f"{b:02X}" for b in data))
+        lines.append(f"  {plen} byte(s): {d.data.hex()}")
+        if plen <= 16:
+            lines.append("  " + " ".join(f"{b:02X}" for b in d.data))
     if not lines:
         lines.append(f"Type: 0x{rtype:02X}  Payload: {plen} bytes")
     lines.append("")
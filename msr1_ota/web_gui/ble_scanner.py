@@ -0,0 +1,184 @@
+"""
+Shared BLE scanner: one continuous scan fills a TTL cache of BLEDevice + advertisement data
+(name, RSSI, last seen), so resolving a device is a dict lookup instead of a fresh 12 s discover.
+Passive scanning is used where the backend allows it (BlueZ needs or_patterns for passive mode and
+the AdvertisementMonitor API); otherwise the scan falls back to active.
+"""
+import asyncio
+import sys
+import time
+
+# Entries not re-advertised within this long are treated as gone
+SCAN_CACHE_TTL_SEC = 30.0
+# Advertised-name prefixes that identify a SmartBall
+SMARTBALL_NAME_PREFIXES = ("SmartBall", "XIAO")
+
+
+def _debug_log(msg: str) -> None:
+    print(f"[ble_scanner] {msg}", file=sys.stderr, flush=True)
+
+
+def is_smartball_name(name) -> bool:
+    n = (name or "").strip()
+    return any(p in n for p in SMARTBALL_NAME_PREFIXES)
+
+
+def _looks_like_mac(s: str) -> bool:
+    return bool(s) and ":" in s and len(s) >= 17
+
+
+class ScanEntry:
+    """Last advertisement seen from one device."""
+
+    __slots__ = ("device", "name", "rssi", "last_seen")
+
+    def __init__(self, device, name: str | None, rssi: int | None, last_seen: float):
+        self.device = device
+        self.name = name
+        self.rssi = rssi
+        self.last_seen = last_seen
+
+    @property
+    def address(self) -> str:
+        return self.device.address
+
+    def age(self) -> float:
+        return time.monotonic() - self.last_seen
+
+    def to_dict(self) -> dict:
+        return {"address": self.address, "name": self.name, "rssi": self.rssi, "age_sec": round(self.age(), 1)}
+
+
+class BleScanner:
+    """Continuous scan on the running event loop. find() answers from the cache and otherwise
+    waits only until the wanted device advertises (no fixed scan window)."""
+
+    def __init__(self, ttl_sec: float = SCAN_CACHE_TTL_SEC):
+        self.ttl_sec = ttl_sec
+        self._cache: dict[str, ScanEntry] = {}
+        self._scanner = None
+        self._loop = None
+        self._seen = None
+        self.passive = False
+
+    @property
+    def running(self) -> bool:
+        return self._scanner is not None
+
+    def _on_detect(self, device, adv) -> None:
+        name = getattr(adv, "local_name", None) or getattr(device, "name", None)
+        entry = self._cache.get(device.address.upper())
+        if entry is None:
+            self._cache[device.address.upper()] = ScanEntry(device, name, getattr(adv, "rssi", None), time.monotonic())
+        else:
+            entry.device = device
+            entry.name = name or entry.name
+            entry.rssi = getattr(adv, "rssi", entry.rssi)
+            entry.last_seen = time.monotonic()
+        if self._seen is not None:
+            self._seen.set()
+
+    def _make_scanner(self, passive: bool):
+        from bleak import BleakScanner
+        if not passive:
+            return BleakScanner(detection_callback=self._on_detect)
+        kwargs = {"detection_callback": self._on_detect, "scanning_mode": "passive"}
+        if sys.platform.startswith("linux"):
+            from bleak.args.bluez import BlueZScannerArgs, OrPattern
+            from bleak.assigned_numbers import AdvertisementDataType
+            patterns = [
+                OrPattern(0, t, p.encode())
+                for p in SMARTBALL_NAME_PREFIXES
+                for t in (AdvertisementDataType.COMPLETE_LOCAL_NAME, AdvertisementDataType.SHORTENED_LOCAL_NAME)
+            ]
+            kwargs["bluez"] = BlueZScannerArgs(or_patterns=patterns)
+        return BleakScanner(**kwargs)
+
+    async def start(self) -> None:
+        """Start scanning on the current loop (restarts if a previous loop owned the scanner)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._scanner = None
+            self._loop = loop
+            self._seen = asyncio.Event()
+        if self._scanner is not None:
+            return
+        for passive in (True, False):
+            try:
+                scanner = self._make_scanner(passive)
+                await scanner.start()
+            except Exception as e:
+                if passive:
+                    _debug_log(f"passive scan unavailable ({e}); using active scan")
+                    continue
+                raise
+            self._scanner = scanner
+            self.passive = passive
+            return
+
+    async def stop(self) -> None:
+        """Stop scanning (e.g. before smpmgr needs the adapter). Cache is kept."""
+        scanner, self._scanner = self._scanner, None
+        if scanner is None or self._loop is not asyncio.get_running_loop():
+            return
+        try:
+            await scanner.stop()
+        except Exception:
+            pass
+
+    def lookup(self, addr: str | None = None, max_age_sec: float | None = None) -> ScanEntry | None:
+        """Fresh entry for addr (MAC); for a name or None, the most recently seen SmartBall.
+        max_age_sec: tighter freshness than the cache TTL (e.g. "seen since reboot")."""
+        max_age = self.ttl_sec if max_age_sec is None else min(max_age_sec, self.ttl_sec)
+        if addr and _looks_like_mac(addr):
+            entry = self._cache.get(addr.strip().upper())
+            return entry if entry is not None and entry.age() <= max_age else None
+        fresh = [e for e in self.entries() if is_smartball_name(e.name) and e.age() <= max_age]
+        if addr:
+            fresh = [e for e in fresh if addr.strip() in (e.name or "")] or fresh
+        return max(fresh, key=lambda e: e.last_seen, default=None)
+
+    def entries(self) -> list[ScanEntry]:
+        return [e for e in self._cache.values() if e.age() <= self.ttl_sec]
+
+    async def find(self, addr: str | None = None, timeout_sec: float = 12.0,
+                   max_age_sec: float | None = None) -> ScanEntry | None:
+        """Cached entry for addr, or wait (up to timeout_sec) for it to advertise. A MAC not seen in
+        time falls back to any SmartBall by name, matching the old full-scan behaviour."""
+        entry = self.lookup(addr, max_age_sec)
+        if entry is not None:
+            return entry
+        await self.start()
+        deadline = time.monotonic() + timeout_sec
+        while True:
+            entry = self.lookup(addr, max_age_sec)
+            if entry is not None:
+                return entry
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._seen.clear()
+            try:
+                await asyncio.wait_for(self._seen.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        return self.lookup(None, max_age_sec) if addr and _looks_like_mac(addr) else None
+
+
+_scanner = BleScanner()
+
+
+def get_scanner() -> BleScanner:
+    return _scanner
+
+
+async def find_device(addr: str | None = None, timeout_sec: float = 12.0, stop: bool = False,
+                      max_age_sec: float | None = None):
+    """BLEDevice for addr (or any SmartBall) from the shared scanner, or None. stop=True stops the scan
+    once found (CLI tools that connect right after)."""
+    try:
+        entry = await _scanner.find(addr, timeout_sec, max_age_sec)
+    finally:
+        if stop:
+            await _scanner.stop()
+    return entry.device if entry is not None else None
@@ -0,0 +1,426 @@
+"""
+In-process BlueZ control over the system D-Bus (dbus-fast, installed with Bleak on Linux): adapter power,
+known devices, discovery start/stop and disconnect, without forking bluetoothctl/hciconfig and parsing
+their text. Adapter and device properties are loaded once with GetManagedObjects and then kept current from
+InterfacesAdded/InterfacesRemoved/PropertiesChanged signals, so state queries are dict reads. The bus
+connection lives on the shared async_runner loop; the *_sync wrappers are for Flask handlers.
+Link-state waits (device released, advertising again, adapter idle) are resolved by the same signals, so
+BLE preparation continues as soon as BlueZ reports the state instead of sleeping a fixed time.
+"""
+import asyncio
+import time
+
+import async_runner
+
+BLUEZ = "org.bluez"
+BLUEZ_ROOT = "/org/bluez"
+ADAPTER_IFACE = "org.bluez.Adapter1"
+DEVICE_IFACE = "org.bluez.Device1"
+PROPS_IFACE = "org.freedesktop.DBus.Properties"
+OM_IFACE = "org.freedesktop.DBus.ObjectManager"
+DEFAULT_ADAPTER = "hci0"
+DBUS_CALL_TIMEOUT_SEC = 5.0
+# After BlueZ reports a device disconnected, give the controller this long to free the connection handle
+RELEASE_SETTLE_SEC = 0.3
+# Device1 properties that only change when an advertisement is received
+_ADVERT_PROPS = ("RSSI", "ManufacturerData", "ServiceData", "TxPower")
+
+_MATCH_RULES = (
+    f"type='signal',sender='{BLUEZ}',interface='{PROPS_IFACE}',member='PropertiesChanged'",
+    f"type='signal',sender='{BLUEZ}',interface='{OM_IFACE}'",
+    f"type='signal',sender='org.freedesktop.DBus',member='NameOwnerChanged',arg0='{BLUEZ}'",
+)
+# Replies that mean "already in the requested state"
+_BENIGN_ERRORS = {
+    "StartDiscovery": ("org.bluez.Error.InProgress",),
+    "StopDiscovery": ("org.bluez.Error.Failed", "org.bluez.Error.NotReady"),
+    "Disconnect": ("org.bluez.Error.NotConnected",),
+}
+
+
+def _unwrap(props: dict) -> dict:
+    return {k: getattr(v, "value", v) for k, v in props.items()}
+
+
+class BluezController:
+    """One D-Bus connection to bluetoothd plus a signal-fed cache of adapter/device properties."""
+
+    def __init__(self, adapter: str = DEFAULT_ADAPTER):
+        self.adapter = adapter
+        self._bus = None
+        self._lock = None
+        # object path -> interface -> properties (plain values)
+        self._objects: dict[str, dict[str, dict]] = {}
+        # upper-case address -> monotonic time of the last advertisement-driven update
+        self._seen: dict[str, float] = {}
+        self._waiters: list[tuple] = []
+
+    @property
+    def ready(self) -> bool:
+        return self._bus is not None and self._bus.connected
+
+    # --- cached state (no D-Bus round trip) ---
+
+    def adapter_path(self) -> str | None:
+        """Object path of the configured adapter, else the first adapter BlueZ exports."""
+        preferred = f"{BLUEZ_ROOT}/{self.adapter}"
+        if ADAPTER_IFACE in self._objects.get(preferred, {}):
+            return preferred
+        for path, ifaces in self._objects.items():
+            if ADAPTER_IFACE in ifaces:
+                return path
+        return None
+
+    def adapters(self) -> list[dict]:
+        """Every adapter BlueZ exports (hci0, hci1, ...) with its power state."""
+        return [{"name": path.rsplit("/", 1)[-1], "path": path, "address": ifaces[ADAPTER_IFACE].get("Address"),
+                 "powered": bool(ifaces[ADAPTER_IFACE].get("Powered"))}
+                for path, ifaces in list(self._objects.items()) if ADAPTER_IFACE in ifaces]
+
+    def adapter_state(self) -> dict:
+        path = self.adapter_path()
+        props = self._objects.get(path, {}).get(ADAPTER_IFACE, {}) if path else {}
+        return {
+            "present": path is not None,
+            "path": path,
+            "address": props.get("Address"),
+            "powered": bool(props.get("Powered")),
+            "discovering": bool(props.get("Discovering")),
+        }
+
+    def devices(self) -> list[dict]:
+        """Devices BlueZ knows on the adapter (cached, like `bluetoothctl devices`)."""
+        adapter = self.adapter_path()
+        out = []
+        for path, ifaces in list(self._objects.items()):
+            props = ifaces.get(DEVICE_IFACE)
+            if props is None or (adapter and props.get("Adapter") != adapter):
+                continue
+            out.append({
+                "address": props.get("Address"),
+                "name": props.get("Name"),
+                "alias": props.get("Alias"),
+                "rssi": props.get("RSSI"),
+                "connected": bool(props.get("Connected")),
+                "paired": bool(props.get("Paired")),
+                "path": path,
+            })
+        return out
+
+    def _device_path(self, addr: str) -> str | None:
+        addr = addr.upper()
+        for dev in self.devices():
+            if (dev["address"] or "").upper() == addr:
+                return dev["path"]
+        return None
+
+    def device_linked(self, addr: str) -> bool:
+        """True while BlueZ holds a connection to addr (Connected or ServicesResolved)."""
+        path = self._device_path(addr)
+        props = self._objects.get(path, {}).get(DEVICE_IFACE, {}) if path else {}
+        return bool(props.get("Connected") or props.get("ServicesResolved"))
+
+    # --- link-state waits (resolved from signals; no polling) ---
+
+    async def wait_until(self, pred, timeout: float) -> bool:
+        """Wait until pred() is true after a state change, at most timeout s. Returns pred()'s final value."""
+        if pred():
+            return True
+        fut = asyncio.get_running_loop().create_future()
+        waiter = (pred, fut)
+        self._waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return bool(pred())
+        finally:
+            self._waiters.remove(waiter)
+
+    def _notify(self) -> None:
+        for pred, fut in self._waiters:
+            if not fut.done() and pred():
+                fut.set_result(True)
+
+    async def wait_released(self, addr: str, timeout: float) -> bool:
+        """Device no longer connected (unknown devices count as released)."""
+        return await self.wait_until(lambda: not self.device_linked(addr), timeout)
+
+    async def wait_advertising(self, addr: str, timeout: float) -> bool:
+        """Device advertised after this call. Runs discovery for the wait if it is not already on."""
+        since = time.monotonic()
+        key = addr.upper()
+        started = not self.adapter_state()["discovering"] and await self.start_discovery() is None
+        try:
+            return await self.wait_until(lambda: self._seen.get(key, 0.0) > since, timeout)
+        finally:
+            if started:
+                await self.stop_discovery()
+
+    async def discover(self, timeout: float, match=None) -> str | None:
+        """Run discovery for timeout s, or until match(device dict) is true for a known device."""
+        err = await self.start_discovery()
+        if err:
+            return err
+        try:
+            if match is not None:
+                await self.wait_until(lambda: any(match(d) for d in self.devices()), timeout)
+            else:
+                await asyncio.sleep(timeout)
+        finally:
+            await self.stop_discovery()
+        return None
+
+    async def wait_adapter_idle(self, timeout: float) -> bool:
+        """Adapter present, powered and not discovering (e.g. back up after a bluetoothd restart)."""
+        def idle():
+            state = self.adapter_state()
+            return state["powered"] and not state["discovering"]
+        return await self.wait_until(idle, timeout)
+
+    # --- bus connection and signal handling ---
+
+    async def connect(self) -> str | None:
+        """Connect to the system bus and load BlueZ objects (no-op when connected). Returns error or None.
+        bluetoothd not running is not an error: the cache is just empty until it appears."""
+        if self.ready:
+            return None
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.ready:
+                return None
+            try:
+                from dbus_fast import BusType
+                from dbus_fast.aio import MessageBus
+            except ImportError:
+                return "dbus-fast not installed (pip install dbus-fast)"
+            try:
+                bus = await asyncio.wait_for(MessageBus(bus_type=BusType.SYSTEM).connect(), DBUS_CALL_TIMEOUT_SEC)
+            except Exception as e:
+                return f"system D-Bus unavailable: {e}"
+            bus.add_message_handler(self._on_message)
+            self._bus = bus
+            for rule in _MATCH_RULES:
+                _, err = await self._call("org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus",
+                                          "AddMatch", "s", [rule])
+                if err:
+                    bus.disconnect()
+                    self._bus = None
+                    return f"D-Bus AddMatch failed: {err}"
+            return await self._reload()
+
+    async def _reload(self) -> str | None:
+        body, err = await self._call(BLUEZ, "/", OM_IFACE, "GetManagedObjects")
+        self._objects = {}
+        if err:
+            return None if "ServiceUnknown" in err or "NameHasNoOwner" in err else err
+        for path, ifaces in body[0].items():
+            self._objects[path] = {iface: _unwrap(props) for iface, props in ifaces.items()
+                                   if iface in (ADAPTER_IFACE, DEVICE_IFACE)}
+        self._notify()
+        return None
+
+    async def _call(self, dest: str, path: str, iface: str, member: str, signature: str = "",
+                    body: list | None = None) -> tuple[list | None, str | None]:
+        from dbus_fast import Message, MessageType
+        if self._bus is None:
+            return None, "D-Bus not connected"
+        msg = Message(destination=dest, path=path, interface=iface, member=member,
+                      signature=signature, body=body or [])
+        try:
+            reply = await asyncio.wait_for(self._bus.call(msg), DBUS_CALL_TIMEOUT_SEC)
+        except asyncio.TimeoutError:
+            return None, f"{member}: D-Bus call timed out"
+        except Exception as e:
+            return None, f"{member}: {e}"
+        if reply.message_type == MessageType.ERROR:
+            detail = reply.body[0] if reply.body else ""
+            return None, f"{reply.error_name}: {detail}" if detail else reply.error_name
+        return reply.body, None
+
+    def _on_message(self, msg) -> None:
+        from dbus_fast import MessageType
+        if msg.message_type != MessageType.SIGNAL:
+            return
+        self._apply_signal(msg)
+        self._notify()
+
+    def _mark_seen(self, props: dict) -> None:
+        if props.get("Address"):
+            self._seen[props["Address"].upper()] = time.monotonic()
+
+    def _apply_signal(self, msg) -> None:
+        if msg.member == "PropertiesChanged" and (msg.path or "").startswith(BLUEZ_ROOT):
+            iface, changed, invalidated = msg.body
+            if iface not in (ADAPTER_IFACE, DEVICE_IFACE):
+                return
+            props = self._objects.setdefault(msg.path, {}).setdefault(iface, {})
+            props.update(_unwrap(changed))
+            for name in invalidated:
+                props.pop(name, None)
+            if iface == DEVICE_IFACE and any(k in changed for k in _ADVERT_PROPS):
+                self._mark_seen(props)
+        elif msg.member == "InterfacesAdded":
+            path, ifaces = msg.body
+            for iface, props in ifaces.items():
+                if iface in (ADAPTER_IFACE, DEVICE_IFACE):
+                    self._objects.setdefault(path, {})[iface] = _unwrap(props)
+                if iface == DEVICE_IFACE:
+                    self._mark_seen(self._objects[path][iface])
+        elif msg.member == "InterfacesRemoved":
+            path, ifaces = msg.body
+            obj = self._objects.get(path)
+            if obj is not None:
+                for iface in ifaces:
+                    obj.pop(iface, None)
+                if not obj:
+                    del self._objects[path]
+        elif msg.member == "NameOwnerChanged" and msg.body and msg.body[0] == BLUEZ:
+            # bluetoothd restarted (stop_ble_for_mcumgr.sh): old objects are gone, reload from the new owner
+            self._objects = {}
+            if msg.body[2]:
+                asyncio.ensure_future(self._reload())
+
+    # --- actions ---
+
+    async def _adapter_call(self, member: str, signature: str = "", body: list | None = None,
+                            path: str | None = None, iface: str = ADAPTER_IFACE) -> str | None:
+        err = await self.connect()
+        if err:
+            return err
+        path = path or self.adapter_path()
+        if path is None:
+            return "No Bluetooth adapter (org.bluez not running or no controller)"
+        _, err = await self._call(BLUEZ, path, iface, member, signature, body)
+        if err and err.split(":")[0] in _BENIGN_ERRORS.get(member, ()):
+            return None
+        return err
+
+    async def set_powered(self, on: bool = True) -> str | None:
+        from dbus_fast import Variant
+        return await self._adapter_call("Set", "ssv", [ADAPTER_IFACE, "Powered", Variant("b", on)],
+                                        iface=PROPS_IFACE)
+
+    async def start_discovery(self) -> str | None:
+        return await self._adapter_call("StartDiscovery")
+
+    async def stop_discovery(self) -> str | None:
+        return await self._adapter_call("StopDiscovery")
+
+    async def disconnect(self, addr: str) -> str | None:
+        """Disconnect addr; a device BlueZ does not know is already disconnected."""
+        err = await self.connect()
+        if err:
+            return err
+        path = self._device_path(addr)
+        if path is None:
+            return None
+        return await self._adapter_call("Disconnect", path=path, iface=DEVICE_IFACE)
+
+    async def settle(self, wait, ceiling: float) -> bool:
+        """Await wait(ceiling) (one of the wait_* methods, bound to its arguments) on a connected bus.
+        Without D-Bus this is the fixed sleep it replaces. Returns True if the state was reached."""
+        if await self.connect() is not None:
+            await asyncio.sleep(ceiling)
+            return False
+        return await wait(ceiling)
+
+    async def close(self) -> None:
+        if self._bus is not None:
+            self._bus.disconnect()
+        self._bus = None
+        self._objects = {}
+
+
+_controller: BluezController | None = None
+
+
+def get_controller() -> BluezController:
+    global _controller
+    if _controller is None:
+        _controller = BluezController()
+    return _controller
+
+
+def _run(coro, timeout: float = DBUS_CALL_TIMEOUT_SEC * 2):
+    try:
+        return async_runner.run_sync(coro, timeout)
+    except Exception as e:
+        return f"D-Bus call failed: {e}"
+
+
+def _ready() -> tuple[BluezController, str | None]:
+    ctl = get_controller()
+    return ctl, (None if ctl.ready else _run(ctl.connect()))
+
+
+def adapter_state_sync() -> tuple[dict | None, str | None]:
+    """Adapter present/powered/discovering from the signal-fed cache (bus connected on first use)."""
+    ctl, err = _ready()
+    return (None, err) if err else (ctl.adapter_state(), None)
+
+
+def adapters_sync() -> tuple[list[dict] | None, str | None]:
+    ctl, err = _ready()
+    return (None, err) if err else (ctl.adapters(), None)
+
+
+def known_devices_sync() -> tuple[list[dict] | None, str | None]:
+    ctl, err = _ready()
+    return (None, err) if err else (ctl.devices(), None)
+
+
+def set_powered_sync(on: bool = True) -> str | None:
+    return _run(get_controller().set_powered(on))
+
+
+def start_discovery_sync() -> str | None:
+    return _run(get_controller().start_discovery())
+
+
+def discover_sync(timeout: float, match=None) -> str | None:
+    return _run(get_controller().discover(timeout, match), timeout + DBUS_CALL_TIMEOUT_SEC * 2)
+
+
+def stop_discovery_sync() -> str | None:
+    return _run(get_controller().stop_discovery())
+
+
+def disconnect_sync(addr: str) -> str | None:
+    return _run(get_controller().disconnect(addr))
+
+
+def _settle_sync(wait, ceiling: float) -> bool:
+    try:
+        return async_runner.run_sync(get_controller().settle(wait, ceiling), ceiling + DBUS_CALL_TIMEOUT_SEC * 2)
+    except Exception:
+        return False
+
+
+async def settle_released(addr: str, ceiling: float) -> bool:
+    """Return once BlueZ reports addr disconnected plus RELEASE_SETTLE_SEC, at most ceiling s (the old fixed sleep)."""
+    ctl = get_controller()
+    released = await ctl.settle(lambda t: ctl.wait_released(addr, t), ceiling)
+    if released:
+        await asyncio.sleep(RELEASE_SETTLE_SEC)
+    return released
+
+
+def settle_released_sync(addr: str, ceiling: float) -> bool:
+    ctl = get_controller()
+    released = _settle_sync(lambda t: ctl.wait_released(addr, t), ceiling)
+    if released:
+        time.sleep(RELEASE_SETTLE_SEC)
+    return released
+
+
+def settle_advertising_sync(addr: str, ceiling: float) -> bool:
+    """Return once addr advertises again (e.g. after a disconnect), at most ceiling s."""
+    ctl = get_controller()
+    return _settle_sync(lambda t: ctl.wait_advertising(addr, t), ceiling)
+
+
+def settle_adapter_sync(ceiling: float) -> bool:
+    """Return once the adapter is powered and not discovering, at most ceiling s."""
+    ctl = get_controller()
+    return _settle_sync(ctl.wait_adapter_idle, ceiling)
@@ -0,0 +1,142 @@
+"""
+Registry of the SmartBalls the backend is working with and the Bluetooth adapter each one uses. With several
+balls and dongles (hci0, hci1, ...) on one host, each device is pinned to an adapter (least loaded when it is
+first seen) and exclusive operations (OTA, FSX) lock that device and its adapter instead of one global lock,
+so work on different balls runs in parallel. Locks are thread locks plus flock files in /var/lock, so
+external tools that honour the same files are serialized too.
+"""
+import fcntl
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass, field
+
+LOCK_DIR = "/var/lock"
+
+
+@dataclass(slots=True)
+class DeviceEntry:
+    address: str
+    name: str | None = None
+    adapter: str | None = None  # None: system default adapter
+    added_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.monotonic)
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d.pop("last_used")
+        return d
+
+
+def _key(addr: str) -> str:
+    return (addr or "").strip().upper()
+
+
+@contextmanager
+def _file_lock(name: str):
+    """Cross-process lock on LOCK_DIR/smartball_<name>.lock (blocks until acquired)."""
+    path = os.path.join(LOCK_DIR, f"smartball_{name.replace(':', '').lower()}.lock")
+    fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def _powered_adapters() -> list[str]:
+    """Names of powered BlueZ adapters (empty when D-Bus is unavailable)."""
+    import bluez_dbus
+    adapters, err = bluez_dbus.adapters_sync()
+    return [] if err else sorted(a["name"] for a in adapters if a["powered"])
+
+
+class DeviceRegistry:
+    """Thread-safe map of address -> DeviceEntry plus per-device and per-adapter locks."""
+
+    def __init__(self, list_adapters=_powered_adapters):
+        self._list_adapters = list_adapters
+        self._lock = threading.Lock()
+        self._devices: dict[str, DeviceEntry] = {}
+        self._locks: dict[str, threading.Lock] = {}
+
+    def add(self, addr: str, name: str | None = None, adapter: str | None = None) -> DeviceEntry:
+        """Register (or refresh) addr. adapter=None keeps the current pin or assigns the least loaded one."""
+        key = _key(addr)
+        # D-Bus round trip only for a new, unpinned device, and never under the lock
+        adapters = self._list_adapters() if adapter is None and key not in self._devices else []
+        with self._lock:
+            entry = self._devices.get(key)
+            if entry is None:
+                entry = self._devices[key] = DeviceEntry(key, name, adapter or self._pick_adapter(adapters))
+            else:
+                entry.name = name or entry.name
+                entry.adapter = adapter or entry.adapter
+            entry.last_used = time.monotonic()
+            return entry
+
+    def _pick_adapter(self, adapters: list[str]) -> str | None:
+        """Adapter with the fewest registered devices (call with self._lock held). With one adapter (or none
+        known) leave it to BlueZ."""
+        if len(adapters) < 2:
+            return None
+        load = {a: 0 for a in adapters}
+        for e in self._devices.values():
+            if e.adapter in load:
+                load[e.adapter] += 1
+        return min(adapters, key=lambda a: load[a])
+
+    def remove(self, addr: str) -> DeviceEntry | None:
+        with self._lock:
+            return self._devices.pop(_key(addr), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._devices.clear()
+
+    def get(self, addr: str) -> DeviceEntry | None:
+        return self._devices.get(_key(addr))
+
+    def entries(self) -> list[DeviceEntry]:
+        with self._lock:
+            return sorted(self._devices.values(), key=lambda e: e.added_at)
+
+    def default(self) -> str | None:
+        """Most recently used address: the fallback for requests that name no device."""
+        with self._lock:
+            entry = max(self._devices.values(), key=lambda e: e.last_used, default=None)
+        return entry.address if entry is not None else None
+
+    def adapter_for(self, addr: str) -> str | None:
+        """Adapter addr is pinned to; for an unregistered address the one add() would pin it to now. A pure
+        lookup: it neither registers addr nor makes it the default()."""
+        entry = self.get(addr)
+        if entry is not None:
+            return entry.adapter
+        adapters = self._list_adapters()
+        with self._lock:
+            entry = self._devices.get(_key(addr))
+            return entry.adapter if entry is not None else self._pick_adapter(adapters)
+
+    def _thread_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def busy(self, addr: str) -> bool:
+        """True while an exclusive operation holds addr in this process."""
+        with self._lock:
+            lock = self._locks.get(f"dev_{_key(addr)}")
+        return lock is not None and lock.locked()
+
+    @contextmanager
+    def exclusive(self, addr: str):
+        """Hold addr and its adapter exclusively (OTA, FSX). Other devices/adapters are not blocked."""
+        adapter = self.adapter_for(addr) or "default"
+        with ExitStack() as stack:
+            # Adapter before device, in one fixed order, so two operations cannot deadlock
+            for name in (f"adapter_{adapter}", f"dev_{_key(addr)}"):
+                stack.enter_context(self._thread_lock(name))
+                stack.enter_context(_file_lock(name))
+            yield self.get(addr)  # None if addr is not registered
@@ -70,7 +70,7 @@ def run_one(addr, shot_id, size, delay_sec, chunk_size):
     elapsed = time.perf_counter() - t0
     ok = err is None and payload is not None and len(payload) >= size
     if ok and payload and len(payload) >= 8:
-        magic = payload[:8].decode("ascii", errors="replace")
+        magic = bytes(payload[:8]).decode("ascii", errors="replace")
         ok = magic == "SVTSHOT3"
     return ok, elapsed, err
 
@@ -0,0 +1,138 @@
+"""
+Background jobs for long device operations (shot fetch/sync, OTA upgrade, FSX push, BLE unit tests, BLE scan).
+Submitting returns a job id at once; a worker thread runs the operation and publishes structured progress
+(phase, bytes, offset, retries, ...) that clients read from a cheap status call. Jobs live in the backend
+process, so a browser reload can pick a running job up again by id.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = 4
+# Finished jobs kept for status/result lookups (oldest dropped first)
+JOBS_KEPT = 50
+
+_current = threading.local()
+
+
+class Job:
+    """One queued/running/finished operation. progress is merged from update(); result is the operation's
+    return value (a JSON-ready dict)."""
+
+    def __init__(self, kind: str, params: dict | None = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params or {}
+        self.status = "queued"
+        self.progress: dict = {}
+        self.result = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._version = 0
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def update(self, **fields) -> None:
+        """Merge progress fields (safe from any thread, including the async_runner loop)."""
+        with self._lock:
+            self.progress.update(fields)
+            self._version += 1
+            self._changed.notify_all()
+
+    def _finish(self, status: str, result=None, error: str | None = None) -> None:
+        with self._lock:
+            self.status, self.result, self.error = status, result, error
+            self.finished_at = time.time()
+            self._version += 1
+            self._changed.notify_all()
+
+    def wait_change(self, version: int, timeout: float) -> int:
+        """Block until the job changes after version (or timeout); returns the current version."""
+        with self._lock:
+            self._changed.wait_for(lambda: self._version != version, timeout)
+            return self._version
+
+    def to_dict(self, with_result: bool = True) -> dict:
+        with self._lock:
+            end = self.finished_at or time.time()
+            d = {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "error": self.error,
+                "created_at": self.created_at,
+                "elapsed_sec": round(end - self.started_at, 2) if self.started_at else 0.0,
+                "version": self._version,
+            }
+            if with_result:
+                d["result"] = self.result
+            return d
+
+
+class JobManager:
+    """Runs jobs on a small thread pool and keeps them addressable by id."""
+
+    def __init__(self, workers: int = JOB_WORKERS, keep: int = JOBS_KEPT):
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn, params: dict | None = None) -> Job:
+        """Queue fn() as a job. fn returns the result dict; inside it, current_job()/report() reach this job.
+        A result with "ok": false marks the job failed (with its "error")."""
+        job = Job(kind, params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: Job, fn) -> None:
+        _current.job = job
+        with job._lock:
+            job.status = "running"
+            job.started_at = time.time()
+        try:
+            result = fn()
+        except Exception as e:
+            job._finish("failed", error=str(e))
+        else:
+            failed = isinstance(result, dict) and result.get("ok") is False
+            job._finish("failed" if failed else "done", result,
+                        (result.get("error") or "failed") if failed else None)
+        finally:
+            _current.job = None
+
+    def _prune(self) -> None:
+        finished = [j for j in self._jobs.values() if j.done]
+        for j in sorted(finished, key=lambda j: j.created_at)[:max(0, len(finished) - self.keep)]:
+            del self._jobs[j.id]
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list[Job]:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+
+def current_job() -> Job | None:
+    """The job running on this worker thread (None in a plain request). Capture it before handing work to
+    another thread: progress callbacks hold the Job, not the thread-local."""
+    return getattr(_current, "job", None)
+
+
+def report(**fields) -> None:
+    """Publish progress for the current job; no-op outside a job."""
+    job = current_job()
+    if job is not None:
+        job.update(**fields)
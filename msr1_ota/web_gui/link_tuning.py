@@ -0,0 +1,93 @@
+"""
+Per-device BLE fetch tuning: AIMD pacing (inter-chunk delay, segment length, pipeline window) driven by
+timeouts and non-SHOT replies. Chunk length is not tuned: GET_SHOT_CHUNK carries only shot id and offset
+and the firmware picks each chunk's length itself, so the host walks offsets by the length it gets back.
+Tuned values persist in .link_tuning.json so the next fetch starts where the link settled.
+"""
+import json
+import threading
+from pathlib import Path
+
+_TUNING_FILE = Path(__file__).resolve().parent / ".link_tuning.json"
+_file_lock = threading.Lock()
+
+DELAY_MIN_SEC = 0.0
+DELAY_MAX_SEC = 0.5
+DELAY_STEP_SEC = 0.01      # additive decrease of delay on a clean run
+DELAY_BACKOFF_SEC = 0.02   # floor used when backing off from zero delay
+SEGMENT_MIN_BYTES = 1024
+SEGMENT_MAX_BYTES = 16384
+SEGMENT_STEP_BYTES = 512
+WINDOW_MAX = 8
+# Clean chunks between additive increases
+OK_PER_STEP = 8
+
+
+class LinkTuner:
+    """Fetch parameters for one device. Clean chunks creep toward faster settings (additive);
+    a timeout or non-SHOT reply halves segment length and window and doubles the delay."""
+
+    def __init__(self, delay_sec: float = 0.04, segment_bytes: int = 5120, window: int = 4):
+        self.delay_sec = delay_sec
+        self.segment_bytes = segment_bytes
+        self.window = window
+        self._ok = 0
+
+    def on_ok(self) -> None:
+        self._ok += 1
+        if self._ok < OK_PER_STEP:
+            return
+        self._ok = 0
+        self.delay_sec = max(DELAY_MIN_SEC, round(self.delay_sec - DELAY_STEP_SEC, 3))
+        self.segment_bytes = min(SEGMENT_MAX_BYTES, self.segment_bytes + SEGMENT_STEP_BYTES)
+        self.window = min(WINDOW_MAX, self.window + 1)
+
+    def on_loss(self) -> None:
+        """Timeout or unexpected reply."""
+        self._ok = 0
+        self.delay_sec = min(DELAY_MAX_SEC, max(DELAY_BACKOFF_SEC, self.delay_sec * 2))
+        self.segment_bytes = max(SEGMENT_MIN_BYTES, self.segment_bytes // 2)
+        self.window = max(1, self.window // 2)
+
+    def to_dict(self) -> dict:
+        return {
+            "delay_sec": self.delay_sec,
+            "segment_bytes": self.segment_bytes,
+            "window": self.window,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "LinkTuner":
+        t = cls()
+        for k in ("delay_sec", "segment_bytes", "window"):  # older files also hold chunk_size/mtu: ignored
+            if d.get(k) is not None:
+                setattr(t, k, d[k])
+        return t
+
+
+def _key(addr: str) -> str:
+    return (addr or "").strip().upper()
+
+
+def _read_all() -> dict:
+    try:
+        return json.loads(_TUNING_FILE.read_text())
+    except Exception:
+        return {}
+
+
+def load_tuner(addr: str) -> LinkTuner:
+    """Tuner with addr's last saved values (defaults for a new device)."""
+    with _file_lock:
+        d = _read_all().get(_key(addr))
+    return LinkTuner.from_dict(d) if isinstance(d, dict) else LinkTuner()
+
+
+def save_tuner(addr: str, tuner: LinkTuner) -> None:
+    with _file_lock:
+        data = _read_all()
+        data[_key(addr)] = tuner.to_dict()
+        try:
+            _TUNING_FILE.write_text(json.dumps(data, indent=2))
+        except Exception:
+            pass
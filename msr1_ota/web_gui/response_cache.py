@@ -0,0 +1,145 @@
+"""
+Response cache in front of the transports for read-only commands (ID, STATUS, DIAG, GET_CFG, LIST_SHOTS).
+Identical requests share one round trip (single flight: later callers await the request already on the
+air instead of racing it, which on BLE ends in org.bluez.Error.InProgress). A fresh entry is served
+directly; a stale one (within its stale window) is served at once while one background refresh runs.
+Mutating commands sent through send() drop the entries they can change. Everything runs on the
+async_runner loop, so no locking is needed.
+"""
+import asyncio
+import time
+
+from ble_binary_client import (
+    CMD_CLEAR_ERRORS,
+    CMD_DEL_SHOT,
+    CMD_DIAG,
+    CMD_FACTORY_RESET,
+    CMD_FORMAT_STORAGE,
+    CMD_GET_CFG,
+    CMD_ID,
+    CMD_LIST_SHOTS,
+    CMD_LOAD_CFG,
+    CMD_RESPONSE,
+    CMD_SAVE_CFG,
+    CMD_SELFTEST,
+    CMD_SET,
+    CMD_START_RECORD,
+    CMD_STATUS,
+    CMD_STOP_RECORD,
+)
+
+# cmd -> (fresh_sec, stale_sec): served as-is while younger than fresh_sec, served stale (and refreshed in
+# the background) until fresh_sec + stale_sec
+CACHE_TTL = {
+    CMD_ID: (300.0, 3600.0),
+    CMD_STATUS: (1.0, 4.0),
+    CMD_DIAG: (5.0, 25.0),
+    CMD_GET_CFG: (30.0, 270.0),
+    CMD_LIST_SHOTS: (5.0, 25.0),
+}
+_ALL = tuple(CACHE_TTL)
+# Mutating cmd -> cached cmds whose answers it can change
+INVALIDATES = {
+    CMD_SET: (CMD_GET_CFG, CMD_STATUS),
+    CMD_SAVE_CFG: (CMD_GET_CFG,),
+    CMD_LOAD_CFG: (CMD_GET_CFG, CMD_STATUS),
+    CMD_FACTORY_RESET: _ALL,
+    CMD_CLEAR_ERRORS: (CMD_STATUS, CMD_DIAG),
+    CMD_SELFTEST: (CMD_STATUS, CMD_DIAG),
+    CMD_START_RECORD: (CMD_STATUS, CMD_LIST_SHOTS),
+    CMD_STOP_RECORD: (CMD_STATUS, CMD_LIST_SHOTS),
+    CMD_DEL_SHOT: (CMD_LIST_SHOTS, CMD_STATUS),
+    CMD_FORMAT_STORAGE: (CMD_LIST_SHOTS, CMD_STATUS),
+}
+
+
+def _link_send(link, frame: bytes, timeout_sec: float | None):
+    return link.send(frame) if timeout_sec is None else link.send(frame, timeout_sec)
+
+
+class ResponseCache:
+    """Cached, single-flight send for read-only commands; pass-through (plus invalidation) for the rest."""
+
+    def __init__(self, ttl: dict | None = None, invalidates: dict | None = None):
+        self.ttl = CACHE_TTL if ttl is None else ttl
+        self.invalidates = INVALIDATES if invalidates is None else invalidates
+        self._entries: dict[tuple, tuple[bytes, float]] = {}
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._gen: dict[tuple, int] = {}
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "coalesced": 0, "invalidated": 0}
+
+    @staticmethod
+    def _key(link, frame: bytes) -> tuple:
+        return (link.kind, link.device, bytes(frame))
+
+    async def send(self, link, frame: bytes, timeout_sec: float | None = None,
+                   max_age: float | None = None) -> tuple[bytes | None, str | None]:
+        """link.send(frame) through the cache. timeout_sec=None uses the transport's own default (WiFi waits
+        longer than BLE/serial). max_age (s) overrides the command's fresh time; 0 forces a round trip
+        (still shared with one already in flight, and stored for everyone else)."""
+        cmd = frame[0]
+        ttl = self.ttl.get(cmd)
+        if ttl is None:
+            rsp, err = await _link_send(link, frame, timeout_sec)
+            if cmd in self.invalidates:
+                self.invalidate(link, self.invalidates[cmd])
+            return (rsp, err)
+        fresh_sec, stale_sec = ttl
+        if max_age is not None:
+            fresh_sec, stale_sec = max_age, 0.0
+        key = self._key(link, frame)
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[1]
+            if age < fresh_sec:
+                self.stats["hits"] += 1
+                return (entry[0], None)
+            if age < fresh_sec + stale_sec:
+                self.stats["stale"] += 1
+                self._refresh(link, key, frame, timeout_sec)
+                return (entry[0], None)
+        if key in self._inflight:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+        return await asyncio.shield(self._refresh(link, key, frame, timeout_sec))
+
+    def _refresh(self, link, key: tuple, frame: bytes, timeout_sec: float | None) -> asyncio.Future:
+        """The in-flight request for key, started if there is none."""
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = self._inflight[key] = asyncio.ensure_future(self._fetch(link, key, frame, timeout_sec))
+        return fut
+
+    async def _fetch(self, link, key: tuple, frame: bytes, timeout_sec: float | None):
+        gen = self._gen.get(key[:2], 0)
+        try:
+            rsp, err = await _link_send(link, frame, timeout_sec)
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+        # Only store replies of the expected type, and none that raced an invalidating command
+        if not err and rsp and rsp[0] == CMD_RESPONSE.get(frame[0], rsp[0]) and self._gen.get(key[:2], 0) == gen:
+            self._entries[key] = (rsp, time.monotonic())
+        return (rsp, err)
+
+    def invalidate(self, link, cmds=None) -> None:
+        """Drop link's cached (and in-flight) entries for cmds (all when None)."""
+        dev = (link.kind, link.device)
+        self._gen[dev] = self._gen.get(dev, 0) + 1
+        for table in (self._entries, self._inflight):
+            for key in [k for k in table if k[:2] == dev and (cmds is None or k[2][0] in cmds)]:
+                del table[key]
+                self.stats["invalidated"] += table is self._entries
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._gen.clear()
+
+
+_cache = ResponseCache()
+
+
+def get_cache() -> ResponseCache:
+    """The process-wide cache shared by the API, batches and status pollers."""
+    return _cache
@@ -0,0 +1,323 @@
+"""
+Typed decoding of SmartBall binary responses. Each frame layout is a precompiled struct.Struct and each
+response type decodes to a slotted dataclass, so format_response (display text), the API ("decoded"
+JSON) and helpers such as parse_shot_list all read the same fields instead of re-parsing raw bytes.
+"""
+import dataclasses
+import struct
+from dataclasses import dataclass, field
+
+from ble_binary_client import (
+    RSP_BUS_SCAN,
+    RSP_CFG,
+    RSP_DIAG,
+    RSP_ID,
+    RSP_SELFTEST,
+    RSP_SHOT_LIST,
+    RSP_SPI_DATA,
+    RSP_STATUS,
+)
+
+# Offsets are from the start of the frame (type u8, plen u16, payload)
+_HDR = struct.Struct("<BH")
+_ID = struct.Struct("<HBB")                    # @3 fw, proto, hw_rev; uid @9..17
+_STATUS = struct.Struct("<IIIBIBBII2xbBI")     # @3 .. 38
+_STATUS_BLE = struct.Struct("<BbbHHxII")       # @38, present when frame >= 68 bytes
+_DIAG = struct.Struct("<BB2xHb")               # @3 .. 10
+_DIAG_LSM6 = struct.Struct("<BHH")             # @10, frame >= 16 (not ESP32-C6)
+_DIAG_ESP32 = struct.Struct("<bIBBB")          # @15, frame >= 24 (ESP32-C6)
+_SHOT_ENTRY = struct.Struct("<II")
+_SPI_ENTRY = struct.Struct("<BB3sB")
+_I2C_ENTRY = struct.Struct("<BB")
+_U16 = struct.Struct("<H")
+
+STATUS_BLE_BLOCK_LEN = 68
+SHOT_LIST_MAX = 32
+CFG_MAX_ENTRIES = 16
+WHOAMI_LSM6DS3 = 0x6A
+WHOAMI_ESP32C6 = 0xC6
+
+STATUS_RESET_NAMES = {0: "?", 1: "POR", 2: "pin", 3: "soft", 4: "lockup", 5: "watchdog", 6: "other"}
+ESP32_RESET_NAMES = {0: "?", 1: "POR", 2: "pin", 3: "soft", 4: "panic", 5: "int_wdt", 6: "task_wdt",
+                     7: "deep_sleep", 8: "brownout"}
+SPI_TYPE_NAMES = {1: "LSM6DSOX", 2: "ADXL375", 3: "W25Q64"}
+
+
+@dataclass(slots=True)
+class DeviceId:
+    fw_version: str
+    protocol: int
+    hw_rev: int
+    uid: bytes
+
+
+@dataclass(slots=True)
+class BleLinkStats:
+    connected: bool
+    rssi: int
+    rssi_avg: int
+    conn_interval_ms: int
+    mtu: int
+    packets_tx: int
+    packets_rx: int
+
+
+@dataclass(slots=True)
+class Status:
+    uptime_ms: int
+    last_error: int
+    error_flags: int
+    state: int
+    state_name: str
+    samples: int
+    saturation_internal: int
+    saturation_lsm: int
+    storage_used: int
+    storage_free: int
+    temp_c: float
+    reset_reason: int
+    reset_name: str
+    build_id: int
+    ble: BleLinkStats | None = None
+
+
+@dataclass(slots=True)
+class Lsm6Debug:
+    last_read_ok: bool
+    fail_accel: int
+    fail_gyro: int
+
+
+@dataclass(slots=True)
+class Esp32Info:
+    wifi_rssi: int | None
+    free_heap: int
+    reset_reason: int
+    reset_name: str
+    cores: int
+    rev: int
+
+
+@dataclass(slots=True)
+class Diag:
+    imu_ready: bool
+    whoami: int
+    chip: str | None
+    voltage_mv: int
+    temp_c: float
+    lsm6: Lsm6Debug | None = None
+    esp32: Esp32Info | None = None
+
+
+@dataclass(slots=True)
+class SelfTest:
+    result: int
+    passed: bool
+
+
+@dataclass(slots=True)
+class ConfigEntry:
+    key: str
+    value: bytes
+    display: str | None = None
+
+
+@dataclass(slots=True)
+class Config:
+    entries: list[ConfigEntry] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ShotInfo:
+    shot_id: int
+    size: int
+
+
+@dataclass(slots=True)
+class ShotList:
+    count: int
+    shots: list[ShotInfo] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class SpiDevice:
+    type: int
+    name: str
+    cs: int
+    ident: bytes
+    present: bool
+
+
+@dataclass(slots=True)
+class I2cDevice:
+    addr: int
+    name: str
+    present: bool
+
+
+@dataclass(slots=True)
+class BusScan:
+    spi: list[SpiDevice] = field(default_factory=list)
+    i2c: list[I2cDevice] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class SpiData:
+    data: bytes
+
+
+def _temp(raw_s8: int) -> float:
+    return round(raw_s8 * 0.1, 1)
+
+
+def _decode_id(rsp) -> DeviceId | None:
+    if len(rsp) < 16:
+        return None
+    fw, proto, hw = _ID.unpack_from(rsp, 3)
+    return DeviceId(f"{fw >> 8}.{fw & 0xFF}", proto, hw, bytes(rsp[9:17]))
+
+
+def _decode_status(rsp) -> Status | None:
+    if len(rsp) < 38:
+        return None
+    (uptime, last_err, flags, state, samples, sat_int, sat_lsm, used, free,
+     temp, reset, build) = _STATUS.unpack_from(rsp, 3)
+    ble = None
+    if len(rsp) >= STATUS_BLE_BLOCK_LEN:
+        conn, rssi, rssi_avg, interval, mtu, tx, rx = _STATUS_BLE.unpack_from(rsp, 38)
+        ble = BleLinkStats(bool(conn), rssi, rssi_avg, interval, mtu, tx, rx)
+    return Status(uptime, last_err, flags, state, "recording" if state == 2 else "idle", samples,
+                  sat_int, sat_lsm, used, free, _temp(temp), reset, STATUS_RESET_NAMES.get(reset, str(reset)),
+                  build, ble)
+
+
+def _decode_diag(rsp) -> Diag | None:
+    if len(rsp) < 10:
+        return None
+    imu_ready, whoami, voltage, temp = _DIAG.unpack_from(rsp, 3)
+    chip = "LSM6DS3TR-C" if whoami == WHOAMI_LSM6DS3 else ("ESP32-C6" if whoami == WHOAMI_ESP32C6 else None)
+    diag = Diag(bool(imu_ready), whoami, chip, voltage, _temp(temp))
+    if len(rsp) >= 16 and whoami != WHOAMI_ESP32C6:
+        ok, fa, fg = _DIAG_LSM6.unpack_from(rsp, 10)
+        diag.lsm6 = Lsm6Debug(bool(ok), fa, fg)
+    if whoami == WHOAMI_ESP32C6 and len(rsp) >= 24:
+        rssi, heap, reset, cores, rev = _DIAG_ESP32.unpack_from(rsp, 15)
+        diag.esp32 = Esp32Info(rssi if rssi > -128 else None, heap, reset,
+                               ESP32_RESET_NAMES.get(reset, str(reset)), cores, rev)
+    return diag
+
+
+def _cfg_display(key: str, val: bytes) -> str | None:
+    """Human-readable value for known config keys."""
+    if key in ("sample_rate", "rate_int", "rate_lsm") and len(val) == 2:
+        return f"{_U16.unpack(val)[0]} Hz"
+    if key in ("gyro_fs_int", "gyro_fs_lsm") and len(val) == 2:
+        return f"{_U16.unpack(val)[0]} dps"
+    if key in ("accel_fs_int", "accel_fs_lsm") and len(val) == 1:
+        return f"±{val[0]}g"
+    if key == "event_mode" and len(val) == 1:
+        return "event" if val[0] else "normal"
+    if key == "trigger_g" and len(val) == 1:
+        return str(val[0])
+    return None
+
+
+def _decode_cfg(rsp) -> Config | None:
+    if len(rsp) <= 4:
+        return None
+    cfg = Config()
+    off = 4
+    for _ in range(min(rsp[3], CFG_MAX_ENTRIES)):
+        if off + 2 > len(rsp):
+            break
+        klen, vlen = rsp[off], rsp[off + 1]
+        off += 2
+        if klen + vlen == 0 or off + klen + vlen > len(rsp):
+            break
+        key = bytes(rsp[off:off + klen - 1]).decode("utf-8", errors="replace") if klen > 1 else "(empty)"
+        off += klen
+        val = bytes(rsp[off:off + vlen])
+        off += vlen
+        cfg.entries.append(ConfigEntry(key, val, _cfg_display(key, val)))
+    return cfg
+
+
+def _decode_shot_list(rsp) -> ShotList | None:
+    if len(rsp) < 4:
+        return None
+    n = rsp[3]
+    shots = []
+    for i in range(min(n, SHOT_LIST_MAX)):
+        off = 4 + i * _SHOT_ENTRY.size
+        if off + _SHOT_ENTRY.size > len(rsp):
+            break
+        shots.append(ShotInfo(*_SHOT_ENTRY.unpack_from(rsp, off)))
+    return ShotList(n, shots)
+
+
+def _decode_bus_scan(rsp) -> BusScan | None:
+    if len(rsp) < 5:
+        return None
+    scan = BusScan()
+    off = 4
+    for _ in range(rsp[3]):
+        if off + _SPI_ENTRY.size > len(rsp):
+            break
+        stype, cs, ident, flags = _SPI_ENTRY.unpack_from(rsp, off)
+        off += _SPI_ENTRY.size
+        scan.spi.append(SpiDevice(stype, SPI_TYPE_NAMES.get(stype, f"Type-{stype}"), cs, ident, bool(flags & 0x01)))
+    i2c_n = rsp[off] if off < len(rsp) else 0
+    off += 1
+    for _ in range(i2c_n):
+        if off + _I2C_ENTRY.size > len(rsp):
+            break
+        addr, flags = _I2C_ENTRY.unpack_from(rsp, off)
+        off += _I2C_ENTRY.size
+        scan.i2c.append(I2cDevice(addr, "LSM6DS3TR-C" if addr == WHOAMI_LSM6DS3 else f"0x{addr:02X}", bool(flags & 0x01)))
+    return scan
+
+
+def _decode_spi_data(rsp) -> SpiData | None:
+    plen = _HDR.unpack_from(rsp)[1]
+    return SpiData(bytes(rsp[3:3 + plen]))
+
+
+_DECODERS = {
+    RSP_ID: _decode_id,
+    RSP_STATUS: _decode_status,
+    RSP_DIAG: _decode_diag,
+    RSP_SELFTEST: lambda rsp: SelfTest(rsp[3], rsp[3] == 0) if len(rsp) >= 4 else None,
+    RSP_CFG: _decode_cfg,
+    RSP_SHOT_LIST: _decode_shot_list,
+    RSP_BUS_SCAN: _decode_bus_scan,
+    RSP_SPI_DATA: _decode_spi_data,
+}
+
+
+def decode(rsp) -> object | None:
+    """Typed view of a response frame, or None if the type is unknown or the frame too short."""
+    if rsp is None or len(rsp) < _HDR.size:
+        return None
+    decoder = _DECODERS.get(rsp[0])
+    return decoder(rsp) if decoder is not None else None
+
+
+def _jsonable(value):
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+def to_json(obj) -> dict | None:
+    """JSON-ready dict of a decoded response (bytes as hex), with its class name under "type"."""
+    if obj is None:
+        return None
+    return {"type": type(obj).__name__, **_jsonable(dataclasses.asdict(obj))}
+
+
+def decode_json(rsp) -> dict | None:
+    return to_json(decode(rsp))
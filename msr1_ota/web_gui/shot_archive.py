@@ -0,0 +1,208 @@
+"""
+Saved-shot archive: raw SVTSHOT3 bytes in content-addressed <sha256>.svtshot files (written once, shared by
+identical shots) and one row of metadata per saved shot in an SQLite index (saved_shots/index.sqlite3), so
+listing, filtering and the "already archived?" check of a sync are indexed queries that never read a blob.
+Legacy saved_shots/<id>.json records (raw_hex inside) are imported once under the same id when the archive
+is opened and renamed to <id>.json.migrated.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import svtshot3
+
+SAVED_SHOTS_DIR = Path(__file__).resolve().parent / "saved_shots"
+INDEX_NAME = "index.sqlite3"
+BLOB_SUFFIX = ".svtshot"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shots (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    saved REAL NOT NULL,
+    shot_id INTEGER,
+    device TEXT,
+    size INTEGER NOT NULL,
+    sample_rate INTEGER,
+    count INTEGER,
+    sha256 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS shots_saved ON shots (saved DESC);
+CREATE INDEX IF NOT EXISTS shots_lookup ON shots (shot_id, size, device);
+CREATE INDEX IF NOT EXISTS shots_device ON shots (device, saved DESC);
+CREATE INDEX IF NOT EXISTS shots_sha ON shots (sha256);
+"""
+_COLUMNS = ("id", "name", "created_at", "shot_id", "device", "size", "sample_rate", "count", "sha256")
+
+
+def _shot_id(value) -> int | None:
+    """Device shot id from an int or a "0x..."/decimal string (GUI records); None if missing or invalid."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return int(value, 0) if isinstance(value, str) else int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ShotArchive:
+    """Blob files plus SQLite index under root. Safe to share between the Flask threads and the async loop."""
+
+    def __init__(self, root: Path | None = None):
+        self.root = root or SAVED_SHOTS_DIR
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.root / INDEX_NAME, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self.migrated = self.migrate_json()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / f"{sha256}{BLOB_SUFFIX}"
+
+    def _write_blob(self, data: bytes, sha: str) -> None:
+        """Write the blob unless present (call with self._lock held, so delete() cannot unlink it meanwhile)."""
+        path = self.blob_path(sha)
+        if not path.exists():
+            tmp = path.with_suffix(f".{uuid.uuid4().hex[:8]}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+
+    def save(self, payload, shot_id=None, name: str | None = None, device: str | None = None,
+             sample_rate: int | None = None, count: int | None = None, sid: str | None = None,
+             created_at: str | None = None, saved: float | None = None) -> dict:
+        """Store payload and index it; sample_rate/count default to the SVTSHOT3 header. Returns the record."""
+        data = bytes(payload)
+        hdr = svtshot3.parse_header(data) or {}
+        shot_id = _shot_id(shot_id)
+        rec = {
+            "id": sid or str(uuid.uuid4())[:8],
+            "name": name or f"Shot {shot_id if shot_id is not None else '?'}",
+            "created_at": created_at or time.strftime("%Y-%m-%d %H:%M:%S"),
+            "shot_id": shot_id,
+            "device": (device or "").upper() or None,
+            "size": len(data),
+            "sample_rate": sample_rate if sample_rate is not None else hdr.get("sample_rate"),
+            "count": count if count is not None else hdr.get("count"),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }
+        # Blob and row under one lock: a concurrent delete() of the last record sharing this content either
+        # finishes first (blob rewritten here) or sees this row and keeps the blob
+        with self._lock:
+            self._write_blob(data, rec["sha256"])
+            self._db.execute(
+                f"INSERT INTO shots ({', '.join(_COLUMNS)}, saved) VALUES ({', '.join('?' * len(_COLUMNS))}, ?)",
+                [rec[c] for c in _COLUMNS] + [time.time() if saved is None else saved])
+        return rec
+
+    def get(self, sid: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(_COLUMNS)} FROM shots WHERE id = ?", (sid,)).fetchone()
+        return dict(row) if row else None
+
+    def load(self, sid: str) -> tuple[dict | None, bytes | None]:
+        """(record, raw SVTSHOT3 bytes); (None, None) if sid is unknown, (record, None) if its blob is gone."""
+        rec = self.get(sid)
+        if rec is None:
+            return (None, None)
+        try:
+            return (rec, self.blob_path(rec["sha256"]).read_bytes())
+        except OSError:
+            return (rec, None)
+
+    def query(self, device: str | None = None, shot_id=None, name: str | None = None,
+              limit: int | None = None) -> list[dict]:
+        """Records newest first, optionally filtered by device, device shot id and name substring."""
+        where, args = [], []
+        if device:
+            where.append("device = ?")
+            args.append(device.upper())
+        if _shot_id(shot_id) is not None:
+            where.append("shot_id = ?")
+            args.append(_shot_id(shot_id))
+        if name:
+            where.append("name LIKE ? ESCAPE '\\'")
+            args.append("%" + name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM shots"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY saved DESC"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        with self._lock:
+            return [dict(r) for r in self._db.execute(sql, args)]
+
+    def contains(self, device: str | None, shot_id: int, size: int) -> bool:
+        """True if a shot of this size saved from this very device is archived. Records without a device
+        (migrated JSON, GUI saves with no link) never match: shot ids repeat across balls, and a false match
+        makes a sync delete a shot it never fetched."""
+        if not device:
+            return False
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM shots WHERE shot_id = ? AND size = ? AND device = ? LIMIT 1",
+                                   (shot_id, size, device.upper())).fetchone()
+        return row is not None
+
+    def delete(self, sid: str) -> bool:
+        """Drop the record; the blob goes too unless another record has the same content."""
+        with self._lock:
+            row = self._db.execute("SELECT sha256 FROM shots WHERE id = ?", (sid,)).fetchone()
+            if row is None:
+                return False
+            self._db.execute("DELETE FROM shots WHERE id = ?", (sid,))
+            shared = self._db.execute("SELECT 1 FROM shots WHERE sha256 = ? LIMIT 1", (row["sha256"],)).fetchone()
+            if shared is None:
+                self.blob_path(row["sha256"]).unlink(missing_ok=True)
+        return True
+
+    def migrate_json(self) -> int:
+        """Import legacy <id>.json records (kept under their id); returns how many were imported."""
+        n = 0
+        for p in sorted(self.root.glob("*.json")):
+            try:
+                with open(p) as f:
+                    d = json.load(f)
+            except (OSError, ValueError):
+                continue
+            raw_hex = d.get("raw_hex") if isinstance(d, dict) else None
+            if not isinstance(raw_hex, str):
+                continue  # not a saved-shot record: leave it alone
+            try:
+                data = bytes.fromhex(raw_hex.replace(" ", ""))
+            except ValueError:
+                continue
+            if not data:
+                continue
+            if self.get(p.stem) is None:
+                self.save(data, d.get("shot_id"), d.get("name") or p.stem, d.get("device"), d.get("sample_rate"),
+                          d.get("count"), sid=p.stem, created_at=d.get("created_at"),
+                          saved=p.stat().st_mtime)
+                n += 1
+            p.rename(p.with_name(p.name + ".migrated"))
+        return n
+
+
+_archives: dict[Path, ShotArchive] = {}
+_archives_lock = threading.Lock()
+
+
+def get_archive(root: Path | None = None) -> ShotArchive:
+    """Shared archive for root (default saved_shots/), opened (and migrated) on first use."""
+    root = Path(root or SAVED_SHOTS_DIR).resolve()
+    with _archives_lock:
+        archive = _archives.get(root)
+        if archive is None:
+            archive = _archives[root] = ShotArchive(root)
+        return archive
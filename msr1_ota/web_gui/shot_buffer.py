@@ -0,0 +1,59 @@
+"""
+Preallocated reassembly buffer for shot downloads. The size is known from LIST_SHOTS, so chunks are
+written in place through memoryview slices (no per-chunk reallocation), a byte-per-byte coverage map
+tracks what has arrived, and callers get a read-only view instead of a copy.
+"""
+
+_ONES = memoryview(b"\x01" * 65536)
+
+
+class ShotBuffer:
+    """Shot bytes plus coverage map (have[i] != 0 once byte i is received)."""
+
+    def __init__(self, size: int):
+        self.size = max(0, size)
+        self.buf = bytearray(self.size)
+        self.have = bytearray(self.size)
+        self._mv = memoryview(self.buf)
+        # Optional callable(offset, n) after each stored chunk (progress reporting)
+        self.on_write = None
+
+    def write(self, offset: int, data) -> int:
+        """Copy data (bytes/memoryview) in at offset, clipped to size. Returns bytes written."""
+        n = max(0, min(len(data), self.size - offset))
+        if n:
+            self._mv[offset:offset + n] = memoryview(data)[:n]
+            self.have[offset:offset + n] = _ONES[:n] if n <= len(_ONES) else b"\x01" * n
+            if self.on_write is not None:
+                self.on_write(offset, n)
+        return n
+
+    @property
+    def received(self) -> int:
+        return self.size - self.have.count(0)
+
+    @property
+    def complete(self) -> bool:
+        return self.size > 0 and self.have.find(0) == -1
+
+    def next_missing(self, start: int = 0) -> int:
+        """First byte offset >= start not yet received (size if none)."""
+        pos = self.have.find(0, start)
+        return self.size if pos == -1 else pos
+
+    def missing_offsets(self, step: int, limit: int) -> list[int]:
+        """Up to limit request offsets, step apart, covering the first gaps."""
+        out = []
+        pos = self.have.find(0)
+        while pos != -1 and len(out) < limit:
+            out.append(pos)
+            pos = self.have.find(0, pos + step)
+        return out
+
+    def view(self, start: int = 0, end: int | None = None) -> memoryview:
+        """Read-only view of buf[start:end] (no copy)."""
+        return self._mv[start:end].toreadonly()
+
+    def prefix(self) -> memoryview:
+        """Read-only view of the contiguous received bytes from offset 0."""
+        return self.view(0, self.next_missing())
@@ -0,0 +1,109 @@
+"""
+On-disk journal of received shot chunks so an interrupted download resumes instead of restarting.
+One append-only file per (device, shot_id, size): each record is <IHI offset, length, crc32> + data.
+Replay stops at the first short or corrupt record (e.g. server killed mid-write).
+"""
+import re
+import struct
+import time
+import zlib
+from pathlib import Path
+
+from shot_buffer import ShotBuffer
+
+JOURNAL_DIR = Path(__file__).resolve().parent / ".shot_journal"
+# Journals not touched for this long are removed when another journal is opened
+JOURNAL_MAX_AGE_SEC = 7 * 24 * 3600
+
+_REC = struct.Struct("<IHI")
+
+
+def _safe_key(device: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", (device or "").strip().upper()).strip("_") or "UNKNOWN"
+
+
+def journal_path(device: str, shot_id: int, size: int, root: Path | None = None) -> Path:
+    return (root or JOURNAL_DIR) / f"{_safe_key(device)}_{shot_id & 0xFFFFFFFF:08X}_{size}.journal"
+
+
+class ShotJournal(ShotBuffer):
+    """ShotBuffer whose writes are mirrored to an on-disk journal."""
+
+    def __init__(self, path: Path, size: int):
+        super().__init__(size)
+        self.path = path
+        self._fh = None
+        self._replay()
+
+    def _replay(self) -> None:
+        if not self.path.exists():
+            return
+        data = self.path.read_bytes()
+        pos = 0
+        while pos + _REC.size <= len(data):
+            off, length, crc = _REC.unpack_from(data, pos)
+            chunk = data[pos + _REC.size:pos + _REC.size + length]
+            if len(chunk) < length or zlib.crc32(chunk) != crc or off + length > self.size:
+                break
+            super().write(off, chunk)
+            pos += _REC.size + length
+        if pos < len(data):
+            with open(self.path, "r+b") as f:  # drop the torn tail so new records append cleanly
+                f.truncate(pos)
+
+    def write(self, offset: int, data) -> int:
+        """Store a verified chunk and append it to the journal file."""
+        n = super().write(offset, data)
+        if n:
+            if self._fh is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fh = open(self.path, "ab")
+            chunk = self.view(offset, offset + n)
+            self._fh.write(_REC.pack(offset, n, zlib.crc32(chunk)))
+            self._fh.write(chunk)
+            self._fh.flush()
+        return n
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def discard(self) -> None:
+        """Delete the journal (shot complete or deleted on device)."""
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def open_journal(device: str, shot_id: int, size: int, root: Path | None = None) -> ShotJournal:
+    """Open (or resume) the journal for this shot; prunes stale journals."""
+    root = root or JOURNAL_DIR
+    _prune(root)
+    return ShotJournal(journal_path(device, shot_id, size, root), size)
+
+
+def discard_journals(device: str, shot_id: int, root: Path | None = None) -> None:
+    """Remove journals for shot_id on device (any size), e.g. after DEL_SHOT."""
+    root = root or JOURNAL_DIR
+    if not root.exists():
+        return
+    for p in root.glob(f"{_safe_key(device)}_{shot_id & 0xFFFFFFFF:08X}_*.journal"):
+        try:
+            p.unlink()
+        except OSError:
+            pass
+
+
+def _prune(root: Path) -> None:
+    if not root.exists():
+        return
+    cutoff = time.time() - JOURNAL_MAX_AGE_SEC
+    for p in root.glob("*.journal"):
+        try:
+            if p.stat().st_mtime < cutoff:
+                p.unlink()
+        except OSError:
+            pass
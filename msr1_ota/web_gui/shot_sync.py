@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Bulk shot offload over one managed link: LIST_SHOTS, fetch every shot not already archived, verify the
+SVTSHOT3 length/CRC, save it to the shot archive (saved_shots/), then DEL_SHOT on the device. Runs on one
+shared transport (BLE: the device's persistent BleSession, so one connection for the whole sync; WiFi:
+keep-alive HTTP; serial: one open port). Interrupted fetches resume from the shot journal on the next sync.
+Usage: python3 shot_sync.py --address AA:BB:CC:DD:EE:FF
+       python3 shot_sync.py --device-url http://192.168.68.89 [--keep]
+       python3 shot_sync.py --port /dev/ttyACM0
+"""
+import argparse
+import struct
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import async_runner
+import svtshot3
+from transport import fetch_shot, get_transport
+from ble_binary_client import CMD_DEL_SHOT, CMD_LIST_SHOTS, RSP_STATUS, make_frame, parse_shot_list
+from response_cache import get_cache
+from shot_archive import SAVED_SHOTS_DIR, get_archive
+from shot_journal import discard_journals, open_journal
+
+# Firmware's built-in test shot: always listed, cannot be deleted
+TEST_SHOT_ID = 0xAAAAAAAA
+MAX_SHOT_SIZE = 1024 * 1024
+
+
+def save_shot(payload, shot_id: int, name: str | None = None, device: str | None = None,
+              root: Path | None = None) -> dict:
+    """Archive a verified shot (same store as POST /api/saved-shots) and return its record."""
+    return get_archive(root).save(payload, shot_id, name, device)
+
+
+def _kbps(nbytes: int, sec: float) -> float | None:
+    return round(nbytes / 1024 / sec, 2) if sec > 0 else None
+
+
+async def _sync_one(link, shot_id: int, size: int, delete: bool, root: Path | None, tuner) -> dict:
+    entry = {"shot_id": f"0x{shot_id:08X}", "size": size, "status": "failed", "error": None, "warning": None,
+             "saved_id": None, "deleted": False, "elapsed_ms": 0.0, "kbps": None}
+    if shot_id == TEST_SHOT_ID:
+        entry.update(status="skipped", error="built-in test shot")
+        return entry
+    if not 0 < size <= MAX_SHOT_SIZE:
+        entry["error"] = f"bad size {size}"
+        return entry
+    t0 = time.monotonic()
+    if get_archive(root).contains(link.device, shot_id, size):
+        entry["status"] = "archived"
+    else:
+        journal = open_journal(link.device, shot_id, size)
+        payload, err = await fetch_shot(link, shot_id, size, journal=journal, tuner=tuner)
+        fetch_sec = time.monotonic() - t0
+        if err:
+            journal.close()
+            entry["error"] = f"{err} ({journal.received}/{size} bytes kept for resume)"
+            entry["elapsed_ms"] = round(fetch_sec * 1000, 1)
+            return entry
+        err = svtshot3.verify(payload)
+        if err:
+            journal.discard()  # bad data on the device: refetching would not help
+            entry.update(error=f"verify failed: {err}", elapsed_ms=round(fetch_sec * 1000, 1))
+            return entry
+        entry["warning"] = svtshot3.header_warning(payload)
+        rec = save_shot(payload, shot_id, device=link.device, root=root)
+        journal.discard()
+        entry.update(status="synced", saved_id=rec["id"], kbps=_kbps(size, fetch_sec))
+    if delete:
+        rsp, err = await get_cache().send(link, make_frame(CMD_DEL_SHOT, payload=struct.pack("<I", shot_id)), 5.0)
+        if err or not rsp or rsp[0] != RSP_STATUS:
+            entry["error"] = f"saved, delete failed: {err or 'unexpected response'}"
+        else:
+            entry["deleted"] = True
+            discard_journals(link.device, shot_id)
+    entry["elapsed_ms"] = round((time.monotonic() - t0) * 1000, 1)
+    return entry
+
+
+async def sync_shots(link, delete: bool = True, root: Path | None = None, progress=None) -> dict:
+    """List, fetch, verify, save and (delete=True) DEL_SHOT every shot on link's device (a transport.Transport).
+    progress: optional callable(entry) after each shot. Returns report with per-shot status and throughput."""
+    t0 = time.monotonic()
+    report = {"ok": False, "device": link.device, "transport": link.kind, "error": None, "shots": [],
+              "bytes": 0, "elapsed_sec": 0.0, "kbps": None}
+    tuner = None
+    if link.kind == "ble":
+        from link_tuning import load_tuner
+        tuner = load_tuner(link.device)
+    try:
+        rsp, err = await get_cache().send(link, make_frame(CMD_LIST_SHOTS, payload=b"\x00"), 5.0, max_age=0.0)
+        shots, err = (None, err) if err else parse_shot_list(rsp)
+        if err:
+            report["error"] = f"LIST_SHOTS: {err}"
+            return report
+        for shot_id, size in shots:
+            entry = await _sync_one(link, shot_id, size, delete, root, tuner)
+            report["shots"].append(entry)
+            if entry["status"] == "synced":
+                report["bytes"] += size
+            if progress is not None:
+                progress(entry)
+        report["ok"] = not any(e["status"] == "failed" or (e["status"] != "skipped" and e["error"])
+                               for e in report["shots"])
+        return report
+    finally:
+        if tuner is not None:
+            from link_tuning import save_tuner
+            save_tuner(link.device, tuner)
+        report["elapsed_sec"] = round(time.monotonic() - t0, 2)
+        report["kbps"] = _kbps(report["bytes"], report["elapsed_sec"])
+
+
+def sync_device(kind: str, target: str, delete: bool = True, root: Path | None = None, progress=None) -> dict:
+    """Blocking sync_shots on the shared transport for kind ("ble", "wifi", "serial") and target."""
+    return async_runner.run_sync(sync_shots(get_transport(kind, target), delete, root, progress))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Offload all shots from a SmartBall (fetch, verify, save, delete).")
+    target = ap.add_mutually_exclusive_group(required=True)
+    target.add_argument("--address", help="BLE address (or name) of the SmartBall")
+    target.add_argument("--device-url", help="WiFi device URL, e.g. http://192.168.68.89")
+    target.add_argument("--port", help="USB serial port, e.g. /dev/ttyACM0")
+    ap.add_argument("--keep", action="store_true", help="do not DEL_SHOT after saving")
+    ap.add_argument("--out", type=Path, default=None, help=f"shot archive directory (default {SAVED_SHOTS_DIR})")
+    args = ap.parse_args()
+
+    def show(e):
+        extra = f" {e['kbps']} KiB/s" if e["kbps"] else ""
+        print(f"  {e['shot_id']} {e['size']:>7} B  {e['status']:<8}{' deleted' if e['deleted'] else ''}{extra}"
+              + (f"  ({e['error']})" if e["error"] else "") + (f"  [{e['warning']}]" if e["warning"] else ""))
+
+    if args.address:
+        kind, target = "ble", args.address
+    elif args.device_url:
+        kind, target = "wifi", args.device_url
+    else:
+        kind, target = "serial", args.port
+    report = sync_device(kind, target, not args.keep, args.out, show)
+    if report["error"]:
+        print(f"Sync failed: {report['error']}")
+        return 1
+    print(f"{len(report['shots'])} shots, {report['bytes']} B in {report['elapsed_sec']} s"
+          + (f" ({report['kbps']} KiB/s)" if report["kbps"] else ""))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
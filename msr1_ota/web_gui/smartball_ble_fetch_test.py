@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 SmartBall BLE fetch test: known test shot (0xAAAAAAAA, 15360 bytes) on device.
-Tests one-connection and per-connection methods multiple times, verifies against known file.
+Tests one-connection, per-connection and pipelined methods multiple times, verifies against known file.
 Usage: BLE_ADDR=XX:XX:... python3 smartball_ble_fetch_test.py
        or run without BLE_ADDR to scan for SmartBall.
 """
@@ -22,6 +22,8 @@ from ble_binary_client import (
     send_binary_cmd_sync,
     fetch_shot_one_connection_sync,
     fetch_shot_chunked_sync,
+    fetch_shot_pipelined_sync,
+    close_session_sync,
     CMD_LIST_SHOTS,
     RSP_SHOT_LIST,
     FETCH_SHOT_CHUNK_SIZE,
@@ -134,6 +136,15 @@ def run_per_connection(addr, shot_id, size, run_num, expect_known):
     return ok, elapsed, err, msg
 
 
+def run_pipelined(addr, shot_id, size, window, run_num, expect_known):
+    """Pipelined fetch on the persistent session with window chunk requests in flight."""
+    t0 = time.perf_counter()
+    payload, err = fetch_shot_pipelined_sync(addr, shot_id, size, window=window, timeout_per_chunk=5.0)
+    elapsed = time.perf_counter() - t0
+    ok, msg = verify_payload(payload, f"pipelined w={window} run={run_num}", size, expect_known)
+    return ok, elapsed, err, msg
+
+
 def main():
     argv = sys.argv[1:]
     timing_only = "--timing-only" in argv
@@ -196,6 +207,17 @@ def main():
         status = "PASS" if ok else f"FAIL {msg or err}"
         print(f"  run={r+1}: {elapsed:.1f}s  {status}")
 
+    # Pipelined (session kept open by the list query is reused)
+    print("\n--- Pipelined, one session ---")
+    sys.stdout.flush()
+    for window in (1, 4, 8):
+        for r in range(runs_per_method):
+            ok, elapsed, err, msg = run_pipelined(addr, shot_id, size, window, r + 1, expect_known)
+            results.append(("pipelined", window, r, ok, elapsed, err, msg))
+            status = "PASS" if ok else f"FAIL {msg or err}"
+            print(f"  window={window} run={r+1}: {elapsed:.1f}s  {status}")
+    close_session_sync(addr)
+
     # Summary
     passed = sum(1 for r in results if r[3])
     total = len(results)
@@ -208,6 +230,11 @@ def main():
     if per_ok:
         times = [r[4] for r in per_ok]
         print(f"Per-connection:  min={min(times):.1f}s max={max(times):.1f}s")
+    for window in (1, 4, 8):
+        pipe_ok = [r for r in results if r[0] == "pipelined" and r[1] == window and r[3]]
+        if pipe_ok:
+            times = [r[4] for r in pipe_ok]
+            print(f"Pipelined w={window}:  min={min(times):.1f}s max={max(times):.1f}s ({size / min(times) / 1024:.1f} KiB/s)")
     return 0 if passed == total else 1
 
 
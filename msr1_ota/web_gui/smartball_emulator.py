@@ -0,0 +1,884 @@
+"""
+SmartBall emulator for offline benchmarking. An EmulatedBall answers the SVB1 binary protocol like the
+firmware (ID, STATUS, DIAG, SELFTEST, GET_CFG/SET, LIST_SHOTS, GET_SHOT, GET_SHOT_CHUNK, DEL_SHOT,
+SPI_READ/WRITE, BUS_SCAN, recording) with the ESP32-C6 test shot 0xAAAAAAAA plus generated SVTSHOT3 shots,
+and the NUS OTA commands of firmware/src/ota.cpp (START/DATA/FINISH/ABORT/STATUS/CONFIRM/REBOOT). It is
+reachable as:
+  - HttpEmulator: POST /api/cmd and GET /api/ip with keep-alive, like the ESP32-C6 firmware,
+  - SerialEmulator: raw <BH> frames on a PTY, like the USB CDC port,
+  - EmulatedBle: an in-process bleak stand-in, installed with ble_binary_client.set_ble_backend().
+A LinkProfile sets one-way latency, jitter, reply drop rate, MTU (which caps shot chunks like the firmware)
+and bandwidth. Point the GUI at it with SMARTBALL_WIFI_URL=http://127.0.0.1:8080.
+Run: python smartball_emulator.py [--http 8080] [--serial] [--latency-ms 20 --drop 0.02] [--bench]
+"""
+import argparse
+import asyncio
+import os
+import random
+import struct
+import sys
+import time
+import tty
+import zlib
+from collections import Counter
+from dataclasses import dataclass, replace
+
+from ble_binary_client import (
+    CMD_BUS_SCAN,
+    CMD_CLEAR_ERRORS,
+    CMD_DEL_SHOT,
+    CMD_DIAG,
+    CMD_FACTORY_RESET,
+    CMD_FORMAT_STORAGE,
+    CMD_GET_CFG,
+    CMD_GET_SHOT,
+    CMD_GET_SHOT_CHUNK,
+    CMD_ID,
+    CMD_LIST_SHOTS,
+    CMD_LOAD_CFG,
+    CMD_NAMES,
+    CMD_SAVE_CFG,
+    CMD_SELFTEST,
+    CMD_SET,
+    CMD_SPI_READ,
+    CMD_SPI_WRITE,
+    CMD_START_RECORD,
+    CMD_STATUS,
+    CMD_STOP_RECORD,
+    RSP_BUS_SCAN,
+    RSP_CFG,
+    RSP_DIAG,
+    RSP_ID,
+    RSP_SELFTEST,
+    RSP_SHOT,
+    RSP_SHOT_LIST,
+    RSP_SPI_DATA,
+    RSP_STATUS,
+    SB_RX_CHAR,
+    SB_TX_CHAR,
+)
+
+FW_VERSION = 0x0100
+PROTOCOL_VERSION = 2
+TEST_SHOT_ID = 0xAAAAAAAA
+TEST_SHOT_SIZE = 15360
+# Largest accepted frame payload (ESP32 BIN_MAX_PAYLOAD); longer or empty frames get no reply
+FRAME_MAX_PAYLOAD = 253
+# Shot chunk = MTU minus ATT notify header (3) and frame header (3), within the firmware's limits
+CHUNK_OVERHEAD = 6
+CHUNK_MIN = 20
+CHUNK_MAX = 495
+SHOT_LIST_MAX = 32
+STORAGE_BYTES = 8 * 1024 * 1024  # W25Q64
+SPI_READ_MAX = 240
+DEFAULT_CONFIG = {
+    "sample_rate": struct.pack("<H", 1000),
+    "accel_fs_int": b"\x10",
+    "gyro_fs_int": struct.pack("<H", 2000),
+    "event_mode": b"\x00",
+    "trigger_g": b"\x08",
+}
+
+# Legacy OTA service (tools/ota_ble.py): host writes NUS_WRITE_CHAR, device notifies on NUS_NOTIFY_CHAR
+NUS_WRITE_CHAR = "6e400003-b5a3-f393-e0a9-e50e24dcca9e"
+NUS_NOTIFY_CHAR = "6e400002-b5a3-f393-e0a9-e50e24dcca9e"
+CMD_OTA_START, CMD_OTA_DATA, CMD_OTA_FINISH, CMD_OTA_ABORT = 0x10, 0x11, 0x12, 0x13
+CMD_OTA_STATUS, CMD_OTA_CONFIRM, CMD_OTA_REBOOT = 0x16, 0x17, 0x18
+RSP_OTA, MSG_OTA_PROGRESS, MSG_OTA_READY = 0x90, 0x91, 0x92
+OTA_OK_START, OTA_OK_FINISH = 0x00, 0x01
+OTA_ERR_SIZE, OTA_ERR_SIZE_MISMATCH, OTA_ERR_CHUNK, OTA_ERR_BAD_MAGIC = 0x02, 0x03, 0x04, 0x05
+OTA_ERR_CHUNK_CRC, OTA_ERR_BAD_OFFSET, OTA_ERR_CRC_MISMATCH = 0x06, 0x07, 0x08
+OTA_IDLE, OTA_PREPARE_ERASE, OTA_READY_FOR_DATA, OTA_RECEIVING = 0, 1, 2, 3
+OTA_VERIFYING, OTA_PENDING_REBOOT, OTA_ERROR = 4, 5, 6
+OTA_MAGIC = 0x53424F54
+OTA_STAGING_SIZE = 496 * 1024
+OTA_CHUNK_MAX = 480
+# Background slot erase after OTA_START: one nRF52840 page erase per 4 KiB sector
+OTA_ERASE_SECTOR = 4096
+OTA_ERASE_SEC_PER_SECTOR = 0.085
+
+
+@dataclass(slots=True)
+class LinkProfile:
+    latency_ms: float = 0.0   # one way, per frame
+    jitter_ms: float = 0.0    # +/- uniform on each one-way latency
+    drop_rate: float = 0.0    # probability that a reply is lost
+    mtu: int = 247
+    kbps: float = 0.0         # reply bandwidth in kbit/s (0: unlimited)
+    seed: int | None = None
+
+
+LINK_PRESETS = {
+    "ideal": LinkProfile(),
+    "ble": LinkProfile(latency_ms=15.0, jitter_ms=5.0, mtu=247, kbps=700.0),
+    "ble-lossy": LinkProfile(latency_ms=25.0, jitter_ms=15.0, drop_rate=0.05, mtu=185, kbps=300.0),
+    "wifi": LinkProfile(latency_ms=3.0, jitter_ms=2.0, mtu=FRAME_MAX_PAYLOAD + CHUNK_OVERHEAD, kbps=4000.0),
+    "serial": LinkProfile(latency_ms=1.0, mtu=FRAME_MAX_PAYLOAD + CHUNK_OVERHEAD, kbps=92.0),
+}
+
+
+class _Link:
+    """Timing of one emulated link. Replies leave the device one at a time (bandwidth) and arrive in order."""
+
+    def __init__(self, profile: LinkProfile):
+        self.profile = profile
+        self._rng = random.Random(profile.seed)
+        self._busy_until = 0.0
+        self._last_arrival = 0.0
+        self.replies = 0
+        self.dropped = 0
+
+    def _one_way(self) -> float:
+        p = self.profile
+        return max(0.0, p.latency_ms + self._rng.uniform(-p.jitter_ms, p.jitter_ms)) / 1000
+
+    def drop(self) -> bool:
+        """True if the next reply is lost (counted)."""
+        lost = self.profile.drop_rate > 0 and self._rng.random() < self.profile.drop_rate
+        self.dropped += lost
+        self.replies += not lost
+        return lost
+
+    def arrival(self, nbytes: int) -> float:
+        """time.monotonic() (= the asyncio loop clock) at which a reply of nbytes to a request sent now
+        reaches the host. Strictly increasing, so timers scheduled with call_at cannot reorder replies."""
+        now = time.monotonic()
+        tx = nbytes * 8 / (self.profile.kbps * 1000) if self.profile.kbps > 0 else 0.0
+        self._busy_until = max(now + self._one_way(), self._busy_until) + tx
+        self._last_arrival = max(self._busy_until + self._one_way(), self._last_arrival + 1e-6)
+        return self._last_arrival
+
+    def delay(self, nbytes: int) -> float:
+        return max(0.0, self.arrival(nbytes) - time.monotonic())
+
+
+def _frame(rtype: int, payload: bytes) -> bytes:
+    return struct.pack("<BH", rtype, len(payload)) + payload
+
+
+def test_shot() -> bytes:
+    """The ESP32-C6 firmware's synthetic test shot (binary_protocol.c test_shot_byte_at), byte for byte."""
+    data = bytearray((off * 31) & 0xFF for off in range(TEST_SHOT_SIZE))
+    data[:24] = b"SVTSHOT3" + bytes([0x01, 0x00, 0x64, 0x00, 0x23, 0x02]) + bytes(10)
+    data[-4:] = bytes(off & 0xFF for off in range(TEST_SHOT_SIZE - 4, TEST_SHOT_SIZE))
+    return bytes(data)
+
+
+def make_shot(count: int, sample_rate: int = 1000, seed: int = 0) -> bytes:
+    """SVTSHOT3 file of count internal-IMU samples (t_ms u32 + 12 x i16) with header and sample CRC32."""
+    rng = random.Random(seed)
+    header = bytearray(b"SVTSHOT3" + struct.pack("<BBHIBBH", 3, 0, sample_rate, count, 1, 1, 0) + bytes(4))
+    struct.pack_into("<I", header, 20, zlib.crc32(header[:20]))
+    sample = struct.Struct("<I12h")
+    samples = b"".join(
+        sample.pack(i * 1000 // sample_rate, *(rng.randint(-2048, 2047) for _ in range(12))) for i in range(count)
+    )
+    return bytes(header) + samples + struct.pack("<I", zlib.crc32(samples))
+
+
+class EmulatedBall:
+    """Device state and command handling. flavor "nrf" (XIAO: STATUS with BLE block, LSM6 DIAG) or "esp32"
+    (ESP32-C6: 38-byte STATUS, DIAG with heap/RSSI). Stored shots get ids 1, 2, ...; the test shot is
+    synthesized and cannot be deleted."""
+
+    def __init__(self, flavor: str = "nrf", shots=(), address: str = "EE:11:22:33:44:55",
+                 name: str = "SmartBall-EMU"):
+        if flavor not in ("nrf", "esp32"):
+            raise ValueError(f"unknown flavor: {flavor}")
+        self.flavor = flavor
+        self.address = address.upper()
+        self.name = name
+        self.fw_version = FW_VERSION
+        self.reset_reason = 1
+        self.boot = time.monotonic()
+        self.state = 1
+        self.recording_since: float | None = None
+        self.last_error = 0
+        self.error_flags = 0
+        self.config = dict(DEFAULT_CONFIG)
+        self._saved_config = dict(DEFAULT_CONFIG)
+        self.regs = {0: bytearray(256), 1: bytearray(256)}
+        self.regs[0][0x0F] = 0x6C  # LSM6DSOX WHO_AM_I
+        self.regs[1][0x00] = 0xE5  # ADXL375 DEVID
+        self.shots: dict[int, bytes] = {}
+        self._next_id = 1
+        self._test_shot = test_shot()
+        self.stats: Counter = Counter()
+        self.ota = {"state": OTA_IDLE, "size": 0, "crc": 0, "version": 0, "next": 0, "crc_accum": 0,
+                    "erase_done": 0.0, "error": 0, "active": 0, "pending": 0}
+        self._image = bytearray()
+        self._new_fw: int | None = None
+        self.reboot_pending = False
+        # cmd -> handler(payload, mtu); anything else (ESP32 OTA_START 0x15 stub included) is acked with STATUS
+        self._dispatch = {
+            CMD_ID: lambda p, mtu: self._id(),
+            CMD_STATUS: lambda p, mtu: self._status(mtu),
+            CMD_DIAG: lambda p, mtu: self._diag(),
+            CMD_SELFTEST: lambda p, mtu: _frame(RSP_SELFTEST, b"\x00"),
+            CMD_CLEAR_ERRORS: self._clear_errors,
+            CMD_SET: self._set,
+            CMD_GET_CFG: lambda p, mtu: self._cfg(p),
+            CMD_SAVE_CFG: self._save_cfg,
+            CMD_LOAD_CFG: self._load_cfg,
+            CMD_FACTORY_RESET: self._factory_reset,
+            CMD_START_RECORD: self._start_record,
+            CMD_STOP_RECORD: self._stop_record,
+            CMD_LIST_SHOTS: lambda p, mtu: self._shot_list(),
+            CMD_GET_SHOT: self._get_shot,
+            CMD_GET_SHOT_CHUNK: self._get_shot,
+            CMD_DEL_SHOT: self._del_shot,
+            CMD_FORMAT_STORAGE: self._format,
+            CMD_BUS_SCAN: lambda p, mtu: self._bus_scan(),
+            CMD_SPI_READ: self._spi_read,
+            CMD_SPI_WRITE: self._spi_write,
+        }
+        for count in shots:
+            self.add_shot(count)
+
+    def add_shot(self, count: int, sample_rate: int = 1000) -> int:
+        """Store a generated shot of count samples; returns its id."""
+        data = make_shot(count, sample_rate, seed=self._next_id)
+        if len(data) > 0xFFFF + 1:
+            raise ValueError(f"shot of {len(data)} bytes exceeds the GET_SHOT_CHUNK offset range")
+        shot_id, self._next_id = self._next_id, self._next_id + 1
+        self.shots[shot_id] = data
+        return shot_id
+
+    def shot_list(self) -> list[tuple[int, int]]:
+        return [(TEST_SHOT_ID, TEST_SHOT_SIZE)] + [(sid, len(d)) for sid, d in self.shots.items()]
+
+    def shot_data(self, shot_id: int) -> bytes | None:
+        return self._test_shot if shot_id == TEST_SHOT_ID else self.shots.get(shot_id)
+
+    def reboot(self) -> None:
+        """Reset: a finished OTA image becomes the running firmware (pending until CONFIRM)."""
+        if self._new_fw is not None:
+            self.fw_version, self._new_fw = self._new_fw, None
+        self.ota.update(state=OTA_IDLE, next=0, crc_accum=0)
+        self._image = bytearray()
+        self.boot = time.monotonic()
+        self.reset_reason = 3
+        self.state = 1
+        self.recording_since = None
+        self.reboot_pending = False
+
+    # --- SVB1 ---
+
+    def handle(self, frame: bytes, mtu: int = 247) -> bytes | None:
+        """Reply frame for one SVB1 command frame, or None for a malformed frame (the firmware drops it).
+        mtu: the link's, for the STATUS BLE block and the shot chunk length."""
+        if len(frame) < 3:
+            return None
+        cmd, plen = struct.unpack_from("<BH", frame)
+        if plen == 0 or plen > FRAME_MAX_PAYLOAD or len(frame) < 3 + plen:
+            return None
+        payload = bytes(frame[3:3 + plen])
+        self.stats[CMD_NAMES.get(cmd, f"0x{cmd:02X}")] += 1
+        handler = self._dispatch.get(cmd)
+        return handler(payload, mtu) if handler is not None else self._status(mtu)
+
+    def _id(self) -> bytes:
+        uid = bytes.fromhex(self.address.replace(":", ""))[:6] + (b"\xc6\x01" if self.flavor == "esp32" else b"\x00\x01")
+        return _frame(RSP_ID, struct.pack("<HBBB", self.fw_version, PROTOCOL_VERSION,
+                                          2 if self.flavor == "esp32" else 1, 8) + uid)
+
+    def _status(self, mtu: int) -> bytes:
+        used = sum(len(d) for d in self.shots.values())
+        samples = int((time.monotonic() - self.recording_since) * 1000) if self.recording_since else 0
+        body = struct.pack("<IIIBIBBIIHbBI", int((time.monotonic() - self.boot) * 1000), self.last_error,
+                           self.error_flags, self.state, samples, 0, 0, used, STORAGE_BYTES - used, 0, 0,
+                           self.reset_reason, 0x01000001)
+        if self.flavor == "nrf":
+            rx = sum(self.stats.values())
+            body += struct.pack("<BbbHHxII", 1, -55, -57, 15, mtu, rx, rx)
+            body += bytes(65 - len(body))
+        return _frame(RSP_STATUS, body)
+
+    def _diag(self) -> bytes:
+        if self.flavor == "esp32":
+            body = struct.pack("<BB2xHbBHHbIBBB", 0, 0xC6, 0, 0, 0, 0, 0, -60, 250_000, self.reset_reason, 1, 0)
+        else:
+            body = struct.pack("<BB2xHbBHHx", 1, 0x6A, 3700, 0, 1, 0, 0)
+        return _frame(RSP_DIAG, body)
+
+    def _clear_errors(self, payload: bytes, mtu: int) -> bytes:
+        self.last_error = self.error_flags = 0
+        return self._status(mtu)
+
+    def _set(self, payload: bytes, mtu: int) -> bytes:
+        """klen (incl. NUL), vlen, key\\0, value."""
+        if len(payload) >= 2 and payload[0] > 1 and len(payload) >= 2 + payload[0] + payload[1]:
+            klen, vlen = payload[0], payload[1]
+            key = payload[2:2 + klen - 1].decode("utf-8", errors="replace")
+            self.config[key] = payload[2 + klen:2 + klen + vlen]
+        else:
+            self.last_error = 1
+        return self._status(mtu)
+
+    def _cfg(self, payload: bytes) -> bytes:
+        items = list(self.config.items())
+        if payload[0] > 1 and len(payload) >= 1 + payload[0]:
+            key = payload[1:payload[0]].decode("utf-8", errors="replace")
+            items = [(k, v) for k, v in items if k == key]
+        body = bytes([len(items)]) + b"".join(
+            bytes([len(k) + 1, len(v)]) + k.encode() + b"\x00" + v for k, v in items)
+        return _frame(RSP_CFG, body)
+
+    def _save_cfg(self, payload: bytes, mtu: int) -> bytes:
+        self._saved_config = dict(self.config)
+        return self._status(mtu)
+
+    def _load_cfg(self, payload: bytes, mtu: int) -> bytes:
+        self.config = dict(self._saved_config)
+        return self._status(mtu)
+
+    def _factory_reset(self, payload: bytes, mtu: int) -> bytes:
+        self.config = dict(DEFAULT_CONFIG)
+        self._saved_config = dict(DEFAULT_CONFIG)
+        return self._status(mtu)
+
+    def _start_record(self, payload: bytes, mtu: int) -> bytes:
+        if self.recording_since is None:
+            self.state, self.recording_since = 2, time.monotonic()
+        return self._status(mtu)
+
+    def _stop_record(self, payload: bytes, mtu: int) -> bytes:
+        """Stores a shot of the recorded length (at the configured rate, capped to the chunk offset range)."""
+        if self.recording_since is not None:
+            rate = struct.unpack("<H", self.config.get("sample_rate", DEFAULT_CONFIG["sample_rate"]))[0] or 1000
+            count = int((time.monotonic() - self.recording_since) * rate)
+            self.add_shot(max(1, min(count, (0x10000 - 28) // 28)), rate)
+            self.state, self.recording_since = 1, None
+        return self._status(mtu)
+
+    def _shot_list(self) -> bytes:
+        shots = self.shot_list()
+        body = bytes([min(len(shots), 255)]) + b"".join(struct.pack("<II", *s) for s in shots[:SHOT_LIST_MAX])
+        return _frame(RSP_SHOT_LIST, body)
+
+    def _get_shot(self, payload: bytes, mtu: int) -> bytes:
+        """GET_SHOT (id) and GET_SHOT_CHUNK (id, offset u16): up to one chunk; unknown id or offset -> STATUS."""
+        shot_id = struct.unpack_from("<I", payload)[0] if len(payload) >= 4 else 0
+        offset = struct.unpack_from("<H", payload, 4)[0] if len(payload) >= 6 else 0
+        data = self.shot_data(shot_id)
+        if data is None or offset >= len(data):
+            return self._status(mtu)
+        chunk = max(CHUNK_MIN, min(CHUNK_MAX, mtu - CHUNK_OVERHEAD))
+        self.stats["shot_bytes"] += min(chunk, len(data) - offset)
+        return _frame(RSP_SHOT, data[offset:offset + chunk])
+
+    def _del_shot(self, payload: bytes, mtu: int) -> bytes:
+        if len(payload) >= 4:
+            self.shots.pop(struct.unpack_from("<I", payload)[0], None)
+        return self._status(mtu)
+
+    def _format(self, payload: bytes, mtu: int) -> bytes:
+        self.shots.clear()
+        return self._status(mtu)
+
+    def _bus_scan(self) -> bytes:
+        spi = [(1, 0, bytes([self.regs[0][0x0F], 0, 0])), (2, 1, bytes([self.regs[1][0x00], 0, 0])),
+               (3, 2, b"\xef\x40\x17")]
+        body = bytes([len(spi)]) + b"".join(struct.pack("<BB3sB", t, cs, ident, 1) for t, cs, ident in spi)
+        return _frame(RSP_BUS_SCAN, body + b"\x00")
+
+    def _spi_read(self, payload: bytes, mtu: int) -> bytes:
+        """cs, reg, len -> RSP_SPI_DATA (register auto-increment, wrapping at 0xFF)."""
+        if len(payload) < 3 or payload[0] not in self.regs or not 0 < payload[2] <= SPI_READ_MAX:
+            return self._status(mtu)
+        regs, reg = self.regs[payload[0]], payload[1] & 0x7F
+        return _frame(RSP_SPI_DATA, bytes(regs[(reg + i) & 0xFF] for i in range(payload[2])))
+
+    def _spi_write(self, payload: bytes, mtu: int) -> bytes:
+        if len(payload) >= 3 and payload[0] in self.regs:
+            regs, reg = self.regs[payload[0]], payload[1] & 0x7F
+            for i, b in enumerate(payload[2:]):
+                regs[(reg + i) & 0xFF] = b
+        return self._status(mtu)
+
+    # --- NUS OTA (firmware/src/ota.cpp) ---
+
+    def handle_ota(self, frame: bytes) -> list[tuple[float, bytes]]:
+        """Replies to one OTA frame as (extra delay s, frame); the READY after START follows the erase."""
+        if len(frame) < 3:
+            return []
+        cmd, plen = struct.unpack_from("<BH", frame)
+        payload = bytes(frame[3:3 + plen])
+        if len(payload) != plen:
+            return []
+        ota = self.ota
+        self.stats[f"OTA_0x{cmd:02X}"] += 1
+        if ota["state"] == OTA_PREPARE_ERASE and time.monotonic() >= ota["erase_done"]:
+            ota["state"] = OTA_READY_FOR_DATA
+
+        def rsp(*body: int) -> list[tuple[float, bytes]]:
+            return [(0.0, _frame(RSP_OTA, bytes(body)))]
+
+        if cmd == CMD_OTA_START:
+            if plen < 11:
+                return []
+            _, ota["version"], ota["size"], ota["crc"] = struct.unpack_from("<BHII", payload)
+            ota.update(next=0, crc_accum=0, error=0)
+            self._image = bytearray()
+            if not 0 < ota["size"] <= OTA_STAGING_SIZE:
+                ota.update(state=OTA_IDLE, error=OTA_ERR_SIZE)
+                return rsp(OTA_ERR_SIZE)
+            erase_sec = OTA_ERASE_SEC_PER_SECTOR * -(-ota["size"] // OTA_ERASE_SECTOR)
+            ota.update(state=OTA_PREPARE_ERASE, erase_done=time.monotonic() + erase_sec)
+            return rsp(OTA_OK_START) + [(erase_sec, _frame(MSG_OTA_READY, b"\x00"))]
+        if cmd == CMD_OTA_DATA:
+            if plen < 8:
+                return []
+            if ota["state"] == OTA_PREPARE_ERASE:
+                return [(0.0, _frame(MSG_OTA_PROGRESS, struct.pack("<I", 0)))]
+            if ota["state"] not in (OTA_READY_FOR_DATA, OTA_RECEIVING):
+                return []
+            offset = struct.unpack_from("<I", payload)[0]
+            chunk, chunk_crc = payload[4:-4], struct.unpack_from("<I", payload, plen - 4)[0]
+            if offset + len(chunk) > ota["size"] or len(chunk) > OTA_CHUNK_MAX:
+                ota.update(state=OTA_ERROR, error=OTA_ERR_CHUNK)
+                return rsp(OTA_ERR_CHUNK)
+            if offset > ota["next"]:
+                ota["error"] = OTA_ERR_BAD_OFFSET
+                return [(0.0, _frame(RSP_OTA, struct.pack("<BI", OTA_ERR_BAD_OFFSET, ota["next"])))]
+            if offset < ota["next"]:
+                return [(0.0, _frame(RSP_OTA, struct.pack("<BII", 0, offset, ota["size"])))]
+            if zlib.crc32(chunk) != chunk_crc:
+                ota["error"] = OTA_ERR_CHUNK_CRC
+                return rsp(OTA_ERR_CHUNK_CRC)
+            self._image += chunk
+            ota.update(state=OTA_RECEIVING, next=offset + len(chunk), crc_accum=zlib.crc32(chunk, ota["crc_accum"]))
+            return [(0.0, _frame(RSP_OTA, struct.pack("<BII", 0, ota["next"], ota["size"])))]
+        if cmd == CMD_OTA_FINISH:
+            if ota["state"] != OTA_RECEIVING:
+                return []
+            if len(self._image) != ota["size"]:
+                ota.update(state=OTA_ERROR, error=OTA_ERR_SIZE_MISMATCH)
+                return rsp(OTA_ERR_SIZE_MISMATCH)
+            if ota["crc_accum"] != ota["crc"]:
+                ota.update(state=OTA_ERROR, error=OTA_ERR_CRC_MISMATCH)
+                return [(0.0, _frame(RSP_OTA, struct.pack("<BI", OTA_ERR_CRC_MISMATCH, ota["crc_accum"])))]
+            if len(self._image) < 6 or struct.unpack_from("<I", self._image)[0] != OTA_MAGIC:
+                ota.update(state=OTA_ERROR, error=OTA_ERR_BAD_MAGIC)
+                return rsp(OTA_ERR_BAD_MAGIC)
+            # Image header: magic u32, version u16 (make_ota_image); ID reports it after the reboot
+            self._new_fw = struct.unpack_from("<H", self._image, 4)[0]
+            ota.update(state=OTA_PENDING_REBOOT, pending=1)
+            self.reboot_pending = True
+            return rsp(OTA_OK_FINISH)
+        if cmd == CMD_OTA_ABORT:
+            ota.update(state=OTA_IDLE, next=0, crc_accum=0)
+            self._image = bytearray()
+            return rsp()
+        if cmd == CMD_OTA_STATUS:
+            body = struct.pack("<BIIIIBBBI", ota["state"], ota["next"], len(self._image), ota["size"],
+                               ota["size"] if ota["state"] != OTA_PREPARE_ERASE else 0, ota["error"],
+                               ota["active"], ota["pending"], ota["crc"])
+            return [(0.0, _frame(RSP_OTA, body))]
+        if cmd == CMD_OTA_CONFIRM:
+            if ota["pending"]:
+                ota.update(active=1, pending=0)
+            return rsp(0)
+        if cmd == CMD_OTA_REBOOT:
+            self.reboot_pending = True
+            return rsp(0)
+        return []
+
+
+# --- HTTP (ESP32-C6 /api/cmd) ---
+
+
+class HttpEmulator:
+    """Keep-alive HTTP/1.1 server with the firmware's routes; one device task serves all sockets."""
+
+    def __init__(self, ball: EmulatedBall, profile: LinkProfile | None = None, host: str = "127.0.0.1",
+                 port: int = 0):
+        self.ball = ball
+        self.link = _Link(profile or LINK_PRESETS["wifi"])
+        self.host = host
+        self.port = port
+        self.connections = 0
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.url
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader, writer) -> None:
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path = (line.decode("latin-1").split() + ["", ""])[:2]
+                headers = {}
+                while (h := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+                status, ctype, out = await self._route(method, path, body)
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\nContent-Length: {len(out)}\r\n\r\n"
+                             .encode() + out)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes) -> tuple[str, str, bytes]:
+        if method == "GET" and path == "/api/ip":
+            return ("200 OK", "text/plain", self.host.encode())
+        if method != "POST" or path != "/api/cmd":
+            return ("404 Not Found", "text/plain", b"Nothing matches the given URI")
+        if not 0 < len(body) <= FRAME_MAX_PAYLOAD + 3:
+            return ("400 Bad Request", "text/plain", b"Invalid content length")
+        rsp = self.ball.handle(body, self.link.profile.mtu)
+        if rsp is None:
+            return ("400 Bad Request", "text/plain", b"Invalid frame")
+        await asyncio.sleep(self.link.delay(len(rsp)))
+        if self.link.drop():
+            return ("500 Internal Server Error", "text/plain", b"Cmd failed")
+        return ("200 OK", "application/octet-stream", rsp)
+
+
+# --- Serial (USB CDC framing on a PTY) ---
+
+
+class SerialEmulator:
+    """Reads <BH> frames from a PTY and writes the replies back; port is the path to open (pyserial etc.)."""
+
+    def __init__(self, ball: EmulatedBall, profile: LinkProfile | None = None):
+        self.ball = ball
+        self.link = _Link(profile or LINK_PRESETS["serial"])
+        self.port: str | None = None
+        self._master = self._slave = None
+        self._buf = bytearray()
+        self._loop = None
+
+    async def start(self) -> str:
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self.port = os.ttyname(self._slave)
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self._master, self._on_readable)
+        return self.port
+
+    async def close(self) -> None:
+        if self._master is None:
+            return
+        self._loop.remove_reader(self._master)
+        for fd in (self._master, self._slave):
+            os.close(fd)
+        self._master = self._slave = None
+
+    def _on_readable(self) -> None:
+        try:
+            self._buf += os.read(self._master, 4096)
+        except (BlockingIOError, OSError):
+            return
+        while len(self._buf) >= 3:
+            plen = struct.unpack_from("<H", self._buf, 1)[0]
+            if plen == 0 or plen > FRAME_MAX_PAYLOAD:
+                del self._buf[0]  # not a frame start: resync byte by byte
+                continue
+            if len(self._buf) < 3 + plen:
+                return
+            frame = bytes(self._buf[:3 + plen])
+            del self._buf[:3 + plen]
+            rsp = self.ball.handle(frame, self.link.profile.mtu)
+            if rsp is not None and not self.link.drop():
+                self._loop.call_at(self.link.arrival(len(rsp)), self._write, rsp)
+
+    def _write(self, data: bytes) -> None:
+        if self._master is not None:
+            try:
+                os.write(self._master, data)
+            except OSError:
+                pass
+
+
+# --- BLE (in-process bleak stand-in) ---
+
+
+@dataclass(slots=True)
+class EmulatedDevice:
+    """What BleakScanner would return: address, name and the BlueZ object path (adapter hci0)."""
+    address: str
+    name: str
+    details: dict
+
+
+class EmulatedBleakClient:
+    """The subset of bleak.BleakClient the clients use, talking to backend's ball for address."""
+
+    backend: "EmulatedBle" = None
+
+    def __init__(self, address_or_device, disconnected_callback=None, timeout: float = 10.0, **kwargs):
+        self.address = getattr(address_or_device, "address", address_or_device)
+        self._disconnected_callback = disconnected_callback
+        self._ball: EmulatedBall | None = None
+        self._notify: dict[str, object] = {}
+        self._pending: set = set()
+
+    @property
+    def is_connected(self) -> bool:
+        return self._ball is not None
+
+    @property
+    def mtu_size(self) -> int:
+        return self.backend.link.profile.mtu
+
+    @property
+    def services(self) -> list[str]:
+        return [SB_RX_CHAR, SB_TX_CHAR, NUS_WRITE_CHAR, NUS_NOTIFY_CHAR]
+
+    async def connect(self, **kwargs) -> bool:
+        from bleak.exc import BleakDeviceNotFoundError
+        ball = self.backend.ball(self.address)
+        if ball is None:
+            raise BleakDeviceNotFoundError(self.address, f"Device with address {self.address} was not found.")
+        await asyncio.sleep(self.backend.link.delay(0))
+        self._ball = ball
+        self.backend.connects += 1
+        return True
+
+    async def disconnect(self) -> bool:
+        for handle in self._pending:
+            handle.cancel()
+        self._pending.clear()
+        self._notify.clear()
+        self._ball = None
+        return True
+
+    async def start_notify(self, uuid: str, callback, **kwargs) -> None:
+        self._check(uuid)
+        self._notify[uuid] = callback
+
+    async def stop_notify(self, uuid: str) -> None:
+        self._check(uuid)
+        self._notify.pop(uuid, None)
+
+    def _check(self, uuid: str) -> None:
+        from bleak.exc import BleakError
+        if self._ball is None:
+            raise BleakError("Not connected")
+        if uuid not in self.services:
+            raise BleakError(f"Characteristic {uuid} was not found!")
+
+    async def write_gatt_char(self, uuid: str, data, response: bool = False) -> None:
+        self._check(uuid)
+        ball, link = self._ball, self.backend.link
+        if uuid == SB_RX_CHAR:
+            rsp = ball.handle(bytes(data), link.profile.mtu)
+            replies, notify_uuid = ([(0.0, rsp)] if rsp is not None else []), SB_TX_CHAR
+        elif uuid == NUS_WRITE_CHAR:
+            replies, notify_uuid = ball.handle_ota(bytes(data)), NUS_NOTIFY_CHAR
+        else:
+            return
+        loop = asyncio.get_running_loop()
+        last = time.monotonic()
+        for extra, frame in replies:
+            if link.drop():
+                continue
+            last = link.arrival(len(frame)) + extra
+            self._at(loop, last, self._deliver, notify_uuid, frame)
+        if ball.reboot_pending:
+            self._at(loop, last + 0.05, self._reboot, ball)
+
+    def _at(self, loop, when: float, fn, *args) -> None:
+        handle = None
+
+        def run():
+            self._pending.discard(handle)
+            fn(*args)
+
+        handle = loop.call_at(when, run)
+        self._pending.add(handle)
+
+    def _deliver(self, uuid: str, frame: bytes) -> None:
+        callback = self._notify.get(uuid)
+        if callback is not None:
+            callback(uuid, bytearray(frame))
+
+    def _reboot(self, ball: EmulatedBall) -> None:
+        """Device reset drops the link, as NVIC_SystemReset does."""
+        ball.reboot()
+        if self._ball is None:
+            return
+        self._ball = None
+        self._notify.clear()
+        if self._disconnected_callback is not None:
+            self._disconnected_callback(self)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.disconnect()
+
+
+class EmulatedBle:
+    """BLE backend over emulated balls: install() routes ble_binary_client (and any module given, e.g.
+    tools/ota_ble, by its BleakClient/find_device globals) here until uninstall()."""
+
+    def __init__(self, *balls: EmulatedBall, profile: LinkProfile | None = None):
+        self.balls = {b.address: b for b in (balls or (EmulatedBall(),))}
+        self.link = _Link(profile or LINK_PRESETS["ble"])
+        self.client_class = type("BoundEmulatedBleakClient", (EmulatedBleakClient,), {"backend": self})
+        self.connects = 0
+        self._patched: list[tuple[object, str, object]] = []
+
+    def ball(self, addr) -> EmulatedBall | None:
+        return self.balls.get((addr or "").strip().upper())
+
+    async def find_device(self, addr: str | None = None, timeout_sec: float = 12.0, **kwargs) -> EmulatedDevice | None:
+        """Device by address or name (None: the first ball), like ble_scanner.find_device."""
+        for ball in self.balls.values():
+            if addr is None or addr.strip().upper() in (ball.address, ball.name.upper()):
+                path = "/org/bluez/hci0/dev_" + ball.address.replace(":", "_")
+                return EmulatedDevice(ball.address, ball.name, {"path": path})
+        return None
+
+    def install(self, *modules) -> "EmulatedBle":
+        import ble_binary_client
+        ble_binary_client.set_ble_backend(self)
+        for mod in modules:
+            for attr, value in (("BleakClient", self.client_class), ("find_device", self.find_device)):
+                if hasattr(mod, attr):
+                    self._patched.append((mod, attr, getattr(mod, attr)))
+                    setattr(mod, attr, value)
+        return self
+
+    def uninstall(self) -> None:
+        import ble_binary_client
+        ble_binary_client.set_ble_backend(None)
+        while self._patched:
+            mod, attr, value = self._patched.pop()
+            setattr(mod, attr, value)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+
+# --- CLI ---
+
+
+async def _bench(args, profile_overrides: dict) -> int:
+    """Fetch every shot over emulated WiFi, BLE and (with pyserial) serial at several pipeline windows."""
+    import transport
+    from ble_binary_client import close_all_sessions
+
+    def profile(preset: str) -> LinkProfile:
+        return replace(LINK_PRESETS[preset], **profile_overrides)
+
+    wifi_ball = EmulatedBall("esp32", args.shot_samples)
+    http = HttpEmulator(wifi_ball, profile("wifi"))
+    ble_ball = EmulatedBall("nrf", args.shot_samples)
+    ble = EmulatedBle(ble_ball, profile=profile("ble")).install()
+    serial = SerialEmulator(EmulatedBall("nrf", args.shot_samples), profile("serial"))
+    links = [("wifi", transport.HttpTransport(await http.start())), ("ble", transport.BleTransport(ble_ball.address))]
+    try:
+        import serial as _pyserial  # noqa: F401
+        links.append(("serial", transport.SerialTransport(await serial.start())))
+    except ImportError:
+        print("serial: skipped (pyserial not installed)")
+    windows = [1, 2, 4, 8]
+    rc = 0
+    print(f"{'link':>6} {'shot':>10} {'bytes':>6} " + " ".join(f"{f'w={w} ms':>9} {'KiB/s':>6}" for w in windows))
+    try:
+        for kind, link in links:
+            await link.send(_frame(CMD_STATUS, b"\x00"), 5.0)  # connect / warm up
+            for shot_id, size in wifi_ball.shot_list():
+                expected = wifi_ball.shot_data(shot_id)
+                row = []
+                for w in windows:
+                    t0 = time.monotonic()
+                    data, err = await transport.fetch_shot(link, shot_id, size, window=w, timeout_per_chunk=2.0)
+                    sec = time.monotonic() - t0
+                    if err or bytes(data) != expected:
+                        row.append(f"{'FAIL':>9} {'-':>6}")
+                        print(f"  {kind} 0x{shot_id:08X} w={w}: {err or 'data mismatch'}", file=sys.stderr)
+                        rc = 1
+                        continue
+                    row.append(f"{sec * 1000:>9.0f} {size / 1024 / sec:>6.1f}")
+                print(f"{kind:>6} 0x{shot_id:08X} {size:>6} " + " ".join(row))
+            await link.close()
+    finally:
+        ble.uninstall()
+        await close_all_sessions()
+        await http.close()
+        await serial.close()
+    print(f"replies dropped: wifi {http.link.dropped}, ble {ble.link.dropped}, serial {serial.link.dropped}")
+    return rc
+
+
+async def _serve(args, profile_overrides: dict) -> int:
+    ball = EmulatedBall(args.flavor, args.shot_samples)
+    servers = []
+    if args.http is not None:
+        http = HttpEmulator(ball, replace(LINK_PRESETS["wifi"], **profile_overrides), args.host, args.http)
+        servers.append(http)
+        print(f"HTTP: {await http.start()}/api/cmd  (GUI: SMARTBALL_WIFI_URL={http.url})")
+    if args.serial:
+        ser = SerialEmulator(ball, replace(LINK_PRESETS["serial"], **profile_overrides))
+        servers.append(ser)
+        print(f"Serial: {await ser.start()}")
+    if not servers:
+        print("Nothing to serve (use --http PORT and/or --serial)")
+        return 1
+    print(f"Shots: {', '.join(f'0x{i:08X} ({n} B)' for i, n in ball.shot_list())}. Ctrl-C to stop.")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for s in servers:
+            await s.close()
+        print(f"Commands served: {dict(ball.stats)}")
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--http", type=int, default=8080, metavar="PORT", help="HTTP /api/cmd port (default 8080)")
+    ap.add_argument("--no-http", dest="http", action="store_const", const=None)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--serial", action="store_true", help="serve the frame protocol on a PTY")
+    ap.add_argument("--flavor", choices=("nrf", "esp32"), default="esp32")
+    ap.add_argument("--shot-samples", type=int, nargs="*", default=[500, 2000],
+                    help="stored shots to generate, as sample counts (besides the test shot)")
+    ap.add_argument("--latency-ms", type=float)
+    ap.add_argument("--jitter-ms", type=float)
+    ap.add_argument("--drop", dest="drop_rate", type=float, help="reply drop probability 0..1")
+    ap.add_argument("--mtu", type=int)
+    ap.add_argument("--kbps", type=float, help="reply bandwidth, 0 = unlimited")
+    ap.add_argument("--seed", type=int)
+    ap.add_argument("--bench", action="store_true", help="benchmark shot fetch over every link, then exit")
+    args = ap.parse_args()
+    overrides = {k: getattr(args, k) for k in ("latency_ms", "jitter_ms", "drop_rate", "mtu", "kbps", "seed")
+                 if getattr(args, k) is not None}
+    try:
+        return asyncio.run(_bench(args, overrides) if args.bench else _serve(args, overrides))
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
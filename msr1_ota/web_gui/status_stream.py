@@ -0,0 +1,167 @@
+"""
+Live device status fan-out. One StatusPoller per device sends STATUS over the shared transport (the
+persistent BLE session, keep-alive HTTP or the open serial port) every STATUS_POLL_SEC and pushes the
+decoded snapshot to every subscriber, so radio traffic is the same for one browser tab or ten. A poller
+starts with its first subscriber and stops STATUS_LINGER_SEC after the last one leaves.
+"""
+import asyncio
+import queue
+import threading
+import time
+
+import async_runner
+from ble_binary_client import CMD_STATUS, make_frame
+from response_cache import get_cache
+from response_decoder import decode_json
+
+STATUS_POLL_SEC = 1.5
+STATUS_TIMEOUT_SEC = 3.0
+# Keep polling briefly after the last viewer leaves (page reloads, tab switches)
+STATUS_LINGER_SEC = 10.0
+# Snapshots buffered for a slow subscriber (oldest dropped: only the latest state matters)
+SUBSCRIBER_QUEUE = 4
+
+
+class Subscription:
+    """Snapshots for one client, read with get() from the client's own thread."""
+
+    def __init__(self, poller: "StatusPoller"):
+        self._poller = poller
+        self._q: queue.Queue = queue.Queue(SUBSCRIBER_QUEUE)
+
+    def _put(self, snap: dict) -> None:
+        while True:
+            try:
+                self._q.put_nowait(snap)
+                return
+            except queue.Full:
+                try:
+                    self._q.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float) -> dict | None:
+        """Next snapshot, or None if none arrived within timeout."""
+        try:
+            return self._q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        self._poller._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StatusPoller:
+    """Polls STATUS on link (a transport.Transport) while anyone is subscribed. paused: optional callable;
+    while it returns True the device is left alone (OTA/FSX own it) and a busy snapshot is published."""
+
+    def __init__(self, link, interval: float = STATUS_POLL_SEC, paused=None):
+        self.link = link
+        self.interval = interval
+        self.paused = paused
+        self.latest: dict | None = None
+        self.polls = 0
+        self._subs: set[Subscription] = set()
+        self._idle_since: float | None = None
+        self._running = False
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> Subscription:
+        sub = Subscription(self)
+        with self._lock:
+            self._subs.add(sub)
+            self._idle_since = None
+            if self.latest is not None:
+                sub._put(self.latest)
+            if not self._running:
+                self._running = True
+                async_runner.submit(self._run())
+        return sub
+
+    def _unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subs.discard(sub)
+            if not self._subs:
+                self._idle_since = time.monotonic()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subs)
+
+    def _publish(self, snap: dict) -> None:
+        with self._lock:
+            self.latest = snap
+            subs = list(self._subs)
+        for sub in subs:
+            sub._put(snap)
+
+    async def poll_once(self) -> dict:
+        """One STATUS round trip -> snapshot {device, transport, ts, ok, error, rtt_ms, status}."""
+        snap = {"device": self.link.device, "transport": self.link.kind, "ts": time.time(), "ok": False,
+                "error": None, "rtt_ms": None, "status": None}
+        if self.paused is not None and self.paused():
+            snap.update(busy=True, error="device busy (OTA/FSX in progress)",
+                        status=(self.latest or {}).get("status"))
+            return snap
+        t0 = time.monotonic()
+        # Always a fresh round trip, but shared with (and cached for) concurrent STATUS requests
+        frame = make_frame(CMD_STATUS, payload=b"\x00")
+        rsp, err = await get_cache().send(self.link, frame, STATUS_TIMEOUT_SEC, max_age=0.0)
+        snap["rtt_ms"] = round((time.monotonic() - t0) * 1000, 1)
+        self.polls += 1
+        status = None if err else decode_json(rsp)
+        if status is None or status["type"] != "Status":
+            snap["error"] = err or "no or unexpected reply to STATUS"
+        else:
+            snap.update(ok=True, status=status)
+        return snap
+
+    async def _run(self) -> None:
+        while True:
+            with self._lock:
+                active = bool(self._subs)
+                if not active and time.monotonic() - (self._idle_since or 0.0) >= STATUS_LINGER_SEC:
+                    self._running = False
+                    return
+            if active:
+                try:
+                    snap = await self.poll_once()
+                except Exception as e:
+                    snap = {"device": self.link.device, "transport": self.link.kind, "ts": time.time(),
+                            "ok": False, "error": str(e), "rtt_ms": None, "status": None}
+                self._publish(snap)
+            await asyncio.sleep(self.interval)
+
+
+class StatusHub:
+    """One StatusPoller per (transport kind, device). paused: optional callable(link) -> bool."""
+
+    def __init__(self, interval: float = STATUS_POLL_SEC, paused=None):
+        self.interval = interval
+        self._paused = paused
+        self._pollers: dict[tuple[str, str], StatusPoller] = {}
+        self._lock = threading.Lock()
+
+    def poller(self, link) -> StatusPoller:
+        key = (link.kind, link.device)
+        with self._lock:
+            p = self._pollers.get(key)
+            if p is None:
+                paused = (lambda: self._paused(link)) if self._paused is not None else None
+                p = self._pollers[key] = StatusPoller(link, self.interval, paused)
+            return p
+
+    def subscribe(self, link) -> Subscription:
+        return self.poller(link).subscribe()
+
+    def snapshots(self) -> list[dict]:
+        """Latest snapshot of every device polled so far, with its live subscriber count."""
+        with self._lock:
+            pollers = list(self._pollers.values())
+        return [{**p.latest, "subscribers": p.subscribers} for p in pollers if p.latest is not None]
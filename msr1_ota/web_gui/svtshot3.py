@@ -0,0 +1,155 @@
+"""
+SVTSHOT3 shot file layout and integrity checks (SmartBall_BLE_Protocol_v2.md §6).
+Header (24 B): magic "SVTSHOT3", version u8 + pad, sample rate u16 @10, count u32 @12, sensor mask u8 @16,
+IMU mask u8 @17, pad 2, header CRC32 @20. Samples: 28 B (internal IMU) or 68 B (LSM6/ADXL present).
+Footer: CRC32 of all sample bytes. A zero CRC field means "not computed" and is not checked (the ESP32
+test shot and older firmware leave it zero). The span of the header CRC is not confirmed against the nRF
+shot writer (not in this tree; assumed bytes 0..19), so a mismatch there is only a warning.
+
+decode() returns the samples as columns: zero-copy NumPy views of the shot buffer (one structured dtype
+per sample layout) when NumPy is installed, otherwise lists from struct.iter_unpack.
+"""
+import struct
+import zlib
+from dataclasses import dataclass
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b"SVTSHOT3"
+HEADER_SIZE = 24
+FOOTER_SIZE = 4
+SAMPLE_SIZE_INTERNAL = 28
+SAMPLE_SIZE_EXTERNAL = 68
+# IMU mask bits that add the external LSM6 (2) / ADXL (4) fields to each sample
+IMU_MASK_EXTERNAL = 0x06
+_HEADER_CRC_OFFSET = 20
+
+# Sample columns: (name, byte offset) of each little-endian float32 after t_ms (u32 @0). Single-IMU samples
+# carry the internal IMU only; 68-byte samples have 4 reserved bytes @4, then internal (i_*), LSM6 (l_*)
+# and ADXL accel (h_*).
+_FLOATS_INTERNAL = tuple(zip(("ax", "ay", "az", "gx", "gy", "gz"), range(4, 28, 4)))
+_FLOATS_EXTERNAL = tuple(zip(
+    ("i_ax", "i_ay", "i_az", "i_gx", "i_gy", "i_gz", "l_ax", "l_ay", "l_az", "l_gx", "l_gy", "l_gz",
+     "h_ax", "h_ay", "h_az"), range(8, 68, 4)))
+_STRUCTS = {SAMPLE_SIZE_INTERNAL: struct.Struct("<I6f"), SAMPLE_SIZE_EXTERNAL: struct.Struct("<I4x15f")}
+_DTYPES = {}
+
+
+def sample_size(imu_mask: int) -> int:
+    return SAMPLE_SIZE_EXTERNAL if (imu_mask & IMU_MASK_EXTERNAL) else SAMPLE_SIZE_INTERNAL
+
+
+def parse_header(data) -> dict | None:
+    """Header fields plus expected_len, or None if data is not an SVTSHOT3 file."""
+    if len(data) < HEADER_SIZE or bytes(data[:8]) != MAGIC:
+        return None
+    sample_rate, count = struct.unpack_from("<HI", data, 10)
+    imu_mask = data[17]
+    ssize = sample_size(imu_mask)
+    return {
+        "version": data[8],
+        "sample_rate": sample_rate,
+        "count": count,
+        "sensor_mask": data[16],
+        "imu_mask": imu_mask,
+        "sample_size": ssize,
+        "expected_len": HEADER_SIZE + count * ssize + FOOTER_SIZE,
+    }
+
+
+def verify(data) -> str | None:
+    """Check magic, length from header and (when non-zero) the footer CRC32. Returns error or None.
+    data may be longer than the file (storage rounds shot sizes up); the footer follows the last sample."""
+    hdr = parse_header(data)
+    if hdr is None:
+        return "not an SVTSHOT3 file (bad magic or short header)"
+    end = hdr["expected_len"]
+    if len(data) < end:
+        return f"truncated: header says {end} bytes, got {len(data)}"
+    footer_crc = struct.unpack_from("<I", data, end - FOOTER_SIZE)[0]
+    if footer_crc and zlib.crc32(memoryview(data)[HEADER_SIZE:end - FOOTER_SIZE]) != footer_crc:
+        return "sample CRC mismatch"
+    return None
+
+
+def header_warning(data) -> str | None:
+    """Non-fatal note if the header CRC32 (when non-zero) does not match bytes 0..19 (span unconfirmed)."""
+    if len(data) < HEADER_SIZE:
+        return None
+    hdr_crc = struct.unpack_from("<I", data, _HEADER_CRC_OFFSET)[0]
+    if hdr_crc and zlib.crc32(memoryview(data)[:_HEADER_CRC_OFFSET]) != hdr_crc:
+        return "header CRC mismatch (bytes 0..19; span unconfirmed, shot kept)"
+    return None
+
+
+def _floats(ssize: int) -> tuple:
+    return _FLOATS_EXTERNAL if ssize == SAMPLE_SIZE_EXTERNAL else _FLOATS_INTERNAL
+
+
+def sample_dtype(ssize: int):
+    """NumPy structured dtype for one sample of ssize bytes (t_ms plus the float channels)."""
+    dt = _DTYPES.get(ssize)
+    if dt is None:
+        fields = (("t_ms", 0),) + _floats(ssize)
+        dt = _DTYPES[ssize] = np.dtype({
+            "names": [n for n, _ in fields],
+            "formats": ["<u4"] + ["<f4"] * (len(fields) - 1),
+            "offsets": [o for _, o in fields],
+            "itemsize": ssize,
+        })
+    return dt
+
+
+@dataclass(slots=True)
+class Shot:
+    """Decoded SVTSHOT3: header fields (as parse_header) and one array or list per channel."""
+    header: dict
+    columns: dict
+
+    @property
+    def count(self) -> int:
+        return self.header["count"]
+
+    @property
+    def sample_size(self) -> int:
+        return self.header["sample_size"]
+
+    @property
+    def channels(self) -> list[str]:
+        """Float channel names in sample order (t_ms excluded)."""
+        return [n for n in self.columns if n != "t_ms"]
+
+    def sample(self, i: int) -> dict:
+        """One sample as {channel: value} with plain Python numbers."""
+        return {n: (c[i].item() if np is not None and isinstance(c, np.ndarray) else c[i])
+                for n, c in self.columns.items()}
+
+    def stats(self, name: str) -> dict | None:
+        """first/min/max/mean of a channel, or None if the shot has no such channel or no samples."""
+        col = self.columns.get(name)
+        if col is None or not len(col):
+            return None
+        if np is not None and isinstance(col, np.ndarray):
+            return {"first": col[0].item(), "min": col.min().item(), "max": col.max().item(),
+                    "mean": col.mean(dtype=np.float64).item()}
+        return {"first": col[0], "min": min(col), "max": max(col), "mean": sum(col) / len(col)}
+
+
+def decode(data, use_numpy: bool | None = None) -> Shot | None:
+    """Shot with per-channel columns, or None if data is not an SVTSHOT3 file or is shorter than the header
+    says. NumPy columns are read-only views into data (keep it alive and unchanged while they are used).
+    use_numpy=False forces the pure-Python path; None uses NumPy when it is installed."""
+    hdr = parse_header(data)
+    if hdr is None or len(data) < hdr["expected_len"]:
+        return None
+    ssize, count = hdr["sample_size"], hdr["count"]
+    names = ["t_ms"] + [n for n, _ in _floats(ssize)]
+    if np is not None and use_numpy is not False:
+        rows = np.frombuffer(data, dtype=sample_dtype(ssize), count=count, offset=HEADER_SIZE)
+        return Shot(hdr, {n: rows[n] for n in names})
+    body = memoryview(data)[HEADER_SIZE:HEADER_SIZE + count * ssize]
+    cols = list(zip(*_STRUCTS[ssize].iter_unpack(body))) if count else [()] * len(names)
+    return Shot(hdr, {n: list(c) for n, c in zip(names, cols)})
@@ -1,6 +1,6 @@
 """
-Test shot chunked fetch logic (segment-based, resume). No real BLE device required.
-Run from msr1_ota/web_gui: python test_shot_fetch.py
+Test shot chunked fetch logic (segment-based, resume, pipelined, journal, link tuning), session reuse, response decoding, transports, BlueZ state cache, device registry, background jobs, status fan-out, response cache, WiFi keep-alive client, parallel WiFi fetch, WiFi discovery, device emulator, SVTSHOT3 decoding, shot archive, binary shot endpoints and bulk shot sync. No real BLE device required.
+Run from msr1_ota/web_gui: python test_shot_fetch.py  (or python -m pytest test_shot_fetch.py)
 """
 import asyncio
 import struct
@@ -10,6 +10,9 @@ from pathlib import Path
 # Run from web_gui so ble_binary_client is importable
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
+ADDR = "AA:BB:CC:DD:EE:FF"
+
+
 # Build fake payload: SVTSHOT3 header + minimal data
 def make_fake_shot_payload(num_samples: int = 10, sample_size: int = 28) -> bytes:
     header = (
@@ -27,74 +30,81 @@ def make_fake_shot_payload(num_samples: int = 10, sample_size: int = 28) -> byte
     return header + body + footer
 
 
-async def test_segment_fetch():
-    from unittest.mock import AsyncMock, MagicMock, patch
-    from ble_binary_client import (
-        fetch_shot_chunked_async,
-        FETCH_SHOT_CHUNK_SIZE,
-        CHUNKS_PER_CONNECTION,
-        RSP_SHOT,
-        CMD_GET_SHOT_CHUNK,
-    )
-    CHUNK = FETCH_SHOT_CHUNK_SIZE
-    # Use enough data to require multiple connections (CHUNKS_PER_CONNECTION = 1)
-    full = make_fake_shot_payload(80, 28)
-    size = len(full)
-    shot_id = 1
-    addr = "AA:BB:CC:DD:EE:FF"
+def make_mock_client_class(handle_frame, stats: dict):
+    """BleakClient stand-in: each write is answered through the TX notify callback by handle_frame(frame)."""
 
-    # Simulate device: for each (shot_id, offset) return the correct chunk
-    def build_chunk_response(offset: int) -> bytes:
-        chunk = full[offset : offset + CHUNK]
-        plen = len(chunk)
-        return struct.pack("<BH", RSP_SHOT, plen) + chunk
+    class MockClient:
+        def __init__(self, target, disconnected_callback=None, **kwargs):
+            self.target = target
+            self.is_connected = False
+            self._notify = None
 
-    conn_count = [0]
-    chunk_requests = []
+        async def connect(self, **kwargs):
+            stats["connects"] = stats.get("connects", 0) + 1
+            self.is_connected = True
 
-    class MockClient:
-        def __init__(self, addr):
-            self.addr = addr
+        async def disconnect(self):
+            self.is_connected = False
 
         async def __aenter__(self):
-            conn_count[0] += 1
+            await self.connect()
             return self
 
         async def __aexit__(self, *a):
-            return None
+            await self.disconnect()
 
         async def start_notify(self, char, cb):
-            pass
+            self._notify = cb
 
         async def stop_notify(self, char):
-            pass
+            self._notify = None
 
         async def write_gatt_char(self, char, data, response=False):
-            pass
-
-    async def mock_send_cmd(client, frame, timeout_sec=5.0):
-        if len(frame) < 3:
-            return None
-        cmd = frame[0]
-        if cmd != CMD_GET_SHOT_CHUNK:
-            return None
-        if len(frame) < 3 + 6:
-            return None
+            rsp = handle_frame(bytes(data))
+            if rsp is not None and self._notify is not None:
+                self._notify(char, bytearray(rsp))
+
+    return MockClient
+
+
+async def _segment_fetch():
+    from unittest.mock import AsyncMock, patch
+    from ble_binary_client import (
+        fetch_shot_chunked_async,
+        FETCH_SHOT_CHUNK_SIZE,
+        RSP_SHOT,
+        RSP_STATUS,
+        CMD_GET_SHOT_CHUNK,
+    )
+    CHUNK = FETCH_SHOT_CHUNK_SIZE
+    # Use enough data to require multiple connections (CHUNKS_PER_CONNECTION = 1)
+    full = make_fake_shot_payload(80, 28)
+    size = len(full)
+    shot_id = 1
+
+    chunk_requests = []
+
+    # Simulate device: for each (shot_id, offset) return the correct chunk
+    def handle_frame(frame: bytes) -> bytes:
+        if frame[0] != CMD_GET_SHOT_CHUNK:
+            return struct.pack("<BH", RSP_STATUS, 1) + b"\x00"
         sid = struct.unpack_from("<I", frame, 3)[0]
         off = struct.unpack_from("<H", frame, 7)[0]
         chunk_requests.append((sid, off))
-        return build_chunk_response(off)
+        chunk = full[off : off + CHUNK]
+        return struct.pack("<BH", RSP_SHOT, len(chunk)) + chunk
 
-    with patch("bleak.BleakClient", MockClient), patch(
-        "ble_binary_client._send_cmd", side_effect=mock_send_cmd
+    stats = {}
+    with patch("bleak.BleakClient", make_mock_client_class(handle_frame, stats)), patch(
+        "ble_binary_client._resolve_device", AsyncMock(return_value=ADDR)
     ), patch("asyncio.sleep", AsyncMock()):
-        payload, err = await fetch_shot_chunked_async(addr, shot_id, size, chunk_size=CHUNK, timeout_per_chunk=2.0)
+        payload, err = await fetch_shot_chunked_async(ADDR, shot_id, size, chunk_size=CHUNK, timeout_per_chunk=2.0)
         assert err is None, err
         assert payload == full, f"payload len {len(payload)} vs full {len(full)}"
         assert payload[:8] == b"SVTSHOT3"
 
     # Should have used multiple connections (segments)
-    assert conn_count[0] >= 2, f"expected multiple connections, got {conn_count[0]}"
+    assert stats["connects"] >= 2, f"expected multiple connections, got {stats['connects']}"
     # Should have requested chunks in order
     for i, (sid, off) in enumerate(chunk_requests):
         expected_off = i * CHUNK
@@ -102,8 +112,885 @@ async def test_segment_fetch():
     print("test_segment_fetch OK: multi-connection segment fetch and full payload verified.")
 
 
+async def _session_reuse():
+    from unittest.mock import AsyncMock, patch
+    import ble_binary_client as bbc
+
+    def handle_frame(frame: bytes) -> bytes:
+        return struct.pack("<BH", bbc.RSP_STATUS, 1) + bytes([frame[0]])
+
+    stats = {}
+    with patch("bleak.BleakClient", make_mock_client_class(handle_frame, stats)), patch(
+        "asyncio.sleep", AsyncMock()
+    ):
+        for cmd in (bbc.CMD_ID, bbc.CMD_STATUS, bbc.CMD_DIAG):
+            rsp, err = await bbc.send_binary_cmd(ADDR, bbc.make_frame(cmd, payload=b"\x00"))
+            assert err is None, err
+            assert rsp[0] == bbc.RSP_STATUS and rsp[3] == cmd
+        assert stats["connects"] == 1, f"expected one connection for 3 commands, got {stats['connects']}"
+        await bbc.close_session(ADDR)
+        rsp, err = await bbc.send_binary_cmd(ADDR, bbc.make_frame(bbc.CMD_STATUS, payload=b"\x00"))
+        assert err is None and rsp is not None
+        assert stats["connects"] == 2, "closed session should reconnect on next send"
+        await bbc.close_session(ADDR)
+        results = await bbc.send_binary_cmds(
+            ADDR, [{"cmd": n} for n in ("ID", "STATUS", "DIAG", "GET_CFG")] + [{"cmd": "NOPE"}]
+        )
+        assert [r["ok"] for r in results] == [True, True, True, True, False], results
+        assert results[3]["raw_hex"][6:] == "07" and results[4]["error"].startswith("Unknown cmd")
+        assert stats["connects"] == 3, "batch should use one connection"
+        await bbc.close_session(ADDR)
+
+    # Link drops while a reply is awaited: the waiter fails at once and the send retries on a new link
+    Base = make_mock_client_class(handle_frame, stats)
+
+    class DroppingClient(Base):
+        def __init__(self, target, disconnected_callback=None, **kwargs):
+            super().__init__(target, **kwargs)
+            self.on_drop = disconnected_callback
+
+        async def write_gatt_char(self, char, data, response=False):
+            if stats["connects"] == 4:
+                asyncio.get_running_loop().call_soon(self.on_drop, self)
+                return
+            await super().write_gatt_char(char, data, response)
+
+    with patch("bleak.BleakClient", DroppingClient), patch("asyncio.sleep", AsyncMock()):
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        rsp, err = await bbc.send_binary_cmd(ADDR, bbc.make_frame(bbc.CMD_STATUS, payload=b"\x00"), 5.0)
+        assert err is None and rsp[3] == bbc.CMD_STATUS and stats["connects"] == 5
+        assert loop.time() - t0 < 1.0, "retry should not wait out the 5 s reply timeout"
+        await bbc.close_session(ADDR)
+    print("test_session_reuse OK: back-to-back commands and batches share one connection; drop fails fast.")
+
+
+async def _pipelined_fetch():
+    from unittest.mock import AsyncMock, patch
+    import ble_binary_client as bbc
+    full = make_fake_shot_payload(80, 28)
+    cap = 253  # firmware BIN_MAX_PAYLOAD: chunks shorter than the host asks for
+    sent = []
+
+    def handle_frame(frame: bytes) -> bytes | None:
+        off = struct.unpack_from("<H", frame, 7)[0]
+        sent.append(off)
+        if len(sent) == 3:
+            return None  # lost notify: burst must be discarded and re-requested
+        chunk = full[off : off + cap]
+        return struct.pack("<BH", bbc.RSP_SHOT, len(chunk)) + chunk
+
+    stats = {}
+    with patch("bleak.BleakClient", make_mock_client_class(handle_frame, stats)), patch(
+        "asyncio.sleep", AsyncMock()
+    ):
+        payload, err = await bbc.fetch_shot_pipelined_async(ADDR, 1, len(full), window=4, timeout_per_chunk=0.05)
+        await bbc.close_session(ADDR)
+    assert err is None, err
+    assert payload == full, f"payload len {len(payload)} vs full {len(full)}"
+    assert stats["connects"] == 1
+    assert len(set(sent)) == -(-len(full) // cap), f"unexpected offsets {sent}"
+    print("test_pipelined_fetch OK: windowed fetch reassembled by offset after a lost reply.")
+
+
+async def _journal_resume():
+    import tempfile
+    from unittest.mock import AsyncMock, patch
+    import ble_binary_client as bbc
+    from shot_journal import open_journal
+    full = make_fake_shot_payload(80, 28)
+    cap = 253
+    sent = []
+
+    def handle_frame(frame: bytes) -> bytes:
+        off = struct.unpack_from("<H", frame, 7)[0]
+        sent.append(off)
+        chunk = full[off : off + cap]
+        return struct.pack("<BH", bbc.RSP_SHOT, len(chunk)) + chunk
+
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+        journal = open_journal(ADDR, 1, len(full), root)
+        journal.write(0, full[:1000])  # earlier interrupted attempt
+        journal.close()
+        with open(journal.path, "ab") as f:
+            f.write(b"\x00\x01torn")  # record cut short by a crash
+        journal = open_journal(ADDR, 1, len(full), root)
+        assert journal.next_missing() == 1000, journal.next_missing()
+        with patch("bleak.BleakClient", make_mock_client_class(handle_frame, {})), patch(
+            "asyncio.sleep", AsyncMock()
+        ):
+            payload, err = await bbc.fetch_shot_pipelined_async(ADDR, 1, len(full), journal=journal)
+            await bbc.close_session(ADDR)
+        assert err is None, err
+        assert payload == full
+        assert min(sent) == 1000, f"resumed fetch re-requested offset {min(sent)}"
+        assert open_journal(ADDR, 1, len(full), root).complete, "journal should replay to a complete shot"
+    print("test_journal_resume OK: fetch resumed from first missing offset after torn journal.")
+
+
+def make_svtshot3(count: int, with_crc: bool = True) -> bytes:
+    """SVTSHOT3 file with 24-byte header and header/footer CRC32 (as svtshot3.verify expects)."""
+    import zlib
+    header = bytearray(b"SVTSHOT3" + struct.pack("<BBHIBBH", 1, 0, 100, count, 1, 0, 0) + b"\x00" * 4)
+    samples = b"".join(struct.pack("<I", i * 10) + bytes(24) for i in range(count))
+    if with_crc:
+        struct.pack_into("<I", header, 20, zlib.crc32(header[:20]))
+    return bytes(header) + samples + struct.pack("<I", zlib.crc32(samples) if with_crc else 0)
+
+
+def test_shot_decode():
+    from unittest.mock import patch
+    import svtshot3
+    multi = bytearray(b"SVTSHOT3" + struct.pack("<BBHIBBH", 1, 0, 1000, 3, 1, 7, 0) + bytes(4))
+    for i in range(3):
+        multi += struct.pack("<I4x15f", i, *(i * 100 + k for k in range(15)))
+    multi += bytes(4)
+    for data in (bytes(multi), make_svtshot3(40)):
+        fast, slow = svtshot3.decode(data), svtshot3.decode(data, use_numpy=False)
+        assert fast.header == slow.header and fast.channels == slow.channels
+        assert all(fast.sample(i) == slow.sample(i) for i in range(fast.count))
+        assert all(fast.stats(c) == slow.stats(c) for c in fast.channels)
+    shot = svtshot3.decode(bytes(multi))
+    assert shot.sample_size == 68 and shot.channels[-1] == "h_az" and len(shot.channels) == 15
+    assert shot.sample(2)["l_ax"] == 206.0 and shot.stats("h_az") == {"first": 14.0, "min": 14.0, "max": 214.0, "mean": 114.0}
+    assert svtshot3.np is None or shot.columns["i_gz"].base is not None, "NumPy columns should be views"
+    assert svtshot3.decode(make_svtshot3(40)).columns["t_ms"][-1] == 390
+    assert svtshot3.decode(bytes(multi[:-5])) is None and svtshot3.decode(b"SVTSHOT2" + bytes(40)) is None
+    with patch("svtshot3.np", None):
+        assert svtshot3.decode(make_svtshot3(0)).stats("ax") is None
+    print("test_shot_decode OK: 28/68-byte layouts, NumPy views and pure-Python fallback agree.")
+
+
+def test_shot_archive():
+    import json
+    import tempfile
+    import threading
+    import shot_archive
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+        legacy = {"id": "5dc03f48", "name": "Fist_test", "created_at": "2026-02-23 15:26:27", "shot_id": "0x1",
+                  "raw_hex": make_svtshot3(20).hex(), "sample_rate": 100, "count": 20}
+        (root / "5dc03f48.json").write_text(json.dumps(legacy))
+        for junk, text in (("list", "[]"), ("text", '"x"'), ("hex_int", '{"raw_hex": 5}'), ("bad", "{")):
+            (root / f"{junk}.json").write_text(text)
+        archive = shot_archive.ShotArchive(root)
+        assert archive.migrated == 1 and (root / "5dc03f48.json.migrated").exists()
+        assert len(list(root.glob("*.json"))) == 4, "files that are not shot records are skipped and left in place"
+        rec, data = archive.load("5dc03f48")
+        assert data == make_svtshot3(20) and rec["shot_id"] == 1 and rec["created_at"] == legacy["created_at"]
+        a = archive.save(make_svtshot3(40), 2, "swing_a", device="aa:bb:cc:dd:ee:ff")
+        b = archive.save(make_svtshot3(40), "3", "swing_b")
+        assert a["sha256"] == b["sha256"] and len(list(root.glob("*.svtshot"))) == 2, "same bytes stored once"
+        assert a["sample_rate"] == 100 and a["count"] == 40, "metadata defaults to the SVTSHOT3 header"
+        assert [r["id"] for r in archive.query()] == [b["id"], a["id"], "5dc03f48"]
+        assert [r["id"] for r in archive.query(device=ADDR)] == [a["id"]]
+        assert [r["name"] for r in archive.query(name="swing_")] == ["swing_b", "swing_a"]
+        assert [r["name"] for r in archive.query(name="%")] == [] and len(archive.query(limit=1)) == 1
+        assert archive.contains(ADDR, 2, a["size"]) and not archive.contains("11:22:33:44:55:66", 2, a["size"])
+        assert not archive.contains("11:22:33:44:55:66", 3, b["size"]) and not archive.contains(None, 3, b["size"]), \
+            "records without device never count as this ball's shot"
+        assert archive.delete(a["id"]) and archive.blob_path(b["sha256"]).exists(), "blob still used by swing_b"
+        assert archive.delete(b["id"]) and not archive.blob_path(b["sha256"]).exists()
+        assert not archive.delete(b["id"]) and archive.load(b["id"]) == (None, None)
+        # Saving content whose last other record is being deleted must never leave a record without its blob
+        lost = []
+
+        def churn():
+            for _ in range(200):
+                rec = archive.save(make_svtshot3(8), 9)
+                if archive.load(rec["id"])[1] is None:
+                    lost.append(rec["id"])
+                archive.delete(rec["id"])
+
+        workers = [threading.Thread(target=churn) for _ in range(3)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        assert not lost and not archive.query(shot_id=9) and not list(root.glob("*.tmp"))
+        archive.close()
+        reopened = shot_archive.ShotArchive(root)
+        assert reopened.migrated == 0 and [r["id"] for r in reopened.query()] == ["5dc03f48"]
+        reopened.close()
+    print("test_shot_archive OK: JSON migration, content-addressed blobs, indexed filters and lookups.")
+
+
+def test_binary_shot_endpoints():
+    import tempfile
+    from unittest.mock import patch
+    import async_runner
+    import smartball_emulator as emu
+    from wifi_binary_client import get_client
+    http = emu.HttpEmulator(emu.EmulatedBall("esp32", [200]), emu.LinkProfile(latency_ms=1))
+    url = async_runner.run_sync(http.start())
+    with tempfile.TemporaryDirectory() as root, patch("shot_archive.SAVED_SHOTS_DIR", Path(root)):
+        import app
+        client = app.app.test_client()
+        shot = http.ball.shot_data(1)
+        d = client.post("/api/shot/fetch", json={"device_url": url, "shot_id": 1, "size": len(shot),
+                                                 "format": "binary"}).get_json()
+        assert d["ok"] and "raw_hex" not in d and d["count"] == 200 and d["sample_size"] == 28, d
+        rsp = client.get(d["payload_url"])
+        assert rsp.mimetype == "application/octet-stream" and rsp.data == shot
+        assert rsp.headers["X-Shot-Count"] == "200" and rsp.headers["X-Shot-Sample-Rate"] == str(d["sample_rate"])
+        legacy = client.post("/api/shot/fetch", json={"device_url": url, "shot_id": 1, "size": len(shot)}).get_json()
+        assert bytes.fromhex(legacy["raw_hex"]) == shot, "JSON/hex response kept for old clients"
+        # Chunks left in the journal by an older shot under the same id/size: CRC fails, refetched from scratch
+        import shot_journal
+        with patch("shot_journal.JOURNAL_DIR", Path(root) / "j"):
+            old = bytearray(shot)
+            old[100] ^= 0xFF
+            stale = shot_journal.open_journal(url, 1, len(shot))
+            stale.write(0, bytes(old[:512]))
+            stale.close()
+            d = client.post("/api/shot/fetch", json={"device_url": url, "shot_id": 1, "size": len(shot)}).get_json()
+            assert d["ok"] and bytes.fromhex(d["raw_hex"]) == shot, d.get("error")
+            assert not list((Path(root) / "j").glob("*.journal"))
+        # Jobs run the same fetch function on a job thread (no Flask request context there)
+        done = {}
+        for body in ({"shot_id": 1, "size": len(shot), "format": "binary"}, {}):
+            job = client.post("/api/jobs", json={"kind": "shot_fetch", "device_url": url, **body}).get_json()["job"]
+            while job["status"] in ("queued", "running"):
+                job = client.get(f"/api/jobs/{job['id']}?since={job['version']}&wait=5").get_json()
+            done[job["status"]] = job
+        assert client.get(done["done"]["result"]["payload_url"]).data == shot
+        assert done["failed"]["error"] == "shot_id required.", "400 from the fetch function fails the job"
+        # BLE commands are refused (not sent) while an exclusive operation holds that ball
+        with patch("device_registry.LOCK_DIR", root), app._devices.exclusive(ADDR):
+            for path, body in (("/api/binary/send", {"cmd": "STATUS"}), ("/api/binary/batch", {"cmds": ["STATUS"]})):
+                rsp = client.post(path, json={"address": ADDR, **body})
+                assert rsp.status_code == 409 and "busy" in rsp.get_json()["error"], path
+        with patch.object(app, "_request_transport", return_value=(None, "no device")):
+            saved = client.post("/api/saved-shots?shot_id=0x1&name=Drive%20%C3%A9", data=shot,
+                                content_type="application/octet-stream").get_json()
+        rsp = client.get(f"/api/saved-shots/{saved['id']}/raw")
+        assert rsp.data == shot and rsp.headers["X-Shot-Name"] == "Drive %C3%A9" and rsp.headers["X-Shot-Id"] == "1"
+        assert client.get(f"/api/saved-shots/{saved['id']}/raw", headers={"If-None-Match": rsp.headers["ETag"]}).status_code == 304
+        assert client.get(f"/api/saved-shots/{saved['id']}").get_json()["raw_hex"] == shot.hex()
+        assert client.get("/api/shot/payload/nope").status_code == 404
+        assert client.get("/api/saved-shots/nope/raw").status_code == 404
+    async_runner.run_sync(get_client(url).close())
+    async_runner.run_sync(http.close())
+    print("test_binary_shot_endpoints OK: octet-stream fetch/save/load with X-Shot-* headers, hex API kept, fetch jobs.")
+
+
+def test_shot_sync():
+    import tempfile
+    from unittest.mock import AsyncMock, patch
+    import ble_binary_client as bbc
+    import shot_sync
+    import svtshot3
+    shots = {1: make_svtshot3(40), 2: make_svtshot3(90)}
+    bad = bytearray(make_svtshot3(30))
+    bad[100] ^= 0xFF
+    shots[3] = bytes(bad)
+    deleted = []
+
+    def handle_frame(frame: bytes) -> bytes:
+        if frame[0] == bbc.CMD_LIST_SHOTS:
+            body = b"".join(struct.pack("<II", sid, len(d)) for sid, d in shots.items())
+            return struct.pack("<BHB", bbc.RSP_SHOT_LIST, 1 + len(body), len(shots)) + body
+        if frame[0] == bbc.CMD_GET_SHOT_CHUNK:
+            sid, off = struct.unpack_from("<IH", frame, 3)
+            chunk = shots[sid][off : off + 253]
+            return struct.pack("<BH", bbc.RSP_SHOT, len(chunk)) + chunk
+        if frame[0] == bbc.CMD_DEL_SHOT:
+            deleted.append(struct.unpack_from("<I", frame, 3)[0])
+        return struct.pack("<BH", bbc.RSP_STATUS, 1) + b"\x00"
+
+    assert svtshot3.verify(shots[1]) is None and svtshot3.verify(shots[3]) == "sample CRC mismatch"
+    assert svtshot3.verify(make_svtshot3(5, with_crc=False)) is None
+    odd_hdr = bytearray(make_svtshot3(5))
+    odd_hdr[20] ^= 0xFF  # header CRC span is unconfirmed: warn, never reject
+    assert svtshot3.verify(odd_hdr) is None and "header CRC" in svtshot3.header_warning(odd_hdr)
+    assert svtshot3.header_warning(shots[1]) is None
+    stats = {}
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+        # Migrated GUI save without device, same id and size as shot 2: must not stand in for the ball's shot
+        shot_sync.get_archive(root / "saved").save(shots[2], 2, "legacy")
+        with patch("bleak.BleakClient", make_mock_client_class(handle_frame, stats)), patch(
+            "asyncio.sleep", AsyncMock()
+        ), patch("link_tuning._TUNING_FILE", root / "tuning.json"), patch("shot_journal.JOURNAL_DIR", root / "j"):
+            report = shot_sync.sync_device("ble", ADDR, root=root / "saved")
+            again = shot_sync.sync_device("ble", ADDR, delete=False, root=root / "saved")
+            bbc.close_session_sync(ADDR)
+        status = {e["shot_id"]: e["status"] for e in report["shots"]}
+        assert status == {"0x00000001": "synced", "0x00000002": "synced", "0x00000003": "failed"}, report
+        assert not report["ok"] and deleted == [1, 2], deleted
+        assert report["bytes"] == len(shots[1]) + len(shots[2])
+        assert stats["connects"] == 1, f"sync should use one connection, got {stats['connects']}"
+        assert len(list((root / "saved").glob("*.svtshot"))) == 2 and not list((root / "saved").glob("*.json"))
+        assert [e["status"] for e in again["shots"]] == ["archived", "archived", "failed"], again
+    print("test_shot_sync OK: list/fetch/verify/save/delete in one connection; corrupt shot kept on device.")
+
+
+def test_response_decoder():
+    import ble_binary_client as bbc
+    import response_decoder as rd
+    status = bytearray(68)
+    struct.pack_into("<BHIIIBI", status, 0, bbc.RSP_STATUS, 65, 5000, 0, 0, 2, 1234)
+    struct.pack_into("<bB", status, 32, -5, 5)
+    struct.pack_into("<BbbHH", status, 38, 1, -60, -62, 30, 247)
+    d = rd.decode(bytes(status))
+    assert isinstance(d, rd.Status) and d.samples == 1234 and d.state_name == "recording"
+    assert d.temp_c == -0.5 and d.reset_name == "watchdog" and d.ble.mtu == 247 and d.ble.rssi == -60
+    listing = struct.pack("<BHB", bbc.RSP_SHOT_LIST, 17, 2) + struct.pack("<IIII", 7, 15360, 0xAAAAAAAA, 100)
+    j = rd.decode_json(listing)
+    assert j["type"] == "ShotList" and j["shots"][1] == {"shot_id": 0xAAAAAAAA, "size": 100}, j
+    assert bbc.parse_shot_list(listing) == ([(7, 15360), (0xAAAAAAAA, 100)], None)
+    uid = rd.decode_json(struct.pack("<BHHBB2x", bbc.RSP_ID, 14, 0x0102, 2, 3) + bytes(range(8)))
+    assert uid["fw_version"] == "1.2" and uid["uid"] == "0001020304050607", uid
+    assert "MTU: 247" in bbc.format_response(bytes(status)) and rd.decode(b"\x55\x00\x00") is None
+    print("test_response_decoder OK: typed decode, JSON output and format_response share one layer.")
+
+
+async def _transport_fetch():
+    from unittest.mock import AsyncMock, patch
+    import ble_binary_client as bbc
+    from transport import Transport, fetch_shot, send_cmds
+    full = make_svtshot3(60)
+    sent = []
+
+    class FakeSerial(Transport):
+        """Request/response link (HTTP/serial style): no pipelining, every 4th chunk reply lost."""
+        kind = "serial"
+
+        async def send(self, frame, timeout_sec=3.0):
+            if frame[0] != bbc.CMD_GET_SHOT_CHUNK:
+                return (struct.pack("<BH", bbc.RSP_ID if frame[0] == bbc.CMD_ID else bbc.RSP_STATUS, 1) + b"\x00", None)
+            off = struct.unpack_from("<H", frame, 7)[0]
+            sent.append(off)
+            if len(sent) % 4 == 0:
+                return (None, None)
+            chunk = full[off : off + 200]
+            return (struct.pack("<BH", bbc.RSP_SHOT, len(chunk)) + chunk, None)
+
+    with patch("asyncio.sleep", AsyncMock()):
+        payload, err = await fetch_shot(FakeSerial("/dev/ttyFAKE"), 9, len(full))
+    assert err is None and payload == full, err
+    results = await send_cmds(FakeSerial("/dev/ttyFAKE"), ["ID", {"cmd": "STATUS", "payload": "00"}])
+    assert [r["cmd"] for r in results] == ["ID", "STATUS"] and all(r["ok"] for r in results), results
+    print("test_transport_fetch OK: pipelined/resumable fetch and batches run unchanged on a non-BLE transport.")
+
+
+def test_transport_fetch():
+    asyncio.run(_transport_fetch())
+
+
+def test_bluez_cache():
+    from dbus_fast import Message, Variant
+    import bluez_dbus as bz
+    ctl = bz.BluezController()
+    dev = "/org/bluez/hci0/dev_AA_BB_CC_DD_EE_FF"
+
+    def signal(path, iface, member, sig, body):
+        ctl._on_message(Message.new_signal(path, iface, member, sig, body))
+
+    signal("/", bz.OM_IFACE, "InterfacesAdded", "oa{sa{sv}}", ["/org/bluez/hci0", {
+        bz.ADAPTER_IFACE: {"Address": Variant("s", "00:11:22:33:44:55"), "Powered": Variant("b", False)}}])
+    signal("/", bz.OM_IFACE, "InterfacesAdded", "oa{sa{sv}}", [dev, {bz.DEVICE_IFACE: {
+        "Address": Variant("s", ADDR), "Name": Variant("s", "SmartBall"), "Adapter": Variant("o", "/org/bluez/hci0")}}])
+    assert ctl.adapter_state()["present"] and not ctl.adapter_state()["powered"]
+    signal("/org/bluez/hci0", bz.PROPS_IFACE, "PropertiesChanged", "sa{sv}as",
+           [bz.ADAPTER_IFACE, {"Powered": Variant("b", True)}, []])
+    signal(dev, bz.PROPS_IFACE, "PropertiesChanged", "sa{sv}as", [bz.DEVICE_IFACE, {"RSSI": Variant("n", -58)}, []])
+    assert ctl.adapter_state()["powered"] and ctl._device_path(ADDR.lower()) == dev
+    assert [(d["address"], d["name"], d["rssi"]) for d in ctl.devices()] == [(ADDR, "SmartBall", -58)]
+    signal(dev, bz.PROPS_IFACE, "PropertiesChanged", "sa{sv}as", [bz.DEVICE_IFACE, {"Connected": Variant("b", True)}, []])
+
+    async def released_on_signal():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, signal, dev, bz.PROPS_IFACE, "PropertiesChanged", "sa{sv}as",
+                        [bz.DEVICE_IFACE, {"Connected": Variant("b", False)}, []])
+        t0 = loop.time()
+        assert not await ctl.wait_released(ADDR, 0.01)
+        assert await ctl.wait_released(ADDR, 5.0) and loop.time() - t0 < 1.0
+        assert not ctl._waiters
+
+    asyncio.run(released_on_signal())
+    signal("/", bz.OM_IFACE, "InterfacesRemoved", "oas", [dev, [bz.DEVICE_IFACE]])
+    assert ctl.devices() == [] and ctl._device_path(ADDR) is None
+    print("test_bluez_cache OK: adapter/device state and link-state waits driven by D-Bus signals.")
+
+
+def test_device_registry():
+    import tempfile
+    import threading
+    from unittest.mock import patch
+    import device_registry
+    reg = device_registry.DeviceRegistry(list_adapters=lambda: ["hci0", "hci1"])
+    a, b, c = (reg.add(f"AA:BB:CC:DD:EE:0{i}") for i in range(3))
+    assert (a.adapter, b.adapter, c.adapter) == ("hci0", "hci1", "hci0")
+    assert reg.add("aa:bb:cc:dd:ee:01", name="Ball B").adapter == "hci1" and reg.default() == "AA:BB:CC:DD:EE:01"
+    # Lookups (transport selection, exclusive) neither register a ball nor change the default
+    assert reg.adapter_for("AA:BB:CC:DD:EE:09") == "hci1" and reg.get("AA:BB:CC:DD:EE:09") is None
+    assert reg.adapter_for(c.address) == "hci0" and reg.default() == "AA:BB:CC:DD:EE:01"
+    with tempfile.TemporaryDirectory() as tmp, patch.object(device_registry, "LOCK_DIR", tmp):
+        with reg.exclusive(a.address):
+            # A different adapter is free while ball A is held; the same adapter is not
+            other = threading.Thread(target=lambda: reg.exclusive(b.address).__enter__())
+            other.start()
+            other.join(2.0)
+            assert not other.is_alive(), "ball on another adapter should not wait"
+            blocked = threading.Thread(target=lambda: reg.exclusive(c.address).__enter__(), daemon=True)
+            blocked.start()
+            blocked.join(0.2)
+            assert blocked.is_alive(), "ball on the same adapter should wait"
+        assert reg.default() == "AA:BB:CC:DD:EE:01" and len(reg.entries()) == 3
+    print("test_device_registry OK: least-loaded adapter pinning and per-adapter/device locks.")
+
+
+def test_jobs():
+    import threading
+    import jobs
+    mgr = jobs.JobManager(workers=2, keep=1)
+    go = threading.Event()
+
+    def work():
+        jobs.report(phase="fetch", bytes=0)
+        go.wait(5.0)
+        jobs.report(bytes=10)
+        return {"ok": True, "raw_hex": "00"}
+
+    job = mgr.submit("shot_fetch", work)
+    v = job.wait_change(0, 2.0)
+    while job.progress.get("phase") != "fetch":
+        v = job.wait_change(v, 2.0)
+    assert job.status == "running" and mgr.get(job.id) is job
+    go.set()
+    while not job.done:
+        v = job.wait_change(v, 2.0)
+    d = job.to_dict()
+    assert d["status"] == "done" and d["progress"] == {"phase": "fetch", "bytes": 10} and d["result"]["raw_hex"] == "00"
+    bad = mgr.submit("upgrade", lambda: {"ok": False, "error": "rc=9"})
+    while not bad.done:
+        bad.wait_change(bad.to_dict()["version"], 2.0)
+    assert bad.status == "failed" and bad.error == "rc=9"
+    mgr.submit("scan_ble", lambda: 1 / 0)
+    assert mgr.get(job.id) is None, "oldest finished job pruned beyond keep"
+    jobs.report(phase="ignored")  # outside a job: no-op
+    print("test_jobs OK: queued work, progress versions, failure results and pruning.")
+
+
+def test_status_stream():
+    import time
+    from unittest.mock import patch
+    import ble_binary_client as bbc
+    import status_stream
+    from transport import Transport
+    status = bytearray(68)
+    struct.pack_into("<BHIIIBI", status, 0, bbc.RSP_STATUS, 65, 5000, 0, 0, 2, 1234)
+    busy = [False]
+
+    class FakeLink(Transport):
+        kind = "ble"
+        sent = 0
+
+        async def send(self, frame, timeout_sec=3.0):
+            assert frame[0] == bbc.CMD_STATUS
+            FakeLink.sent += 1
+            return (bytes(status), None)
+
+    hub = status_stream.StatusHub(interval=0.05, paused=lambda link: busy[0])
+    link = FakeLink(ADDR)
+    tabs = [hub.subscribe(link) for _ in range(3)]
+    snaps = [t.get(2.0) for t in tabs]
+    assert all(s["ok"] and s["status"]["samples"] == 1234 for s in snaps), snaps
+    time.sleep(0.3)
+    # One poller for three viewers: radio traffic does not scale with tabs
+    assert FakeLink.sent <= 0.3 / 0.05 + 2, FakeLink.sent
+    busy[0] = True
+    while not (tabs[0].get(2.0) or {}).get("busy"):
+        pass
+    sent = FakeLink.sent
+    time.sleep(0.15)
+    assert FakeLink.sent == sent, "no STATUS while the device is held by OTA/FSX"
+    with patch.object(status_stream, "STATUS_LINGER_SEC", 0.0):
+        for t in tabs:
+            t.close()
+        poller = hub.poller(link)
+        for _ in range(40):
+            if not poller._running:
+                break
+            time.sleep(0.05)
+    assert not poller._running and hub.snapshots()[0]["subscribers"] == 0
+    print("test_status_stream OK: one STATUS poller per device fanned out to all subscribers.")
+
+
+async def _response_cache():
+    import ble_binary_client as bbc
+    from response_cache import ResponseCache
+    from transport import Transport
+    sent, timeouts = [], []
+
+    class SlowLink(Transport):
+        kind = "ble"
+
+        async def send(self, frame, timeout_sec=10.0):
+            sent.append(frame[0])
+            timeouts.append(timeout_sec)
+            await asyncio.sleep(0.05)
+            rtype = bbc.CMD_RESPONSE.get(frame[0], bbc.RSP_STATUS)
+            return (struct.pack("<BHB", rtype, 1, len(sent)), None)
+
+    cache = ResponseCache(ttl={bbc.CMD_STATUS: (0.1, 1.0), bbc.CMD_LIST_SHOTS: (10.0, 0.0)})
+    link = SlowLink(ADDR)
+    status = bbc.make_frame(bbc.CMD_STATUS, payload=b"\x00")
+    # Five concurrent identical requests: one round trip
+    rsps = await asyncio.gather(*(cache.send(link, status) for _ in range(5)))
+    assert sent == [bbc.CMD_STATUS] and len({r for r, _ in rsps}) == 1
+    assert cache.stats["misses"] == 1 and cache.stats["coalesced"] == 4
+    await asyncio.sleep(0.15)
+    # Stale: served at once while one refresh runs in the background
+    stale, _ = await cache.send(link, status)
+    assert stale == rsps[0][0] and cache.stats["stale"] == 1
+    await asyncio.sleep(0.1)
+    fresh, _ = await cache.send(link, status)
+    assert fresh != stale and len(sent) == 2
+    listing = bbc.make_frame(bbc.CMD_LIST_SHOTS, payload=b"\x00")
+    await cache.send(link, listing)
+    await cache.send(link, listing)
+    assert sent.count(bbc.CMD_LIST_SHOTS) == 1
+    await cache.send(link, bbc.make_frame(bbc.CMD_DEL_SHOT, payload=struct.pack("<I", 7)))
+    await cache.send(link, listing)
+    assert sent.count(bbc.CMD_LIST_SHOTS) == 2, "DEL_SHOT must invalidate LIST_SHOTS"
+    await cache.send(link, bbc.make_frame(bbc.CMD_DEL_SHOT, payload=struct.pack("<I", 8)), 5.0)
+    assert set(timeouts[:-1]) == {10.0} and timeouts[-1] == 5.0, "no timeout given: the link's own default"
+    print("test_response_cache OK: single flight, stale-while-revalidate and invalidation by mutating commands.")
+
+
+def test_response_cache():
+    asyncio.run(_response_cache())
+
+
+async def _wifi_keepalive():
+    import ble_binary_client as bbc
+    from transport import HttpTransport, fetch_shot
+    from wifi_binary_client import HttpClient
+    full = make_svtshot3(40)
+    accepted = []
+    deletes = []
+
+    async def handle(reader, writer):
+        """Minimal ESP-IDF-like /api/cmd: keep-alive, Content-Length replies; closes after 3 requests when asked
+        and drops the socket without replying after a DEL_SHOT."""
+        accepted.append(writer)
+        served = 0
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            n = 0
+            while (h := await reader.readline()) not in (b"\r\n", b""):
+                if h.lower().startswith(b"content-length:"):
+                    n = int(h.split(b":")[1])
+            frame = await reader.readexactly(n)
+            if frame[0] == bbc.CMD_DEL_SHOT:
+                deletes.append(frame)
+                break
+            if frame[0] == bbc.CMD_GET_SHOT_CHUNK:
+                shot_id, off = struct.unpack_from("<IH", frame, 3)
+                chunk = full[off : off + 495]
+                body = struct.pack("<BH", bbc.RSP_SHOT, len(chunk)) + chunk
+            else:
+                body = struct.pack("<BHB", bbc.RSP_STATUS, 1, 0)
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+            await writer.drain()
+            served += 1
+            if frame[0] == bbc.CMD_STATUS and served >= 3 and writer is accepted[0]:
+                break  # device drops the first idle socket
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    link = HttpTransport(url)
+    link.client = HttpClient(url)
+    payload, err = await fetch_shot(link, 9, len(full), window=1)
+    assert err is None and payload == full, err
+    st = link.client.stats()
+    assert st["connects"] == 1 and st["requests"] >= 3 and st["reused_pct"] > 50, st
+    assert st["last"]["bytes"] > 0 and st["mean_first_byte_ms"] is not None
+    status = bbc.make_frame(bbc.CMD_STATUS, payload=b"\x00")
+    for _ in range(3):
+        rsp, err = await link.send(status)
+        assert err is None and rsp[0] == bbc.RSP_STATUS, err
+    # Pooled connection was closed by the device: retried once on a new connection
+    await asyncio.sleep(0.05)
+    rsp, err = await link.send(status)
+    assert err is None and link.client.connects == 2, (err, link.client.connects)
+    # Request went out on a reused connection, then it died: a state-changing command is not resent
+    rsp, err = await link.send(bbc.make_frame(bbc.CMD_DEL_SHOT, payload=struct.pack("<I", 9)))
+    assert rsp is None and err and len(deletes) == 1, (err, deletes)
+    assert link.client.connects == 2, "sent on the pooled connection, no second attempt"
+    await link.close()
+    server.close()
+    await server.wait_closed()
+    rsp, err = await HttpClient(url).post_cmd(status, 1.0)
+    assert rsp is None and "Failed to establish" in err, err
+    print("test_wifi_keepalive OK: one TCP connect per shot, per-request timings, stale socket retried, DEL_SHOT never resent.")
+
+
+def test_wifi_keepalive():
+    asyncio.run(_wifi_keepalive())
+
+
+async def _wifi_parallel():
+    import ble_binary_client as bbc
+    from wifi_binary_client import fetch_shot_parallel, get_client
+    full = make_svtshot3(400)
+    seen, live, peak = [], [0], [0]
+
+    async def handle(reader, writer):
+        """Slow device: 20 ms per chunk, first request for every 5th offset answered with HTTP 500."""
+        while line := await reader.readline():
+            n = 0
+            while (h := await reader.readline()) not in (b"\r\n", b""):
+                if h.lower().startswith(b"content-length:"):
+                    n = int(h.split(b":")[1])
+            frame = await reader.readexactly(n)
+            off = struct.unpack_from("<IH", frame, 3)[1]
+            live[0] += 1
+            peak[0] = max(peak[0], live[0])
+            await asyncio.sleep(0.02)
+            live[0] -= 1
+            seen.append(off)
+            if off // 495 % 5 == 4 and seen.count(off) == 1:
+                writer.write(b"HTTP/1.1 500 Internal Server Error\r\nContent-Length: 0\r\n\r\n")
+            else:
+                chunk = full[off : off + 495]
+                body = struct.pack("<BH", bbc.RSP_SHOT, len(chunk)) + chunk
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    payload, err = await fetch_shot_parallel(url, 5, len(full), concurrency=3)
+    assert err is None and payload == full, err
+    chunks = -(-len(full) // 495)
+    assert peak[0] == 3, f"expected 3 chunk requests in flight, saw {peak[0]}"
+    assert len(seen) == chunks + len([o for o in set(seen) if o // 495 % 5 == 4]), "only failed offsets are retried"
+    await get_client(url).close()
+    await asyncio.sleep(0.01)
+    server.close()
+    await server.wait_closed()
+    print(f"test_wifi_parallel OK: {chunks} chunks with 3 in flight, failed offsets retried individually.")
+
+
+def test_wifi_parallel():
+    asyncio.run(_wifi_parallel())
+
+
+async def _wifi_discovery():
+    import itertools
+    import tempfile
+    import time
+    from wifi_discovery import WifiDiscovery
+    live, peak, probed = [0], [0], []
+    devices = {"10.9.8.77": "10.9.8.77", "10.9.8.201": "10.9.8.201"}
+
+    async def fake_probe(ip, timeout):
+        probed.append(ip)
+        live[0] += 1
+        peak[0] = max(peak[0], live[0])
+        await asyncio.sleep(0.001 if ip in devices else timeout)
+        live[0] -= 1
+        return (devices.get(ip), 0.001)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "wifi.json"
+        disc = WifiDiscovery(path, timeout=0.05, concurrency=32, probe_fn=fake_probe)
+        t0 = time.monotonic()
+        found = await disc.discover(full=True, subnets=["10.9.8.0/24"])
+        sec = time.monotonic() - t0
+        assert sorted(d.ip for d in found) == sorted(devices), found
+        assert peak[0] == 32 and sec < 0.05 * (263 / 32 + 3), (peak[0], sec)
+        # Known devices are probed first; with full=False an answer there ends discovery in one round
+        disc2 = WifiDiscovery(path, timeout=0.05, probe_fn=fake_probe)
+        assert {d.ip for d in disc2.known()} == set(devices)
+        probed.clear()
+        found = await disc2.discover(full=False, subnets=["10.9.8.0/24"])
+        assert set(probed[:2]) == set(devices) and len(probed) < 20 and len(found) == 2, probed
+        for bad in ("10.0.0.0/8", "fd00::/64", "nope"):
+            try:
+                await disc2.discover(subnets=[bad])
+                raise AssertionError(f"{bad} should be rejected")
+            except ValueError:
+                pass
+        # Hosts are pulled lazily: an endless generator is fine as long as the workers are cancelled
+        probed.clear()
+        hosts = (f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in itertools.count())
+        task = asyncio.ensure_future(disc2.probe_many(hosts))
+        await asyncio.sleep(0.12)
+        task.cancel()
+        assert 32 <= len(probed) < 400, len(probed)
+    print("test_wifi_discovery OK: bounded concurrent /24 sweep, cached devices re-probed first, big/IPv6 nets refused.")
+
+
+def test_wifi_discovery():
+    asyncio.run(_wifi_discovery())
+
+
+async def _wifi_probe_split():
+    from wifi_discovery import probe
+
+    async def device(reader, writer, length: bool):
+        await reader.readuntil(b"\r\n\r\n")
+        # ESP-IDF httpd_resp_send: status/headers and body go out in separate writes
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+                     + (b"Content-Length: 12\r\n" if length else b"") + b"\r\n")
+        await writer.drain()
+        await asyncio.sleep(0.02)
+        writer.write(b"192.168.4.1\n")
+        await writer.drain()
+        await asyncio.sleep(0.02 if length else 0)
+        writer.close()
+
+    for length in (True, False):
+        server = await asyncio.start_server(lambda r, w, n=length: device(r, w, n), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        body, rtt = await probe("127.0.0.1", 1.0, port=port)
+        server.close()
+        await server.wait_closed()
+        assert body == "192.168.4.1" and rtt >= 0.02, (length, body)
+    print("test_wifi_probe_split OK: body read after a separate header write (Content-Length and EOF).")
+
+
+def test_wifi_probe_split():
+    asyncio.run(_wifi_probe_split())
+
+
+async def _emulator():
+    import os
+    import select
+    import tty
+    import zlib
+    from unittest.mock import patch
+    import ble_binary_client as bbc
+    import smartball_emulator as emu
+    import transport
+    from response_decoder import decode
+    from wifi_binary_client import get_client
+    ball = emu.EmulatedBall("nrf", [300], address="EE:00:00:00:00:22")
+    shots = dict(ball.shot_list())
+    assert shots[emu.TEST_SHOT_ID] == emu.TEST_SHOT_SIZE and shots[1] == 24 + 300 * 28 + 4
+    assert decode(ball.handle(bbc.make_frame(bbc.CMD_STATUS), mtu=185)).ble.mtu == 185
+    assert decode(ball.handle(bbc.make_frame(bbc.CMD_SPI_READ, payload=b"\x00\x0f\x01"))).data == b"\x6c"
+    ball.handle(bbc.make_frame(bbc.CMD_SET, payload=b"\x0a\x01trigger_g\x00\x05"))
+    cfg = {e.key: e.value for e in decode(ball.handle(bbc.make_frame(bbc.CMD_GET_CFG))).entries}
+    assert cfg["trigger_g"] == b"\x05"
+    assert ball.handle(b"\x02\x00\x00") is None, "empty frames are dropped like the firmware does"
+
+    # HTTP /api/cmd with lost replies (HTTP 500): pipelined fetch still reassembles the test shot
+    http = emu.HttpEmulator(emu.EmulatedBall("esp32"), emu.LinkProfile(latency_ms=1, drop_rate=0.2, seed=3))
+    url = await http.start()
+    data, err = await transport.fetch_shot(transport.HttpTransport(url), emu.TEST_SHOT_ID, emu.TEST_SHOT_SIZE, window=4)
+    assert err is None and bytes(data) == emu.test_shot() and http.link.dropped > 0, (err, http.link.dropped)
+    await get_client(url).close()
+    await http.close()
+
+    # In-process BLE: chunks sized from the MTU, jittered notifications still arrive in order
+    with patch("ble_binary_client._POST_CONNECT_MTU_DELAY_SEC", 0.0), \
+            emu.EmulatedBle(ball, profile=emu.LinkProfile(latency_ms=2, jitter_ms=2, mtu=185, seed=4)):
+        link = transport.BleTransport(ball.address)
+        data, err = await transport.fetch_shot(link, 1, shots[1], window=4)
+        assert err is None and bytes(data) == ball.shot_data(1), err
+        assert ball.stats["GET_SHOT_CHUNK"] == -(-shots[1] // (185 - emu.CHUNK_OVERHEAD))
+        await link.close()
+
+    # NUS OTA state machine: DATA during erase -> PROGRESS, out of order -> BAD_OFFSET, FINISH -> new version
+    image = struct.pack("<IH", emu.OTA_MAGIC, 0x0203) + bytes(range(250))
+    start = struct.pack("<BHII", 1, 0x0203, len(image), zlib.crc32(image))
+    replies = ball.handle_ota(struct.pack("<BH", emu.CMD_OTA_START, len(start)) + start)
+    assert [r[1][0] for r in replies] == [emu.RSP_OTA, emu.MSG_OTA_READY] and replies[1][0] > 0
+
+    def data_frame(off):
+        chunk = image[off:off + 128]
+        payload = struct.pack("<I", off) + chunk + struct.pack("<I", zlib.crc32(chunk))
+        return struct.pack("<BH", emu.CMD_OTA_DATA, len(payload)) + payload
+
+    assert ball.handle_ota(data_frame(0))[0][1][0] == emu.MSG_OTA_PROGRESS
+    ball.ota["erase_done"] = 0.0
+    assert struct.unpack_from("<BI", ball.handle_ota(data_frame(128))[0][1], 3) == (emu.OTA_ERR_BAD_OFFSET, 0)
+    for off in (0, 128):
+        assert struct.unpack_from("<BI", ball.handle_ota(data_frame(off))[0][1], 3)[1] == min(off + 128, len(image))
+    assert ball.handle_ota(struct.pack("<BH", emu.CMD_OTA_FINISH, 0))[0][1][3] == emu.OTA_OK_FINISH
+    ball.reboot()
+    assert decode(ball.handle(bbc.make_frame(bbc.CMD_ID))).fw_version == "2.3"
+
+    # PTY serial framing: garbage before a frame is skipped
+    ser = emu.SerialEmulator(emu.EmulatedBall("nrf"))
+    fd = os.open(await ser.start(), os.O_RDWR | os.O_NOCTTY)
+    tty.setraw(fd)
+    os.write(fd, b"\x00\x00" + bbc.make_frame(bbc.CMD_STATUS))
+    rsp = b""
+    while len(rsp) < 68:
+        await asyncio.sleep(0.01)
+        if select.select([fd], [], [], 0)[0]:
+            rsp += os.read(fd, 256)
+    os.close(fd)
+    await ser.close()
+    assert rsp[0] == bbc.RSP_STATUS and len(rsp) == 68
+    print("test_emulator OK: SVB1 replies, lossy HTTP, MTU-sized BLE chunks, NUS OTA, PTY framing.")
+
+
+def test_emulator():
+    asyncio.run(_emulator())
+
+
+def test_link_tuner():
+    from link_tuning import LinkTuner, OK_PER_STEP
+    tuner = LinkTuner(delay_sec=0.04, segment_bytes=4096, window=4)
+    tuner.on_loss()
+    assert (tuner.delay_sec, tuner.segment_bytes, tuner.window) == (0.08, 2048, 2)
+    for _ in range(OK_PER_STEP):
+        tuner.on_ok()
+    assert (tuner.delay_sec, tuner.segment_bytes, tuner.window) == (0.07, 2560, 3)
+    assert LinkTuner.from_dict(tuner.to_dict()).to_dict() == tuner.to_dict()
+    assert LinkTuner.from_dict({"chunk_size": 241, "mtu": 247, "window": 5}).to_dict()["window"] == 5
+    print("test_link_tuner OK: AIMD pacing steps; stale chunk_size/mtu keys ignored.")
+
+
+def test_segment_fetch():
+    asyncio.run(_segment_fetch())
+
+
+def test_session_reuse():
+    asyncio.run(_session_reuse())
+
+
+def test_pipelined_fetch():
+    asyncio.run(_pipelined_fetch())
+
+
+def test_journal_resume():
+    asyncio.run(_journal_resume())
+
+
 def run_tests():
-    asyncio.run(test_segment_fetch())
+    test_segment_fetch()
+    test_session_reuse()
+    test_pipelined_fetch()
+    test_journal_resume()
+    test_link_tuner()
+    test_response_decoder()
+    test_transport_fetch()
+    test_bluez_cache()
+    test_device_registry()
+    test_jobs()
+    test_status_stream()
+    test_response_cache()
+    test_wifi_keepalive()
+    test_wifi_parallel()
+    test_wifi_discovery()
+    test_wifi_probe_split()
+    test_emulator()
+    test_shot_decode()
+    test_shot_archive()
+    test_binary_shot_endpoints()
+    test_shot_sync()
     print("All tests passed.")
 
 
@@ -0,0 +1,359 @@
+"""
+One async Transport interface over BLE (persistent BleSession), HTTP (ESP32-C6 /api/cmd, keep-alive) and
+USB serial (same <BH> frames on the CDC port). Transports only move frames: send(frame), send_many(frames),
+fetch_range(shot, offset, n), reset(), close(). Pipelined/resumable shot fetch and command batches are
+built once on top (fetch_shot, send_cmds) and work on every transport.
+All coroutines run on the shared async_runner loop; HTTP is native asyncio, blocking serial I/O goes through to_thread.
+"""
+import asyncio
+import struct
+import sys
+import time
+
+from ble_binary_client import (
+    CMD_GET_SHOT_CHUNK,
+    CMD_RESPONSE,
+    FETCH_SHOT_WINDOW,
+    RSP_SHOT,
+    RSP_STATUS,
+    _is_ping,
+    build_cmd_frame,
+    cmd_result,
+    make_frame,
+)
+from response_cache import get_cache
+from shot_buffer import ShotBuffer
+
+# After a burst loses a reply, let stragglers arrive (and be dropped) before the next burst
+PIPELINE_SETTLE_SEC = 0.3
+FETCH_MAX_FAILS = 6
+SERIAL_BAUD = 115200
+
+
+def _debug_log(msg: str) -> None:
+    print(f"[transport] {msg}", file=sys.stderr, flush=True)
+
+
+def chunk_frame(shot_id: int, offset: int) -> bytes:
+    return make_frame(CMD_GET_SHOT_CHUNK, payload=struct.pack("<IH", shot_id, offset))
+
+
+def chunk_data(rsp: bytes | None, offset: int, n: int) -> memoryview | None:
+    """Payload of an RSP_SHOT reply, clipped to n bytes; None for no/unexpected reply."""
+    if rsp is None:
+        return None
+    if len(rsp) < 3 or rsp[0] != RSP_SHOT:
+        _debug_log(f"GET_SHOT_CHUNK offset={offset}: rsp[0]=0x{rsp[0]:02x}, will re-request")
+        return None
+    plen = min(struct.unpack_from("<H", rsp, 1)[0], len(rsp) - 3, n)
+    return memoryview(rsp)[3:3 + max(0, plen)]
+
+
+class Transport:
+    """Frame link to one device. device: key for journals/tuning (BLE address, URL or serial port)."""
+
+    kind = ""
+
+    def __init__(self, device: str):
+        self.device = device
+
+    async def send(self, frame: bytes, timeout_sec: float = 3.0) -> tuple[bytes | None, str | None]:
+        raise NotImplementedError
+
+    async def send_many(self, frames: list, timeout_sec: float = 3.0) -> tuple[list | None, str | None]:
+        """Responses for frames (None where none arrived). Default: one at a time."""
+        out = []
+        for frame in frames:
+            rsp, err = await self.send(frame, timeout_sec)
+            if err:
+                return (None, err)
+            out.append(rsp)
+        return (out, None)
+
+    async def fetch_range(self, shot_id: int, offset: int, n: int,
+                          timeout_sec: float = 5.0) -> tuple[memoryview | None, str | None]:
+        """Up to n shot bytes at offset (the firmware decides the chunk length)."""
+        rsp, err = await self.send(chunk_frame(shot_id, offset), timeout_sec)
+        return (None, err) if err else (chunk_data(rsp, offset, n), None)
+
+    async def fetch_ranges(self, shot_id: int, offsets: list, n: int,
+                           timeout_sec: float = 5.0) -> tuple[list | None, str | None]:
+        """fetch_range for several offsets, pipelined where the link allows (send_many)."""
+        rsps, err = await self.send_many([chunk_frame(shot_id, off) for off in offsets], timeout_sec)
+        if err:
+            return (None, err)
+        return ([chunk_data(r, off, n) for r, off in zip(rsps, offsets)], None)
+
+    async def reset(self) -> None:
+        """Drop and re-establish the link on next use (after repeated losses)."""
+
+    async def close(self) -> None:
+        pass
+
+
+class BleTransport(Transport):
+    """addr's persistent BleSession: notifications matched by response type, requests pipelined."""
+
+    kind = "ble"
+
+    def __init__(self, addr: str, device=None, adapter: str | None = None):
+        from ble_binary_client import get_session
+        super().__init__(addr)
+        self.session = get_session(addr, adapter)
+        if device is not None:
+            self.session.device = device
+
+    async def send(self, frame: bytes, timeout_sec: float = 3.0):
+        return await self.session.send(frame, timeout_sec)
+
+    async def send_many(self, frames: list, timeout_sec: float = 3.0):
+        return await self.session.send_many(frames, timeout_sec)
+
+    async def fetch_ranges(self, shot_id: int, offsets: list, n: int, timeout_sec: float = 5.0):
+        # RSP_SHOT carries no offset: once a reply is lost the rest of the burst may be shifted, so discard it
+        rsps, err = await self.send_many([chunk_frame(shot_id, off) for off in offsets], timeout_sec)
+        if err:
+            return (None, err)
+        if any(r is None for r in rsps):
+            return ([None] * len(rsps), None)
+        return ([chunk_data(r, off, n) for r, off in zip(rsps, offsets)], None)
+
+    async def reset(self) -> None:
+        await self.session.reset_link()
+
+    async def close(self) -> None:
+        await self.session.close()
+
+
+class HttpTransport(Transport):
+    """ESP32-C6 over WiFi: POST frame to <url>/api/cmd on the device's pooled keep-alive connections."""
+
+    kind = "wifi"
+
+    def __init__(self, device_url: str):
+        from wifi_binary_client import get_client
+        super().__init__(device_url)
+        self.client = get_client(device_url)
+
+    async def send(self, frame: bytes, timeout_sec: float = 10.0):
+        return await self.client.post_cmd(frame, timeout_sec)
+
+    async def send_many(self, frames: list, timeout_sec: float = 10.0):
+        # Each POST is an independent request/reply: run them concurrently (the client's pool bounds how
+        # many are open at once); a failed request leaves None for its frame so only that one is retried
+        results = await asyncio.gather(*(self.client.post_cmd(f, timeout_sec) for f in frames))
+        errs = [err for _, err in results if err]
+        if errs and len(errs) == len(results):
+            return (None, errs[0])
+        return ([rsp for rsp, _ in results], None)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class SerialTransport(Transport):
+    """USB CDC serial: frames written raw, replies read as <BH> header + payload (pyserial)."""
+
+    kind = "serial"
+
+    def __init__(self, port: str, baud: int = SERIAL_BAUD):
+        super().__init__(port)
+        self.baud = baud
+        self._ser = None
+        self._lock = asyncio.Lock()
+
+    def _open(self):
+        if self._ser is None:
+            try:
+                import serial
+            except ImportError:
+                raise RuntimeError("pyserial not installed (pip install pyserial)")
+            self._ser = serial.Serial(self.device, self.baud, timeout=0.5)
+            self._ser.reset_input_buffer()
+        return self._ser
+
+    def _read_frame(self, ser, deadline: float) -> bytes | None:
+        hdr = b""
+        while len(hdr) < 3 and time.monotonic() < deadline:
+            hdr += ser.read(3 - len(hdr))
+        if len(hdr) < 3:
+            return None
+        plen = struct.unpack_from("<H", hdr, 1)[0]
+        body = b""
+        while len(body) < plen and time.monotonic() < deadline:
+            body += ser.read(plen - len(body))
+        return hdr + body if len(body) == plen else None
+
+    def _transact(self, frame: bytes, timeout_sec: float):
+        try:
+            ser = self._open()
+            ser.write(frame)
+            ser.flush()
+            want = CMD_RESPONSE.get(frame[0], RSP_STATUS)
+            deadline = time.monotonic() + timeout_sec
+            while time.monotonic() < deadline:
+                rsp = self._read_frame(ser, deadline)
+                if rsp is None:
+                    break
+                if not _is_ping(rsp) and rsp[0] in (want, RSP_STATUS):
+                    return (rsp, None)
+                _debug_log(f"serial {self.device}: unsolicited frame 0x{rsp[0]:02x} len={len(rsp)} dropped")
+            return (None, None)
+        except Exception as e:
+            self._close_port()
+            return (None, str(e))
+
+    def _close_port(self) -> None:
+        ser, self._ser = self._ser, None
+        if ser is not None:
+            try:
+                ser.close()
+            except Exception:
+                pass
+
+    async def send(self, frame: bytes, timeout_sec: float = 3.0):
+        async with self._lock:
+            return await asyncio.to_thread(self._transact, frame, timeout_sec)
+
+    async def reset(self) -> None:
+        async with self._lock:
+            self._close_port()
+
+    async def close(self) -> None:
+        await self.reset()
+
+
+_transports: dict[tuple[str, str], Transport] = {}
+
+
+def get_transport(kind: str, target: str, **kwargs) -> Transport:
+    """Shared transport for (kind, target): "ble" address, "wifi" URL or "serial" port. Kept open
+    between calls like BLE sessions, so HTTP keep-alive and serial ports survive across requests."""
+    kind = (kind or "ble").lower()
+    key = _key(kind, target)
+    t = _transports.get(key)
+    if t is not None and kind == "ble" and kwargs.get("adapter"):
+        from ble_binary_client import get_session
+        get_session(target, kwargs["adapter"])  # re-pin the shared session to the assigned adapter
+    if t is None:
+        if kind == "wifi":
+            t = HttpTransport(target)
+        elif kind == "serial":
+            t = SerialTransport(target, **kwargs)
+        elif kind == "ble":
+            t = BleTransport(target, adapter=kwargs.get("adapter"))
+        else:
+            raise ValueError(f"unknown transport: {kind}")
+        _transports[key] = t
+    return t
+
+
+def _key(kind: str, target: str) -> tuple[str, str]:
+    return (kind, (target or "").strip().upper() if kind == "ble" else (target or "").strip())
+
+
+async def close_transport(kind: str, target: str) -> None:
+    """Close and forget the shared transport (e.g. free a serial port for smpmgr)."""
+    t = _transports.pop(_key((kind or "ble").lower(), target), None)
+    if t is not None:
+        await t.close()
+
+
+async def close_transports() -> None:
+    for t in list(_transports.values()):
+        try:
+            await t.close()
+        except Exception:
+            pass
+
+
+async def send_cmds(transport: Transport, cmds: list, timeout_sec: float | None = None) -> list[dict]:
+    """Run cmds ([{"cmd": name|id, "payload": hex|bytes}, ...]) in order on one transport (timeout_sec=None:
+    the transport's default). Returns one
+    cmd_result dict per entry. After a link error the rest are reported as not sent rather than replayed
+    (batches may contain SET/DEL_SHOT). Read-only commands go through the response cache."""
+    results = []
+    link_err = None
+    for entry in cmds:
+        cmd = entry.get("cmd") if isinstance(entry, dict) else entry
+        payload = entry.get("payload") if isinstance(entry, dict) else None
+        if link_err:
+            results.append(cmd_result(cmd, None, f"not sent: {link_err}", 0.0))
+            continue
+        frame, err = build_cmd_frame(cmd, payload)
+        if err:
+            results.append(cmd_result(cmd, None, err, 0.0))
+            continue
+        t0 = time.monotonic()
+        rsp, err = await get_cache().send(transport, frame, timeout_sec)
+        results.append(cmd_result(frame[0], rsp, err, time.monotonic() - t0))
+        link_err = err
+    return results
+
+
+async def fetch_shot(
+    transport: Transport,
+    shot_id: int,
+    size: int,
+    window: int = FETCH_SHOT_WINDOW,
+    timeout_per_chunk: float = 5.0,
+    journal=None,
+    tuner=None,
+    progress=None,
+) -> tuple[memoryview | None, str | None]:
+    """Fetch a full shot with up to window GET_SHOT_CHUNK requests in flight; chunks are written at their
+    requested offset of a ShotBuffer (read-only view returned). The first reply gives the firmware's chunk
+    length; a burst without progress is retried for the offsets still uncovered (window halves each time).
+    journal: optional ShotJournal (used as the buffer); its coverage seeds the fetch and each chunk is recorded.
+    tuner: optional link_tuning.LinkTuner; supplies and adapts the window instead of halving it locally.
+    progress: optional callable(**fields); gets retries and window after each burst without progress
+    (bytes/offset come from the buffer's on_write hook)."""
+    if size <= 0:
+        return (None, "invalid size")
+    if size > 0xFFFF + 1:
+        return (None, f"size {size} exceeds GET_SHOT_CHUNK offset range")
+    buf = journal if journal is not None else ShotBuffer(size)
+    step = 0
+    fails = 0
+    retries = 0
+    if tuner is not None:
+        window = tuner.window
+    while True:
+        offsets = buf.missing_offsets(step or size, max(1, window) if step else 1)
+        if step and step < size:
+            # Ask for the tail as a full-length chunk: a reply shorter than a ping is dropped as one
+            offsets = sorted({min(off, size - step) for off in offsets})
+        if not offsets:
+            return (buf.view(), None)
+        chunks, err = await transport.fetch_ranges(shot_id, offsets, size, timeout_per_chunk)
+        received_before = buf.received
+        for off, data in zip(offsets, chunks or ()):
+            if data is None:
+                continue
+            if len(data) == 0:
+                return (None, f"empty chunk at offset {off} (got {buf.received}/{size} bytes)")
+            buf.write(off, data)
+            step = step or len(data)
+            if tuner is not None:
+                tuner.on_ok()
+                window = tuner.window
+        if not err and buf.received > received_before:
+            fails = 0
+            continue
+        fails += 1
+        retries += 1
+        got = buf.received
+        if fails > FETCH_MAX_FAILS:
+            return (None, err or f"chunk failed or timeout at offset {offsets[0]} (got {got}/{size} bytes)")
+        prev_window = window
+        if tuner is not None:
+            tuner.on_loss()
+            window = tuner.window
+        else:
+            window = max(1, window // 2)
+        _debug_log(f"{transport.kind} burst at offset {offsets[0]} lost replies ({err or 'timeout'}); window {prev_window} -> {window}")
+        if progress is not None:
+            progress(retries=retries, window=window)
+        if fails % 3 == 0:
+            await transport.reset()
+        await asyncio.sleep(PIPELINE_SETTLE_SEC)
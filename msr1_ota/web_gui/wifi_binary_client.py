@@ -2,17 +2,27 @@
 SmartBall WiFi (ESP32-C6) binary protocol client.
 Same frame format as BLE; POST to http://<device_ip>/api/cmd.
 Use when device runs msr1_esp32c6 firmware (STA: host at device IP).
+Speed: one HttpClient per device URL keeps a small pool of keep-alive HTTP/1.1 connections on the shared
+async_runner loop, so a chunked shot fetch pays one TCP connect instead of one per GET_SHOT_CHUNK.
+Connect, first-byte and transfer times are recorded per request (HttpClient.stats()).
 """
+import asyncio
 import struct
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
 from pathlib import Path
+from urllib.parse import urlsplit
 
 # Reuse protocol constants and make_frame from BLE client
 sys_path = Path(__file__).resolve().parent
 if str(sys_path) not in __import__("sys").path:
     __import__("sys").path.insert(0, str(sys_path))
+from shot_buffer import ShotBuffer
 from ble_binary_client import (
     make_frame,
     format_response,
+    parse_shot_list,
     CMD_ID,
     CMD_STATUS,
     CMD_DIAG,
@@ -33,6 +43,17 @@ from ble_binary_client import (
 
 DEFAULT_DEVICE_URL = "http://192.168.4.1"
 TIMEOUT = 10.0
+# Keep-alive connections per device (the ESP-IDF httpd serves a handful of sockets; leave it some)
+HTTP_POOL_SIZE = 3
+# Idle connections older than this are closed instead of reused (the device may have dropped them)
+HTTP_IDLE_SEC = 20.0
+HTTP_TIMINGS_KEPT = 256
+# Parallel shot fetch: chunk requests in flight at once (capped by the pool) and attempts per offset
+WIFI_FETCH_CONCURRENCY = HTTP_POOL_SIZE
+FETCH_CHUNK_ATTEMPTS = 4
+# Read-only commands: safe to resend when a reused connection dies after the request went out
+REPEATABLE_CMDS = frozenset({CMD_ID, CMD_STATUS, CMD_DIAG, CMD_GET_CFG, CMD_BUS_SCAN, CMD_LIST_SHOTS,
+                             CMD_GET_SHOT_CHUNK})
 
 try:
     import requests
@@ -40,19 +61,229 @@ except ImportError:
     requests = None
 
 
-def send_binary_cmd(device_url: str, frame: bytes, timeout: float = TIMEOUT) -> tuple[bytes | None, str | None]:
-    """POST binary frame to device, return (response_bytes, error_message)."""
-    if not requests:
-        return (None, "requests not installed (pip install requests)")
+@dataclass(slots=True)
+class HttpTiming:
+    """One request: TCP connect (0 when a pooled connection was reused), request sent -> first response
+    byte, first byte -> body complete."""
+    connect_ms: float
+    first_byte_ms: float
+    transfer_ms: float
+    total_ms: float
+    reused: bool
+    status: int
+    bytes: int
+
+
+class _Conn:
+    __slots__ = ("reader", "writer", "last_used", "sent")
+
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+        self.last_used = time.monotonic()
+        self.sent = False  # current request fully written (the device may have acted on it)
+
+    def close(self) -> None:
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+async def _read_body(reader, headers: dict) -> tuple[bytes, bool]:
+    """Response body and whether the connection can be reused."""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        parts = []
+        while True:
+            n = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if n == 0:
+                await reader.readline()
+                return (b"".join(parts), True)
+            parts.append(await reader.readexactly(n))
+            await reader.readline()
+    if "content-length" in headers:
+        return (await reader.readexactly(int(headers["content-length"])), True)
+    return (await reader.read(), False)
+
+
+class HttpClient:
+    """Keep-alive HTTP/1.1 POST client for one device URL. Coroutines run on the async_runner loop; up to
+    pool_size requests are in flight at once, each on its own pooled connection."""
+
+    def __init__(self, device_url: str, pool_size: int = HTTP_POOL_SIZE):
+        u = urlsplit(device_url if "://" in device_url else f"http://{device_url}")
+        self.device_url = device_url.rstrip("/")
+        self.host = u.hostname or ""
+        self.port = u.port or 80
+        self.pool_size = pool_size
+        self._idle: list[_Conn] = []
+        self._sem = None
+        self.timings: deque[HttpTiming] = deque(maxlen=HTTP_TIMINGS_KEPT)
+        self.requests = 0
+        self.connects = 0
+        self.errors = 0
+
+    async def _connect(self, timeout: float) -> tuple[_Conn, bool]:
+        """(connection, reused): the most recently used idle connection, or a new one."""
+        now = time.monotonic()
+        while self._idle:
+            conn = self._idle.pop()
+            if now - conn.last_used < HTTP_IDLE_SEC and not conn.reader.at_eof():
+                return (conn, True)
+            conn.close()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise ConnectionError(f"Failed to establish a new connection to {self.host}:{self.port}: "
+                                  f"{e or 'timed out'}") from None
+        self.connects += 1
+        return (_Conn(reader, writer), False)
+
+    async def _exchange(self, conn: _Conn, path: str, body: bytes) -> tuple[int, bytes, bool, float, float]:
+        head = (f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/octet-stream\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n").encode()
+        t0 = time.monotonic()
+        conn.sent = False
+        conn.writer.write(head + bytes(body))
+        await conn.writer.drain()
+        conn.sent = True
+        status_line = await conn.reader.readline()
+        t1 = time.monotonic()
+        if not status_line:
+            raise ConnectionResetError("connection closed by device")
+        parts = status_line.decode("latin-1").split(None, 2)
+        status = int(parts[1])
+        headers = {}
+        while True:
+            line = await conn.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        data, reusable = await _read_body(conn.reader, headers)
+        reusable = reusable and parts[0] == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        return (status, data, reusable, t1 - t0, time.monotonic() - t1)
+
+    async def post(self, path: str, body: bytes, timeout: float = TIMEOUT,
+                   repeatable: bool = False) -> tuple[bytes | None, str | None]:
+        """POST body to path; returns (response body, None) or (None, error). A pooled connection the
+        device closed while idle is retried once on a fresh one - only if the request was not fully written
+        yet, or the request is repeatable (resending it cannot change device state twice)."""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.pool_size)
+        async with self._sem:
+            self.requests += 1
+            for attempt in (0, 1):
+                conn = None
+                t0 = time.monotonic()
+                try:
+                    conn, reused = await self._connect(timeout)
+                    connect_sec = 0.0 if reused else time.monotonic() - t0
+                    status, data, reusable, fb_sec, xfer_sec = await asyncio.wait_for(
+                        self._exchange(conn, path, body), timeout)
+                except ConnectionError as e:
+                    if conn is not None:
+                        conn.close()
+                    if conn is not None and reused and attempt == 0 and (repeatable or not conn.sent):
+                        continue
+                    self.errors += 1
+                    return (None, str(e))
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+                    if conn is not None:
+                        conn.close()
+                    self.errors += 1
+                    if isinstance(e, asyncio.TimeoutError):
+                        return (None, f"Read timed out ({timeout} s) from {self.device_url}{path}")
+                    return (None, f"{type(e).__name__}: {e}")
+                self.timings.append(HttpTiming(
+                    round(connect_sec * 1000, 2), round(fb_sec * 1000, 2), round(xfer_sec * 1000, 2),
+                    round((time.monotonic() - t0) * 1000, 2), reused, status, len(data)))
+                if reusable and len(self._idle) < self.pool_size:
+                    conn.last_used = time.monotonic()
+                    self._idle.append(conn)
+                else:
+                    conn.close()
+                if status >= 400:
+                    self.errors += 1
+                    return (None, f"HTTP {status} for url: {self.device_url}{path}")
+                return (data, None)
+
+    async def post_cmd(self, frame: bytes, timeout: float = TIMEOUT) -> tuple[bytes | None, str | None]:
+        return await self.post("/api/cmd", frame, timeout, repeatable=bool(frame) and frame[0] in REPEATABLE_CMDS)
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> dict:
+        """Request/connect counters, mean timings over the kept requests, and the last request."""
+        t = list(self.timings)
+
+        def mean(field: str) -> float | None:
+            return round(sum(getattr(x, field) for x in t) / len(t), 2) if t else None
+
+        return {
+            "device_url": self.device_url,
+            "requests": self.requests,
+            "connects": self.connects,
+            "errors": self.errors,
+            "reused_pct": round(100.0 * sum(x.reused for x in t) / len(t), 1) if t else None,
+            "mean_connect_ms": mean("connect_ms"),
+            "mean_first_byte_ms": mean("first_byte_ms"),
+            "mean_transfer_ms": mean("transfer_ms"),
+            "mean_total_ms": mean("total_ms"),
+            "last": asdict(t[-1]) if t else None,
+        }
+
+
+_clients: dict[str, HttpClient] = {}
+
+
+def get_client(device_url: str) -> HttpClient:
+    """Shared keep-alive client for device_url (one connection pool per device)."""
+    key = device_url.strip().rstrip("/").lower()
+    client = _clients.get(key)
+    if client is None:
+        client = _clients[key] = HttpClient(device_url.strip())
+    return client
+
+
+def client_stats() -> list[dict]:
+    return [c.stats() for c in _clients.values()]
+
+
+async def send_binary_cmd_async(device_url: str, frame: bytes, timeout: float = TIMEOUT) -> tuple[bytes | None, str | None]:
+    """POST binary frame over device_url's pooled keep-alive connection."""
+    return await get_client(device_url).post_cmd(frame, timeout)
+
+
+def send_binary_cmd(device_url: str, frame: bytes, timeout: float = TIMEOUT, session=None) -> tuple[bytes | None, str | None]:
+    """POST binary frame to device, return (response_bytes, error_message). Uses the device's pooled
+    keep-alive connection; session: optional requests.Session to send through instead."""
+    if session is None:
+        import async_runner
+        return async_runner.run_sync(send_binary_cmd_async(device_url, frame, timeout))
     url = f"{device_url.rstrip('/')}/api/cmd"
     try:
-        r = requests.post(url, data=frame, timeout=timeout)
+        r = session.post(url, data=frame, timeout=timeout)
         r.raise_for_status()
         return (r.content, None)
     except requests.RequestException as e:
         return (None, str(e))
 
 
+def send_binary_cmds(device_url: str, cmds: list, timeout: float = TIMEOUT) -> list[dict]:
+    """Run cmds ([{"cmd": name|id, "payload": hex|bytes}, ...]) in order over one keep-alive HTTP
+    session (transport.send_cmds). Returns one cmd_result dict per entry (same shape as the BLE client)."""
+    import async_runner
+    from transport import HttpTransport, send_cmds
+    t = HttpTransport(device_url)
+    try:
+        return async_runner.run_sync(send_cmds(t, cmds, timeout))
+    finally:
+        async_runner.run_sync(t.close())
+
+
 def get_id(device_url: str = DEFAULT_DEVICE_URL) -> tuple[dict | None, str | None]:
     """Return (dict with fw_ver, proto, hw_rev, uid), or (None, error)."""
     rsp, err = send_binary_cmd(device_url, make_frame(CMD_ID, payload=b"\x00"))
@@ -121,20 +352,9 @@ def get_shot_list(device_url: str = DEFAULT_DEVICE_URL) -> tuple[list[tuple[int,
     """Return [(shot_id, size), ...] or (None, error)."""
     frame = make_frame(CMD_LIST_SHOTS, payload=b"\x00")
     rsp, err = send_binary_cmd(device_url, frame)
-    if err or not rsp or len(rsp) < 4:
-        return (None, err or "no response")
-    if rsp[0] != RSP_SHOT_LIST:
-        return (None, f"unexpected type 0x{rsp[0]:02x}")
-    n = rsp[3]
-    out = []
-    for i in range(min(n, 32)):
-        o = 4 + i * 8
-        if o + 8 > len(rsp):
-            break
-        sid = struct.unpack_from("<I", rsp, o)[0]
-        sz = struct.unpack_from("<I", rsp, o + 4)[0]
-        out.append((sid, sz))
-    return (out, None)
+    if err:
+        return (None, err)
+    return parse_shot_list(rsp)
 
 
 def fetch_shot_chunked_sync(
@@ -143,27 +363,110 @@ def fetch_shot_chunked_sync(
     size: int,
     chunk_size: int = 495,
     timeout_per_chunk: float = 10.0,
-) -> tuple[bytes | None, str | None]:
-    """Fetch full shot via GET_SHOT_CHUNK over WiFi. Returns (payload, error)."""
-    total = b""
-    offset = 0
+    journal=None,
+    session=None,
+    concurrency: int = 1,
+) -> tuple[memoryview | None, str | None]:
+    """Fetch full shot via GET_SHOT_CHUNK over WiFi. Returns (read-only payload view, error).
+    journal: optional ShotJournal (used as the buffer); chunks already in it are skipped and new ones are recorded.
+    session: optional requests.Session (default: the device's pooled keep-alive connection).
+    concurrency > 1: fetch_shot_parallel with that many chunk requests in flight (ignores session)."""
+    if concurrency > 1:
+        import async_runner
+        return async_runner.run_sync(fetch_shot_parallel(device_url, shot_id, size, concurrency,
+                                                         timeout_per_chunk, journal))
+    buf = journal if journal is not None else ShotBuffer(size)
+    offset = buf.next_missing()
     while offset < size:
         frame = make_frame(CMD_GET_SHOT_CHUNK, payload=struct.pack("<IH", shot_id, offset))
-        rsp, err = send_binary_cmd(device_url, frame, timeout=timeout_per_chunk)
+        rsp, err = send_binary_cmd(device_url, frame, timeout=timeout_per_chunk, session=session)
         if err:
             return (None, err)
         if not rsp or len(rsp) < 4 or rsp[0] != RSP_SHOT:
             return (None, f"chunk at offset {offset}: bad response")
         plen = struct.unpack_from("<H", rsp, 1)[0]
-        total += rsp[3 : 3 + plen]
-        offset += plen
         if plen == 0:
             break
-    if len(total) < size:
-        return (None, f"incomplete: got {len(total)}/{size} bytes")
-    return (total, None)
+        buf.write(offset, memoryview(rsp)[3 : 3 + plen])
+        offset = buf.next_missing(offset + plen)
+    if not buf.complete:
+        return (None, f"incomplete: got {buf.received}/{size} bytes")
+    return (buf.view(), None)
+
+
+async def fetch_shot_parallel(
+    device_url: str,
+    shot_id: int,
+    size: int,
+    concurrency: int = WIFI_FETCH_CONCURRENCY,
+    timeout_per_chunk: float = 10.0,
+    journal=None,
+    max_attempts: int = FETCH_CHUNK_ATTEMPTS,
+) -> tuple[memoryview | None, str | None]:
+    """Fetch a shot with up to concurrency GET_SHOT_CHUNK POSTs in flight on device_url's keep-alive pool.
+    The first missing chunk is fetched alone to learn the firmware's chunk length; the remaining offsets
+    go on a queue drained by concurrency workers, each chunk written at its offset of a preallocated
+    ShotBuffer (or journal). A failed offset goes back on the queue, up to max_attempts times."""
+    if size <= 0:
+        return (None, "invalid size")
+    if size > 0xFFFF + 1:
+        return (None, f"size {size} exceeds GET_SHOT_CHUNK offset range")
+    client = get_client(device_url)
+    buf = journal if journal is not None else ShotBuffer(size)
+
+    async def fetch_one(off: int) -> tuple[memoryview | None, str | None]:
+        frame = make_frame(CMD_GET_SHOT_CHUNK, payload=struct.pack("<IH", shot_id, off))
+        rsp, err = await client.post_cmd(frame, timeout_per_chunk)
+        if err:
+            return (None, err)
+        if not rsp or len(rsp) < 3 or rsp[0] != RSP_SHOT:
+            return (None, f"chunk at offset {off}: bad response")
+        plen = min(struct.unpack_from("<H", rsp, 1)[0], len(rsp) - 3, size - off)
+        if plen <= 0:
+            return (None, f"empty chunk at offset {off} (got {buf.received}/{size} bytes)")
+        return (memoryview(rsp)[3 : 3 + plen], None)
+
+    first = buf.next_missing()
+    if first >= size:
+        return (buf.view(), None)
+    for _ in range(max_attempts):
+        data, err = await fetch_one(first)
+        if data is not None:
+            break
+    else:
+        return (None, err)
+    buf.write(first, data)
+    step = len(data)
+    attempts: dict[int, int] = {}
+    failed: list[str] = []
+
+    async def worker(queue: asyncio.Queue) -> None:
+        while not queue.empty() and not failed:
+            off = queue.get_nowait()
+            data, err = await fetch_one(off)
+            if data is not None:
+                buf.write(off, data)
+                continue
+            attempts[off] = attempts.get(off, 0) + 1
+            if attempts[off] >= max_attempts:
+                failed.append(f"{err} (offset {off}, {attempts[off]} attempts, got {buf.received}/{size} bytes)")
+            else:
+                queue.put_nowait(off)
+
+    # A short chunk mid-shot leaves a gap after it: sweep again for the offsets still missing
+    for _ in range(max_attempts):
+        offsets = buf.missing_offsets(step, size)
+        if not offsets:
+            return (buf.view(), None)
+        queue: asyncio.Queue = asyncio.Queue()
+        for off in offsets:
+            queue.put_nowait(off)
+        await asyncio.gather(*(worker(queue) for _ in range(max(1, min(concurrency, len(offsets))))))
+        if failed:
+            return (None, failed[0])
+    return (buf.view(), None) if buf.complete else (None, f"incomplete: got {buf.received}/{size} bytes")
 
 
-def fetch_shot_sync(device_url: str, shot_id: int, size: int) -> tuple[bytes | None, str | None]:
+def fetch_shot_sync(device_url: str, shot_id: int, size: int) -> tuple[memoryview | None, str | None]:
     """Convenience: fetch full shot (chunked)."""
     return fetch_shot_chunked_sync(device_url, shot_id, size)
@@ -0,0 +1,232 @@
+"""
+WiFi SmartBall (ESP32-C6) discovery: GET /api/ip probed concurrently on the shared async_runner loop.
+Known-good addresses (last seen first) and the usual defaults are probed in one round, so a device that
+kept its address is found within about one probe timeout; only if none answers is the whole local /24
+(plus SMARTBALL_WIFI_SUBNETS, e.g. "192.168.4.0/24,10.0.0.0/24"; IPv4, at most /22 each) swept by
+PROBE_CONCURRENCY workers pulling hosts from a generator. Responding devices are cached with
+first/last-seen times in .wifi_devices.json.
+"""
+import asyncio
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+_DEVICES_FILE = Path(__file__).resolve().parent / ".wifi_devices.json"
+_file_lock = threading.Lock()
+
+PROBE_TIMEOUT_SEC = 0.6
+PROBE_CONCURRENCY = 64
+# /api/ip answers with a bare address; anything longer is not a SmartBall
+PROBE_MAX_BODY = 4096
+# Common device addresses (STA on the lab networks, AP mode) tried with the known ones
+QUICK_IPS = (
+    "192.168.68.89", "192.168.68.2", "192.168.68.100", "192.168.68.254",
+    "192.168.4.1", "192.168.4.2",
+    "192.168.1.254", "192.168.1.100", "192.168.1.2",
+)
+# Largest sweep accepted (a /22 is 1022 hosts); IPv6 prefixes are never swept
+MIN_SWEEP_PREFIX = 22
+# Forget a cached device after this long without an answer
+KNOWN_TTL_SEC = 7 * 24 * 3600
+
+
+@dataclass(slots=True)
+class WifiDevice:
+    ip: str
+    reported_ip: str  # body of /api/ip (the device's own view of its address)
+    first_seen: float
+    last_seen: float
+    rtt_ms: float | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.ip}"
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "url": self.url}
+
+
+async def _read_response(reader) -> bytes:
+    """Status line + headers, then Content-Length bytes of body (or up to EOF; the request says Connection:
+    close). The device sends headers and body in separate writes, so one read() is not enough."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = None
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length" and value.strip().isdigit():
+            length = int(value)
+    if length is not None:
+        return head + await reader.readexactly(min(length, PROBE_MAX_BODY))
+    body = b""
+    while len(body) < PROBE_MAX_BODY:
+        part = await reader.read(PROBE_MAX_BODY - len(body))
+        if not part:
+            break
+        body += part
+    return head + body
+
+
+async def probe(ip: str, timeout: float = PROBE_TIMEOUT_SEC, port: int = 80) -> tuple[str | None, float]:
+    """(body of GET http://ip/api/ip, round trip s), or (None, elapsed) if nothing valid answered in time."""
+    t0 = time.monotonic()
+    writer = None
+    try:
+        async def get():
+            nonlocal writer
+            reader, writer = await asyncio.open_connection(ip, port)
+            writer.write(f"GET /api/ip HTTP/1.1\r\nHost: {ip}\r\nConnection: close\r\n\r\n".encode())
+            await writer.drain()
+            return await _read_response(reader)
+
+        raw = await asyncio.wait_for(get(), timeout)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        return (None, time.monotonic() - t0)
+    finally:
+        if writer is not None:
+            writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    parts = head.split(None, 2)
+    if len(parts) < 2 or parts[1] != b"200" or not body.strip():
+        return (None, time.monotonic() - t0)
+    return (body.decode("latin-1").strip(), time.monotonic() - t0)
+
+
+def local_subnet() -> str | None:
+    """This host's /24 on the default route (no packet is sent)."""
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            s.connect(("8.8.8.8", 80))
+            ip = s.getsockname()[0]
+        finally:
+            s.close()
+        return str(ipaddress.ip_network(f"{ip}/24", strict=False))
+    except OSError:
+        return None
+
+
+def sweep_network(cidr: str) -> ipaddress.IPv4Network:
+    """cidr as an IPv4 network; ValueError if it is not one, is IPv6 or is larger than /MIN_SWEEP_PREFIX."""
+    net = ipaddress.ip_network(cidr.strip(), strict=False)
+    if net.version != 4:
+        raise ValueError(f"{cidr}: only IPv4 subnets can be swept")
+    if net.prefixlen < MIN_SWEEP_PREFIX:
+        raise ValueError(f"{cidr}: larger than /{MIN_SWEEP_PREFIX} ({net.num_addresses} addresses)")
+    return net
+
+
+def configured_subnets() -> list[str]:
+    """Local /24 plus SMARTBALL_WIFI_SUBNETS (comma-separated IPv4 CIDRs up to /MIN_SWEEP_PREFIX; others skipped)."""
+    out = [n for n in [local_subnet()] if n]
+    for item in os.environ.get("SMARTBALL_WIFI_SUBNETS", "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            net = str(sweep_network(item))
+        except ValueError:
+            continue
+        if net not in out:
+            out.append(net)
+    return out
+
+
+class WifiDiscovery:
+    """Concurrent /api/ip prober with a persistent cache of devices that answered."""
+
+    def __init__(self, path: Path | None = _DEVICES_FILE, timeout: float = PROBE_TIMEOUT_SEC,
+                 concurrency: int = PROBE_CONCURRENCY, probe_fn=probe):
+        self.path = path
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self._probe = probe_fn
+        self._lock = threading.Lock()
+        self._known: dict[str, WifiDevice] = self._load()
+
+    def _load(self) -> dict[str, WifiDevice]:
+        if self.path is None:
+            return {}
+        try:
+            with _file_lock:
+                data = json.loads(self.path.read_text())
+            now = time.time()
+            return {d["ip"]: WifiDevice(**{k: d[k] for k in ("ip", "reported_ip", "first_seen", "last_seen")})
+                    for d in data if now - d["last_seen"] < KNOWN_TTL_SEC}
+        except Exception:
+            return {}
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            data = [asdict(d) for d in self._known.values()]
+        with _file_lock:
+            try:
+                self.path.write_text(json.dumps(data, indent=2))
+            except Exception:
+                pass
+
+    def known(self) -> list[WifiDevice]:
+        """Cached devices, most recently seen first."""
+        with self._lock:
+            return sorted(self._known.values(), key=lambda d: d.last_seen, reverse=True)
+
+    def _seen(self, ip: str, body: str, rtt: float) -> WifiDevice:
+        now = time.time()
+        with self._lock:
+            dev = self._known.get(ip)
+            if dev is None:
+                dev = self._known[ip] = WifiDevice(ip, body, now, now)
+            dev.reported_ip, dev.last_seen, dev.rtt_ms = body, now, round(rtt * 1000, 1)
+            return dev
+
+    async def probe_many(self, ips) -> list[WifiDevice]:
+        """Probe ips (any iterable, consumed lazily) with self.concurrency workers; devices that answered,
+        fastest first."""
+        found = []
+        seen = set()
+        todo = (ip for ip in ips if not (ip in seen or seen.add(ip)))
+
+        async def worker():
+            for ip in todo:
+                body, rtt = await self._probe(ip, self.timeout)
+                if body is not None:
+                    found.append(self._seen(ip, body, rtt))
+
+        await asyncio.gather(*(worker() for _ in range(max(1, self.concurrency))))
+        return sorted(found, key=lambda d: d.rtt_ms or 0.0)
+
+    async def discover(self, full: bool = True, subnets: list[str] | None = None) -> list[WifiDevice]:
+        """Probe known and QUICK_IPS addresses; sweep subnets (default configured_subnets()) too when
+        full=True or nothing answered. Returns every device that answered, known ones first.
+        Raises ValueError for a subnet that is not IPv4 or is larger than /MIN_SWEEP_PREFIX."""
+        nets = [sweep_network(n) for n in (configured_subnets() if subnets is None else subnets)]
+        first = [d.ip for d in self.known()] + list(QUICK_IPS)
+        found = await self.probe_many(first)
+        if full or not found:
+            skip = set(first)
+            found += await self.probe_many(str(h) for n in nets for h in n.hosts() if str(h) not in skip)
+        self._save()
+        rank = {ip: i for i, ip in enumerate(first)}
+        return sorted(found, key=lambda d: rank.get(d.ip, len(rank)))
+
+
+_discovery = None
+
+
+def get_discovery() -> WifiDiscovery:
+    global _discovery
+    if _discovery is None:
+        _discovery = WifiDiscovery()
+    return _discovery
+
+
+def discover_sync(full: bool = True, subnets: list[str] | None = None) -> list[WifiDevice]:
+    """Blocking discover() on the shared loop."""
+    import async_runner
+    return async_runner.run_sync(get_discovery().discover(full, subnets))
@@ -10,6 +10,9 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / ".venv" / "lib" / "python3.11" / "site-packages"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "msr1_ota" / "web_gui"))
+from shot_buffer import ShotBuffer
+from svtshot3 import decode
 
 SB_RX_CHAR = "53564231-5342-4c31-8000-000000000002"
 SB_TX_CHAR = "53564231-5342-4c31-8000-000000000003"
@@ -39,45 +42,6 @@ async def send_cmd(client, frame: bytes) -> bytes | None:
     return None
 
 
-def parse_svtshot3_full(data: bytes) -> dict | None:
-    if len(data) < 24 or data[:8] != b"SVTSHOT3":
-        return None
-    sample_rate = struct.unpack_from("<H", data, 10)[0]
-    count = struct.unpack_from("<I", data, 12)[0]
-    imu_mask = data[17]
-    sample_size = 68 if (imu_mask & 0x06) else 28
-    header_size, footer_size = 24, 4
-    if len(data) < header_size + count * sample_size + footer_size:
-        return None
-    samples = []
-    for i in range(count):
-        off = header_size + i * sample_size
-        t_ms = struct.unpack_from("<I", data, off)[0]
-        row = {"t_ms": t_ms}
-        if sample_size == 28:
-            row["ax"], row["ay"], row["az"] = struct.unpack_from("<fff", data, off + 4)
-            row["gx"], row["gy"], row["gz"] = struct.unpack_from("<fff", data, off + 16)
-        else:
-            row["i_ax"], row["i_ay"], row["i_az"] = struct.unpack_from("<fff", data, off + 8)
-            row["i_gx"], row["i_gy"], row["i_gz"] = struct.unpack_from("<fff", data, off + 20)
-            row["l_ax"], row["l_ay"], row["l_az"] = struct.unpack_from("<fff", data, off + 32)
-            row["l_gx"], row["l_gy"], row["l_gz"] = struct.unpack_from("<fff", data, off + 44)
-            row["h_ax"], row["h_ay"], row["h_az"] = struct.unpack_from("<fff", data, off + 56)
-        samples.append(row)
-    return {"sample_rate": sample_rate, "count": count, "imu_mask": imu_mask, "sample_size": sample_size, "samples": samples}
-
-
-def min_max(samples, key):
-    if not samples or key not in samples[0]:
-        return None
-    lo = hi = samples[0][key]
-    for s in samples[1:]:
-        v = s[key]
-        if v < lo: lo = v
-        if v > hi: hi = v
-    return lo, hi
-
-
 async def main(addr: str):
     from bleak import BleakClient
 
@@ -104,6 +68,7 @@ async def main(addr: str):
             plen = struct.unpack_from("<H", rsp2, 1)[0]
             payload = rsp2[3:3 + plen]
         else:
+            buf = ShotBuffer(sz)
             offset = 0
             while offset < sz:
                 rsp2 = await send_cmd(client, make_frame(CMD_GET_SHOT_CHUNK, struct.pack("<IH", sid, offset)))
@@ -111,25 +76,26 @@ async def main(addr: str):
                     print(f"GET_SHOT_CHUNK failed at offset {offset}")
                     return 1
                 plen = struct.unpack_from("<H", rsp2, 1)[0]
-                payload += rsp2[3:3 + plen]
+                buf.write(offset, memoryview(rsp2)[3:3 + plen])
                 offset += plen
                 if plen < CHUNK_SIZE:
                     break
+            payload = buf.prefix()
 
-        parsed = parse_svtshot3_full(payload)
-        if not parsed:
+        shot = decode(payload)
+        if not shot or not shot.count:
             print("Parse failed")
             return 1
 
-        m = parsed["imu_mask"]
-        s0 = parsed["samples"][0]
+        m = shot.header["imu_mask"]
+        s0 = shot.sample(0)
         print()
         print("--- IMU data check ---")
         print(f"imu_source_mask: 0x{m:02X} (1=Internal, 2=LSM6, 4=ADXL)")
-        print(f"Rate: {parsed['sample_rate']} Hz  Samples: {parsed['count']}")
+        print(f"Rate: {shot.header['sample_rate']} Hz  Samples: {shot.count}")
         print()
         print("First sample:")
-        if parsed["sample_size"] == 28:
+        if shot.sample_size == 28:
             print(f"  Internal: ax={s0['ax']:.3f} ay={s0['ay']:.3f} az={s0['az']:.3f}  gx={s0['gx']:.4f} gy={s0['gy']:.4f} gz={s0['gz']:.4f}")
         else:
             print(f"  Internal: i_ax={s0['i_ax']:.3f} i_ay={s0['i_ay']:.3f} i_az={s0['i_az']:.3f}  i_gx={s0['i_gx']:.4f} i_gy={s0['i_gy']:.4f} i_gz={s0['i_gz']:.4f}")
@@ -137,17 +103,17 @@ async def main(addr: str):
             print(f"  Impact:   h_ax={s0['h_ax']:.3f} h_ay={s0['h_ay']:.3f} h_az={s0['h_az']:.3f}")
         print()
         print("Min / Max:")
-        for key in ("i_ax", "i_ay", "i_az", "i_gx", "i_gy", "i_gz") if parsed["sample_size"] == 68 else ("ax", "ay", "az", "gx", "gy", "gz"):
-            r = min_max(parsed["samples"], key)
+        for key in ("i_ax", "i_ay", "i_az", "i_gx", "i_gy", "i_gz") if shot.sample_size == 68 else ("ax", "ay", "az", "gx", "gy", "gz"):
+            r = shot.stats(key)
             if r:
-                tag = " (all zero)" if r[0] == r[1] and r[0] == 0 else " (constant)" if r[0] == r[1] else ""
-                print(f"  {key}: {r[0]:.4f} / {r[1]:.4f}{tag}")
-        if parsed["sample_size"] == 68:
+                tag = " (all zero)" if r["min"] == r["max"] == 0 else " (constant)" if r["min"] == r["max"] else ""
+                print(f"  {key}: {r['min']:.4f} / {r['max']:.4f}{tag}")
+        if shot.sample_size == 68:
             for key in ("l_ax", "l_ay", "l_az", "l_gx", "l_gy", "l_gz", "h_ax", "h_ay", "h_az"):
-                r = min_max(parsed["samples"], key)
+                r = shot.stats(key)
                 if r:
-                    tag = " (all zero)" if r[0] == r[1] and r[0] == 0 else " (constant)" if r[0] == r[1] else ""
-                    print(f"  {key}: {r[0]:.4f} / {r[1]:.4f}{tag}")
+                    tag = " (all zero)" if r["min"] == r["max"] == 0 else " (constant)" if r["min"] == r["max"] else ""
+                    print(f"  {key}: {r['min']:.4f} / {r['max']:.4f}{tag}")
         print()
     return 0
 
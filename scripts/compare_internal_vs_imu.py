@@ -4,7 +4,8 @@ Compare Internal IMU vs external IMU (LSM6) from shot data. Ignores impact detec
 
 Input: shot data as raw hex (SVTSHOT3). Get it by:
   - Fetch from device: python3 compare_internal_vs_imu.py --fetch BLE_ADDR [shot_id]
-  - Load saved:        python3 compare_internal_vs_imu.py --file msr1_ota/web_gui/saved_shots/<id>.json
+  - Load saved:        python3 compare_internal_vs_imu.py --saved <id>   (shot archive id, as in the web GUI)
+  - Load a file:       python3 compare_internal_vs_imu.py --file <sha256>.svtshot | <exported>.json
   - Pipe hex:          python3 compare_internal_vs_imu.py < hex.txt
   - As argument:       python3 compare_internal_vs_imu.py <hex_string>
 
@@ -19,62 +20,14 @@ from pathlib import Path
 TOOLS = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(TOOLS / "msr1_ota" / "web_gui"))
 
-HEADER_SIZE = 24
-FOOTER_SIZE = 4
-
-
-def parse_svtshot3(raw: bytes):
-    if len(raw) < HEADER_SIZE + 4:
-        return None
-    if raw[:8] != b"SVTSHOT3":
-        return None
-    sample_rate = struct.unpack_from("<H", raw, 10)[0]
-    count = struct.unpack_from("<I", raw, 12)[0]
-    imu_mask = raw[17]
-    sample_size = 68 if (imu_mask & 0x06) else 28  # LSM6=2 or ADXL=4
-    expected = HEADER_SIZE + count * sample_size + FOOTER_SIZE
-    if len(raw) < expected:
-        return None
-    samples = []
-    for i in range(count):
-        off = HEADER_SIZE + i * sample_size
-        t_ms = struct.unpack_from("<I", raw, off)[0]
-        s = {"t_ms": t_ms}
-        if sample_size == 28:
-            s["ax"], s["ay"], s["az"] = struct.unpack_from("<fff", raw, off + 4)
-            s["gx"], s["gy"], s["gz"] = struct.unpack_from("<fff", raw, off + 16)
-        else:
-            s["i_ax"], s["i_ay"], s["i_az"] = struct.unpack_from("<fff", raw, off + 8)
-            s["i_gx"], s["i_gy"], s["i_gz"] = struct.unpack_from("<fff", raw, off + 20)
-            if sample_size == 68:
-                s["l_ax"], s["l_ay"], s["l_az"] = struct.unpack_from("<fff", raw, off + 32)
-                s["l_gx"], s["l_gy"], s["l_gz"] = struct.unpack_from("<fff", raw, off + 44)
-        samples.append(s)
-    return {
-        "sample_rate": sample_rate,
-        "count": count,
-        "imu_mask": imu_mask,
-        "sample_size": sample_size,
-        "samples": samples,
-    }
-
-
-def stats(arr, key):
-    vals = [s[key] for s in arr if key in s and s[key] is not None]
-    if not vals:
-        return None
-    return {
-        "first": vals[0],
-        "min": min(vals),
-        "max": max(vals),
-        "mean": sum(vals) / len(vals),
-    }
+from svtshot3 import decode
 
 
 def main():
     ap = argparse.ArgumentParser(description="Compare Internal IMU vs LSM6 (ignore impact)")
     ap.add_argument("--fetch", metavar="ADDR", help="Fetch shot from device (optional shot_id as next arg)")
-    ap.add_argument("--file", metavar="PATH", help="Load shot from saved JSON file")
+    ap.add_argument("--saved", metavar="ID", help="Load shot from the saved-shot archive")
+    ap.add_argument("--file", metavar="PATH", help="Load shot from a raw .svtshot file or JSON with raw_hex")
     ap.add_argument("hex_input", nargs="?", help="Raw hex string of SVTSHOT3 payload")
     args = ap.parse_args()
 
@@ -84,7 +37,7 @@ def main():
         shot_id = None
         if args.hex_input and args.hex_input.isdigit():
             shot_id = int(args.hex_input)
-        from ble_binary_client import make_frame, send_binary_cmd_sync, CMD_LIST_SHOTS, CMD_GET_SHOT, CMD_GET_SHOT_CHUNK, RSP_SHOT, RSP_SHOT_LIST
+        from ble_binary_client import make_frame, send_binary_cmd_sync, fetch_shot_pipelined_sync, CMD_LIST_SHOTS
         import struct
         # Get shot list if no shot_id
         if shot_id is None:
@@ -116,21 +69,24 @@ def main():
             if size == 0:
                 print("Shot id", shot_id, "not found")
                 sys.exit(1)
-        CHUNK = 240
-        payload = b""
-        offset = 0
-        while offset < size:
-            frame = make_frame(CMD_GET_SHOT_CHUNK, payload=struct.pack("<IH", shot_id, offset))
-            rsp, err = send_binary_cmd_sync(addr, frame)
-            if err or not rsp or rsp[0] != RSP_SHOT:
-                print("Chunk failed:", err)
-                sys.exit(1)
-            plen = struct.unpack_from("<H", rsp, 1)[0]
-            payload += rsp[3:3 + plen]
-            offset += plen
-            if plen < CHUNK:
-                break
+        payload, err = fetch_shot_pipelined_sync(addr, shot_id, size)
+        if err:
+            print("Chunk failed:", err)
+            sys.exit(1)
+        raw_hex = payload.hex()
+    elif args.saved:
+        from shot_archive import get_archive
+        rec, payload = get_archive().load(args.saved)
+        if not payload:
+            print("Saved shot not found:", args.saved)
+            sys.exit(1)
         raw_hex = payload.hex()
+    elif args.file and args.file.endswith(".svtshot"):
+        p = Path(args.file)
+        if not p.is_file():
+            print("File not found:", p)
+            sys.exit(1)
+        raw_hex = p.read_bytes().hex()
     elif args.file:
         p = Path(args.file)
         if not p.is_file():
@@ -157,21 +113,20 @@ def main():
         print("Invalid hex")
         sys.exit(1)
 
-    parsed = parse_svtshot3(raw)
-    if not parsed:
+    shot = decode(raw)
+    if not shot:
         print("Invalid or truncated SVTSHOT3")
         sys.exit(1)
 
-    samples = parsed["samples"]
-    rate = parsed["sample_rate"]
-    mask = parsed["imu_mask"]
-    sample_size = parsed["sample_size"]
+    rate = shot.header["sample_rate"]
+    mask = shot.header["imu_mask"]
+    sample_size = shot.sample_size
 
-    print(f"Shot: {len(samples)} samples @ {rate} Hz  imu_source_mask=0x{mask:X} (1=Internal 2=LSM6 4=ADXL)")
+    print(f"Shot: {shot.count} samples @ {rate} Hz  imu_source_mask=0x{mask:X} (1=Internal 2=LSM6 4=ADXL)")
     if sample_size != 68:
         print("Not multi-IMU (68-byte samples). Only internal or single IMU present.")
-        if sample_size == 28 and samples:
-            s0 = samples[0]
+        if sample_size == 28 and shot.count:
+            s0 = shot.sample(0)
             print("  Internal: ax={:.4f} ay={:.4f} az={:.4f}  gx={:.5f} gy={:.5f} gz={:.5f}".format(
                 s0.get("ax", 0), s0.get("ay", 0), s0.get("az", 0),
                 s0.get("gx", 0), s0.get("gy", 0), s0.get("gz", 0)))
@@ -197,8 +152,8 @@ def main():
     print("-" * 72)
 
     for label, ik, lk, unit in axes:
-        si = stats(samples, ik)
-        sl = stats(samples, lk)
+        si = shot.stats(ik)
+        sl = shot.stats(lk)
         if si is None and sl is None:
             continue
         internal_str = ""
@@ -6,6 +6,9 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1] / ".venv" / "lib" / "python3.11" / "site-packages"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "msr1_ota" / "web_gui"))
+from shot_buffer import ShotBuffer
+from svtshot3 import decode
 
 SB_RX_CHAR = "53564231-5342-4c31-8000-000000000002"
 SB_TX_CHAR = "53564231-5342-4c31-8000-000000000003"
@@ -37,38 +40,6 @@ async def send_cmd(client, frame: bytes) -> bytes | None:
     return None
 
 
-def parse_svtshot3(data: bytes) -> dict | None:
-    if len(data) < 24:
-        return None
-    if data[:8] != b"SVTSHOT3":
-        return None
-    sample_rate = struct.unpack_from("<H", data, 10)[0]
-    count = struct.unpack_from("<I", data, 12)[0]
-    imu_mask = data[17]
-    sample_size = 68 if (imu_mask & 0x06) else 28
-    # Packed header is 24 bytes (magic8+ver1+pad1+rate2+count4+mask1+mask1+pad2+crc4)
-    header_size, footer_size = 24, 4
-    if len(data) < header_size + count * sample_size + footer_size:
-        return None
-    samples = []
-    for i in range(count):
-        off = header_size + i * sample_size
-        t_ms = struct.unpack_from("<I", data, off)[0]
-        row = {"t_ms": t_ms, "t_s": t_ms / 1000.0}
-        if sample_size == 28:
-            ax, ay, az = struct.unpack_from("<fff", data, off + 4)
-            gx, gy, gz = struct.unpack_from("<fff", data, off + 16)
-            row["ax"], row["ay"], row["az"] = ax, ay, az
-            row["gx"], row["gy"], row["gz"] = gx, gy, gz
-        else:
-            i_ax, i_ay, i_az = struct.unpack_from("<fff", data, off + 8)
-            i_gx, i_gy, i_gz = struct.unpack_from("<fff", data, off + 20)
-            row["i_ax"], row["i_ay"], row["i_az"] = i_ax, i_ay, i_az
-            row["i_gx"], row["i_gy"], row["i_gz"] = i_gx, i_gy, i_gz
-        samples.append(row)
-    return {"sample_rate": sample_rate, "count": count, "imu_mask": imu_mask, "sample_size": sample_size, "samples": samples}
-
-
 async def main(addr: str):
     from bleak import BleakClient
 
@@ -101,6 +72,7 @@ async def main(addr: str):
                 plen = struct.unpack_from("<H", rsp2, 1)[0]
                 payload = rsp2[3 : 3 + plen]
             else:
+                buf = ShotBuffer(sz)
                 offset = 0
                 while offset < sz:
                     rsp2 = await send_cmd(client, make_frame(CMD_GET_SHOT_CHUNK, struct.pack("<IH", sid, offset)))
@@ -108,30 +80,32 @@ async def main(addr: str):
                         print(f"  GET_SHOT_CHUNK failed at offset {offset}")
                         break
                     plen = struct.unpack_from("<H", rsp2, 1)[0]
-                    payload += rsp2[3 : 3 + plen]
+                    buf.write(offset, memoryview(rsp2)[3 : 3 + plen])
                     offset += plen
                     if plen < CHUNK_SIZE:
                         break
+                payload = buf.prefix()
             if len(payload) < sz:
                 print("  Incomplete fetch")
                 continue
-            parsed = parse_svtshot3(payload)
-            if not parsed:
+            shot = decode(payload)
+            if not shot:
                 print("  Parse failed")
                 continue
-            print(f"  Rate: {parsed['sample_rate']} Hz | Samples: {parsed['count']} | Size: {parsed['sample_size']} B/sample")
+            print(f"  Rate: {shot.header['sample_rate']} Hz | Samples: {shot.count} | Size: {shot.sample_size} B/sample")
             print()
             # Table header
-            if parsed["sample_size"] == 28:
+            if shot.sample_size == 28:
                 print("  #     t_ms   t(s)      ax      ay      az      gx      gy      gz")
             else:
                 print("  #     t_ms   t(s)   i_ax   i_ay   i_az   i_gx   i_gy   i_gz")
             print("  " + "-" * 70)
-            for i, s in enumerate(parsed["samples"]):
-                if parsed["sample_size"] == 28:
-                    print(f"  {i:3d}  {s['t_ms']:6d}  {s['t_s']:.3f}  {s['ax']:7.2f} {s['ay']:7.2f} {s['az']:7.2f}  {s['gx']:7.3f} {s['gy']:7.3f} {s['gz']:7.3f}")
+            for i in range(shot.count):
+                s = shot.sample(i)
+                if shot.sample_size == 28:
+                    print(f"  {i:3d}  {s['t_ms']:6d}  {s['t_ms'] / 1000:.3f}  {s['ax']:7.2f} {s['ay']:7.2f} {s['az']:7.2f}  {s['gx']:7.3f} {s['gy']:7.3f} {s['gz']:7.3f}")
                 else:
-                    print(f"  {i:3d}  {s['t_ms']:6d}  {s['t_s']:.3f}  {s['i_ax']:6.2f} {s['i_ay']:6.2f} {s['i_az']:6.2f}  {s['i_gx']:6.3f} {s['i_gy']:6.3f} {s['i_gz']:6.3f}")
+                    print(f"  {i:3d}  {s['t_ms']:6d}  {s['t_ms'] / 1000:.3f}  {s['i_ax']:6.2f} {s['i_ay']:6.2f} {s['i_az']:6.2f}  {s['i_gx']:6.3f} {s['i_gy']:6.3f} {s['i_gz']:6.3f}")
             print()
     return 0
 
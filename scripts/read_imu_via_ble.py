@@ -22,25 +22,18 @@ def main():
     if not addr:
         # Quick scan for SmartBall
         try:
-            from bleak import BleakScanner
-            print("Scanning for SmartBall (5s)...")
-            devs = asyncio.run(BleakScanner.discover(timeout=5.0))
-            for d in devs:
-                if d.name and "SmartBall" in d.name:
-                    addr = d.address
-                    print(f"Found: {addr}")
-                    break
-                if d.name and "smartball" in (d.name or "").lower():
-                    addr = d.address
-                    print(f"Found: {addr}")
-                    break
-            if not addr and devs:
-                # Use first with no name or random
-                for d in devs:
-                    if d.address:
-                        addr = d.address
-                        print(f"Using first device: {addr}")
-                        break
+            from ble_scanner import find_device, get_scanner
+            print("Scanning for SmartBall (up to 5s)...")
+            dev = asyncio.run(find_device(None, timeout_sec=5.0, stop=True))
+            if dev is not None:
+                addr = dev.address
+                print(f"Found: {addr}")
+            else:
+                # Use first device seen (no name or random)
+                seen = get_scanner().entries()
+                if seen:
+                    addr = seen[0].address
+                    print(f"Using first device: {addr}")
         except Exception as e:
             print(f"Scan failed: {e}")
             sys.exit(1)
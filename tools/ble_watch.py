@@ -7,21 +7,25 @@ import argparse
 import asyncio
 import sys
 import time
+from pathlib import Path
 
 try:
-    from bleak import BleakScanner
+    import bleak  # noqa: F401
 except ImportError:
     print("Install bleak: pip install bleak")
     sys.exit(1)
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "msr1_ota" / "web_gui"))
+from ble_scanner import find_device
+
 
 def ts():
     return time.strftime("%H:%M:%S", time.localtime())
 
 
 async def scan_once(timeout: float):
-    devices = await BleakScanner.discover(timeout=timeout)
-    return next((d for d in devices if "SmartBall" in (d.name or "")), None)
+    """SmartBall advertising within the last timeout seconds (continuous scan; returns as soon as seen)."""
+    return await find_device(None, timeout_sec=timeout, max_age_sec=timeout)
 
 
 async def main():
@@ -9,14 +9,18 @@ import sys
 import struct
 import asyncio
 import time
+from pathlib import Path
 
 try:
-    from bleak import BleakClient, BleakScanner
+    from bleak import BleakClient
     from bleak.exc import BleakError
 except ImportError:
     print("Install bleak: pip install bleak")
     sys.exit(1)
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "msr1_ota" / "web_gui"))
+from ble_scanner import find_device
+
 NUS_RX = "6e400003-b5a3-f393-e0a9-e50e24dcca9e"
 NUS_TX = "6e400002-b5a3-f393-e0a9-e50e24dcca9e"
 OTA_MAGIC = 0x53424F54
@@ -117,8 +121,7 @@ class OtaBle:
         self.disconnected = False
         for scan_attempt in range(3):
             print("Scanning for SmartBall..." + (f" (attempt {scan_attempt+1}/3)" if scan_attempt else ""))
-            devices = await BleakScanner.discover(timeout=15.0)
-            target = next((d for d in devices if "SmartBall" in (d.name or "")), None)
+            target = await find_device(None, timeout_sec=15.0, stop=True)
             if target:
                 break
             if scan_attempt < 2:
@@ -310,8 +313,7 @@ class OtaBle:
 
     async def get_status(self):
         """Connect, get OTA status (next_expected_offset), disconnect. Returns (next_offset, total_size) or (None, None)."""
-        devices = await BleakScanner.discover(timeout=12.0)
-        target = next((d for d in devices if "SmartBall" in (d.name or "")), None)
+        target = await find_device(None, timeout_sec=12.0, stop=True)
         if not target:
             return (None, None)
         try:
@@ -345,8 +347,8 @@ async def wait_for_device_online(wait_after_reboot_sec=10.0, scan_timeout=12.0,
     loop = asyncio.get_running_loop()
     deadline = loop.time() + max_wait_sec
     while loop.time() < deadline:
-        devices = await BleakScanner.discover(timeout=scan_timeout)
-        target = next((d for d in devices if "SmartBall" in (d.name or "")), None)
+        # Only advertisements seen after the reboot wait count as "online"
+        target = await find_device(None, timeout_sec=scan_timeout, stop=True, max_age_sec=scan_timeout)
         if target:
             print(f"Device online: {target.address} ({target.name})")
             return target.address
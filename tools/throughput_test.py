@@ -81,12 +81,12 @@ def run_serial_xiao_to_pc(port, duration):
 
 # --- BLE helpers ---
 async def find_smartball(retries=SCAN_RETRIES, timeout=SCAN_TIMEOUT):
-    """Scan for SmartBall with retries. Returns (device, None) or (None, error_msg)."""
-    from bleak import BleakScanner
+    """Scan for SmartBall with retries (each returns as soon as it advertises). Returns (device, None) or (None, error_msg)."""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "msr1_ota" / "web_gui"))
+    from ble_scanner import find_device
     for attempt in range(1, retries + 1):
         print(f"  Scan attempt {attempt}/{retries} ({timeout}s)...", end=" ", flush=True)
-        devices = await BleakScanner.discover(timeout=timeout)
-        target = next((d for d in devices if "SmartBall" in (d.name or "")), None)
+        target = await find_device(None, timeout_sec=timeout, stop=True)
         if target:
             print(f"Found {target.name} @ {target.address}")
             return target, None